@@ -0,0 +1,88 @@
+from nba_data.processing.db_config import Session
+from nba_data.processing.duckdb_mirror import (Mirror, get_statement_tables, read_query_frame)
+from nba_data.processing.nba_game_sequence_events import set_game_events_query
+from nba_data.processing.nba_games import Game
+from nba_data.processing.process_on_court_records import set_on_court_events_query
+from nba_data.processing.nba_starter_events import get_period_start_subs_query
+from nba_data.processing.season_partitions import Partitions
+import argparse
+import pandas as pd
+import time
+
+def get_benchmark_queries(session, game_ids, sport, season):
+    # the period start query only reads the game ids of the game events frame
+    game_events = pd.DataFrame({'game_id': game_ids})
+    return [('game_events', set_game_events_query(session, game_ids)),
+            ('period_start_subs', get_period_start_subs_query(session, game_events)),
+            ('on_court_events', set_on_court_events_query(session, game_ids, sport, season))]
+
+def time_query(statement, bind, repeat=3):
+    best_sec = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        frame = read_query_frame(statement, bind)
+        elapsed_sec = time.perf_counter() - start
+        best_sec = elapsed_sec if best_sec is None else min(best_sec, elapsed_sec)
+    return best_sec, len(frame.index)
+
+def get_backend_benchmark(sport, season, game_count=50, repeat=3):
+    if not Mirror.is_enabled():
+        raise RuntimeError('Set NBA_DUCKDB_MIRROR_DIR and install duckdb to benchmark the mirror')
+    session = Partitions.get_session(sport, season)
+    game_ids = [game_id for (game_id, ) in (session.query(Game.game_id)
+                                                   .filter(Game.sport==sport)
+                                                   .filter(Game.season==season)
+                                                   .order_by(Game.game_id)
+                                                   .limit(game_count)
+                                                   .all())]
+    benchmark = {}
+    for query_name, query in get_benchmark_queries(session, game_ids, sport, season):
+        statement = query.statement
+        # the first sync copies the tables, later reads only check the watermark
+        start = time.perf_counter()
+        Mirror.sync(session.bind, get_statement_tables(statement))
+        sync_sec = time.perf_counter() - start
+        Mirror.set_enabled(False)
+        sqlite_sec, row_count = time_query(statement, session.bind, repeat)
+        Mirror.set_enabled(True)
+        duckdb_sec, duckdb_row_count = time_query(statement, session.bind, repeat)
+        benchmark[query_name] = {'games': len(game_ids),
+                                 'rows': row_count,
+                                 'duckdb_rows': duckdb_row_count,
+                                 'sync_sec': sync_sec,
+                                 'sqlite_sec': sqlite_sec,
+                                 'duckdb_sec': duckdb_sec}
+    session.close()
+    return benchmark
+
+def print_backend_benchmark(benchmark):
+    print('{:<20}{:>8}{:>10}{:>12}{:>12}{:>12}{:>10}'.format('query', 'games', 'rows',
+                                                             'sync ms', 'sqlite ms',
+                                                             'duckdb ms', 'speedup'))
+    for query_name, query_benchmark in benchmark.items():
+        print('{:<20}{:>8}{:>10}{:>12.1f}{:>12.1f}{:>12.1f}{:>10.1f}'
+              .format(query_name,
+                      query_benchmark['games'],
+                      query_benchmark['rows'],
+                      query_benchmark['sync_sec'] * 1000,
+                      query_benchmark['sqlite_sec'] * 1000,
+                      query_benchmark['duckdb_sec'] * 1000,
+                      query_benchmark['sqlite_sec'] / max(query_benchmark['duckdb_sec'], 1e-9)))
+        if query_benchmark['rows'] != query_benchmark['duckdb_rows']:
+            print('\t- row counts differ: {} sqlite, {} duckdb'
+                  .format(query_benchmark['rows'], query_benchmark['duckdb_rows']))
+
+def main(sport='nba', season=2019, game_count=50, repeat=3):
+    benchmark = get_backend_benchmark(sport, season, game_count, repeat)
+    print_backend_benchmark(benchmark)
+    return benchmark
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sport', default='nba')
+    parser.add_argument('--season', type=int, default=2019)
+    parser.add_argument('--games', type=int, default=50,
+                        help='games passed to each query')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(sport=args.sport, season=args.season, game_count=args.games, repeat=args.repeat)
@@ -0,0 +1,228 @@
+from nba_data.processing.nba_instance import NBADataInstance
+from nba_data.processing.nba_instance_container import NBAInstanceContainer
+from nba_data.processing.nba_game_events import GameEvent
+from nba_data.processing.nba_game_shots import GameShot
+from nba_data.processing.nba_game_starters import GameStarter
+from nba_data.processing.nba_game_win_prob import GameWinProbEvent
+from nba_data.processing.nba_player_boxes import PlayerBoxScore
+from nba_data.processing.nba_players import Player
+from nba_data.processing.nba_rosters import TeamRoster
+from nba_data.processing.nba_team_boxes import TeamBoxScore
+from nba_data.staging.box_scores import StageBoxScore
+from nba_data.staging.db_config import Session
+from nba_data.staging.period_starters import StagePeriodStarters
+from nba_data.staging.play_by_play import StagePlayByPlay
+from nba_data.staging.player import StagePlayer
+from nba_data.staging.roster import StageRoster
+from nba_data.staging.shot_chart import StageShotChart
+from nba_data.staging.win_prob import StageWinProb
+from nba_data.utilities.sqlalchemy_utilities import (bulk_insert_records, get_bulk_instance,
+                                                     get_record_transformer)
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+import argparse
+import time
+
+benchmark_tables = [(GameEvent, StagePlayByPlay),
+                    (GameWinProbEvent, StageWinProb),
+                    (GameShot, StageShotChart),
+                    (PlayerBoxScore, StageBoxScore),
+                    (TeamBoxScore, StageBoxScore),
+                    (GameStarter, StagePeriodStarters),
+                    (TeamRoster, StageRoster),
+                    (Player, StagePlayer)]
+
+def get_staged_payloads(session, stageClass, limit=200):
+    staged_records = (session.query(stageClass)
+                             .filter(stageClass.status_code == 200)
+                             .filter(stageClass.json != None)
+                             .limit(limit)
+                             .all())
+    return [(record.json, get_payload_kwargs(record)) for record in staged_records]
+
+def get_payload_kwargs(record):
+    if isinstance(record, StagePlayer):
+        return {}
+    kwargs = {'sport': record.sport, 'season': record.season}
+    if hasattr(record, 'game_id'):
+        kwargs['game_id'] = record.game_id
+    if isinstance(record, StagePeriodStarters):
+        kwargs['period'] = record.period
+    return kwargs
+
+def time_container_path(tableClass, payloads, columnar, min_rows=None, repeat=3):
+    best_sec = None
+    for i in range(repeat):
+        container = NBAInstanceContainer(tableClass, 'nba', 0)
+        container.columnar = columnar
+        if min_rows is not None:
+            container.columnar_min_rows = min_rows
+        start = time.perf_counter()
+        for data, kwargs in payloads:
+            container.add(data, **kwargs)
+        container.add_pending()
+        elapsed_sec = time.perf_counter() - start
+        best_sec = elapsed_sec if best_sec is None else min(best_sec, elapsed_sec)
+    return best_sec, container.instances, container.frame_row_count
+
+def get_instance_records(tableClass, container, payloads):
+    # the per row path before the compiled transformers
+    bulk_instances = []
+    for data, kwargs in payloads:
+        for i, row in enumerate(container.transform_data(data)):
+            nba_instance = NBADataInstance(tableClass, row, event_id=i + 1, **kwargs)
+            bulk_instances.append(get_bulk_instance(nba_instance.instance, tableClass))
+    return bulk_instances
+
+def get_transformer_records(tableClass, container, payloads):
+    records = []
+    for data, kwargs in payloads:
+        records += container.row_transformer.get_records(container.get_row_items(data),
+                                                         **kwargs)
+    return records
+
+def time_row_path(tableClass, payloads, transform, repeat=3):
+    container = NBAInstanceContainer(tableClass, 'nba', 0)
+    best_sec = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        records = transform(tableClass, container, payloads)
+        elapsed_sec = time.perf_counter() - start
+        best_sec = elapsed_sec if best_sec is None else min(best_sec, elapsed_sec)
+    return best_sec, records
+
+def get_unique_records(tableClass, bulk_instances, records):
+    # duplicates are dropped the way the container drops them before inserting
+    container = NBAInstanceContainer(tableClass, 'nba', 0)
+    unique_records = [(bulk_instance, record)
+                      for bulk_instance, record in zip(bulk_instances, records)
+                      if container.validate_instance(record)]
+    return ([bulk_instance for bulk_instance, record in unique_records],
+            [record for bulk_instance, record in unique_records])
+
+def time_insert_path(tableClass, records, bulk, repeat=3):
+    best_sec = None
+    for i in range(repeat):
+        engine = create_engine('sqlite://')
+        tableClass.__table__.create(engine)
+        start = time.perf_counter()
+        try:
+            if bulk:
+                bulk_insert_records(engine, records, tableClass)
+            else:
+                engine.execute(tableClass.__table__.insert(), records)
+        except IntegrityError:
+            # staged rows missing required fields can not be inserted either way
+            return None
+        finally:
+            engine.dispose()
+        elapsed_sec = time.perf_counter() - start
+        best_sec = elapsed_sec if best_sec is None else min(best_sec, elapsed_sec)
+    return best_sec
+
+def get_row_benchmark(limit=200, repeat=3):
+    session = Session()
+    benchmark = {}
+    for tableClass, stageClass in benchmark_tables:
+        payloads = get_staged_payloads(session, stageClass, limit)
+        if len(payloads) == 0:
+            continue
+        for data, kwargs in payloads:
+            data.get_data()
+        instance_sec, bulk_instances = time_row_path(tableClass, payloads,
+                                                     get_instance_records, repeat)
+        transformer_sec, records = time_row_path(tableClass, payloads,
+                                                 get_transformer_records, repeat)
+        column_names = get_record_transformer(tableClass).column_names
+        identical = [tuple(bulk_instance[column_name] for column_name in column_names)
+                     for bulk_instance in bulk_instances] == records
+        bulk_instances, records = get_unique_records(tableClass, bulk_instances, records)
+        benchmark[tableClass.__table__.name] = {
+            'rows': len(records),
+            'instance_sec': instance_sec,
+            'transformer_sec': transformer_sec,
+            'insert_sec': time_insert_path(tableClass, bulk_instances, False, repeat),
+            'bulk_insert_sec': time_insert_path(tableClass, records, True, repeat),
+            'identical': identical}
+    session.close()
+    return benchmark
+
+def print_row_benchmark(benchmark):
+    print('{:<24}{:>10}{:>14}{:>14}{:>14}{:>14}{:>11}'.format('table', 'rows',
+                                                              'row us before', 'row us after',
+                                                              'insert before', 'insert after',
+                                                              'identical'))
+    for table_name, table_benchmark in benchmark.items():
+        row_count = max(table_benchmark['rows'], 1)
+        row_usec = [table_benchmark[key] * 1e6 / row_count
+                    if table_benchmark[key] is not None else None
+                    for key in ['instance_sec', 'transformer_sec', 'insert_sec',
+                                'bulk_insert_sec']]
+        print('{:<24}{:>10}{:>14}{:>14}{:>14}{:>14}{:>11}'
+              .format(table_name,
+                      table_benchmark['rows'],
+                      *['{:.2f}'.format(usec) if usec is not None else '' for usec in row_usec],
+                      str(table_benchmark['identical'])))
+
+def get_transform_benchmark(limit=200, repeat=3, min_rows=None):
+    session = Session()
+    benchmark = {}
+    for tableClass, stageClass in benchmark_tables:
+        payloads = get_staged_payloads(session, stageClass, limit)
+        if len(payloads) == 0:
+            continue
+        # payloads decode once up front so only the transforms are timed
+        for data, kwargs in payloads:
+            data.get_data()
+        row_sec, row_instances, row_frame_count = time_container_path(tableClass, payloads,
+                                                                      False, None, repeat)
+        frame_sec, frame_instances, frame_row_count = time_container_path(tableClass, payloads,
+                                                                          True, min_rows,
+                                                                          repeat)
+        benchmark[tableClass.__table__.name] = {'payloads': len(payloads),
+                                                'rows': len(row_instances),
+                                                'frame_rows': frame_row_count,
+                                                'row_sec': row_sec,
+                                                'frame_sec': frame_sec,
+                                                'identical': row_instances == frame_instances}
+    session.close()
+    return benchmark
+
+def print_transform_benchmark(benchmark):
+    # frame rows counts the rows the batched columnar path actually transformed
+    print('{:<24}{:>10}{:>10}{:>12}{:>14}{:>14}{:>10}{:>11}'.format('table', 'payloads', 'rows',
+                                                                  'frame rows', 'row rows/s',
+                                                                  'frame rows/s', 'speedup',
+                                                                  'identical'))
+    for table_name, table_benchmark in benchmark.items():
+        row_count = table_benchmark['rows']
+        print('{:<24}{:>10}{:>10}{:>12}{:>14.0f}{:>14.0f}{:>10.1f}{:>11}'
+              .format(table_name,
+                      table_benchmark['payloads'],
+                      row_count,
+                      table_benchmark['frame_rows'],
+                      row_count / max(table_benchmark['row_sec'], 1e-9),
+                      row_count / max(table_benchmark['frame_sec'], 1e-9),
+                      table_benchmark['row_sec'] / max(table_benchmark['frame_sec'], 1e-9),
+                      str(table_benchmark['identical'])))
+
+def main(limit=200, repeat=3, rows=False, min_rows=None):
+    if rows:
+        benchmark = get_row_benchmark(limit, repeat)
+        print_row_benchmark(benchmark)
+    else:
+        benchmark = get_transform_benchmark(limit, repeat, min_rows)
+        print_transform_benchmark(benchmark)
+    return benchmark
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=200,
+                        help='staged payloads read per table')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rows', action='store_true',
+                        help='per row overhead of the instance and compiled transformers')
+    parser.add_argument('--min-rows', type=int, default=None,
+                        help='rows a batch needs for the columnar path (defaults to the config)')
+    args = parser.parse_args()
+    main(limit=args.limit, repeat=args.repeat, rows=args.rows, min_rows=args.min_rows)
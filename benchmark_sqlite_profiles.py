@@ -0,0 +1,26 @@
+from nba_data.staging.db_config import db_path
+from nba_data.utilities.sqlite_engine import (get_profile_benchmark,
+                                              print_profile_benchmark)
+import argparse
+import os
+
+def main(db_dir=None, profiles=None, row_count=20000, payload_bytes=4096, batch_rows=500):
+    # defaults to the staging database's volume so fsync costs are realistic
+    db_dir = db_dir if db_dir is not None else os.path.dirname(db_path)
+    benchmark = get_profile_benchmark(db_dir, profiles, row_count, payload_bytes, batch_rows)
+    print_profile_benchmark(benchmark)
+    return benchmark
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db-dir', default=None,
+                        help='directory for the scratch databases')
+    parser.add_argument('--profile', action='append', default=None,
+                        help='profile to benchmark, repeatable (defaults to all of them)')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--payload-bytes', type=int, default=4096)
+    parser.add_argument('--batch-rows', type=int, default=500,
+                        help='rows inserted per transaction')
+    args = parser.parse_args()
+    main(db_dir=args.db_dir, profiles=args.profile, row_count=args.rows,
+         payload_bytes=args.payload_bytes, batch_rows=args.batch_rows)
@@ -0,0 +1,23 @@
+from nba_data.staging.columnar_store import ColumnarStore
+from nba_data.staging.db_config import Engine
+from nba_data.staging.nba_staging_instance_config import columnar_store_config
+from nba_data.staging.payload_compression import payload_tables
+from nba_data.utilities.sqlite_engine import engine_profile
+import argparse
+
+def main(endpoints=None, batchsize=None):
+    store_config = dict(columnar_store_config)
+    if batchsize is not None:
+        store_config['batchsize'] = batchsize
+    store = ColumnarStore(**store_config)
+    with engine_profile(Engine, 'fast'):
+        return store.ingest(Engine, endpoints)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoint', action='append', choices=sorted(payload_tables),
+                        help='endpoint to ingest, repeatable (defaults to all of them)')
+    parser.add_argument('--batchsize', type=int, default=None,
+                        help='staging rows written to each part file')
+    args = parser.parse_args()
+    main(endpoints=args.endpoint, batchsize=args.batchsize)
@@ -0,0 +1,39 @@
+from nba_data.staging.db_config import Engine
+from nba_data.staging.payload_compression import (compress_staging_payloads,
+                                                  get_decode_benchmark,
+                                                  get_payload_benchmark,
+                                                  print_decode_benchmark,
+                                                  print_payload_benchmark)
+from nba_data.utilities.sqlite_engine import engine_profile
+import argparse
+
+def main(batchsize=1000, train=False, sample_count=2000, vacuum=False, benchmark_only=False,
+         decode_benchmark=False):
+    if decode_benchmark:
+        return print_decode_benchmark(get_decode_benchmark(Engine, min(sample_count, 200)))
+    if benchmark_only:
+        return print_payload_benchmark(get_payload_benchmark(Engine))
+    # batches are rewritten idempotently, so a lost last commit is redone on rerun
+    with engine_profile(Engine, 'fast'):
+        return compress_staging_payloads(Engine, batchsize=batchsize, train=train,
+                                         sample_count=sample_count, vacuum=vacuum)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batchsize', type=int, default=1000,
+                        help='rows rewritten per transaction')
+    parser.add_argument('--train', action='store_true',
+                        help='train a zstd dictionary per endpoint before compressing')
+    parser.add_argument('--sample-count', type=int, default=2000,
+                        help='payloads sampled per endpoint for dictionary training')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='reclaim the freed pages once every table is compressed')
+    parser.add_argument('--benchmark-only', action='store_true',
+                        help='report payload size and scan time without rewriting rows')
+    parser.add_argument('--decode-benchmark', action='store_true',
+                        help='time full and single result set decoding of sampled payloads '
+                             'per endpoint')
+    args = parser.parse_args()
+    main(batchsize=args.batchsize, train=args.train, sample_count=args.sample_count,
+         vacuum=args.vacuum, benchmark_only=args.benchmark_only,
+         decode_benchmark=args.decode_benchmark)
@@ -2,7 +2,8 @@ import pandas as pd
 import numpy as np
 from sqlalchemy import (and_, case, cast, func, literal, or_)
 from sqlalchemy.dialects.sqlite import INTEGER
-from nba_data.processing.db_config import Session
+from nba_data.processing.duckdb_mirror import read_query_frame
+from nba_data.processing.season_partitions import Partitions
 from nba_data.processing.nba_game_starters import GameStarter
 from nba_data.processing.date_windows import DateWindow
 from nba_data.processing.nba_game_events import GameEvent
@@ -58,13 +59,14 @@ class NBASequenceObs():
                                 'row_num','value']
 
     def get_obs(self, game_id):
-        self.session = Session()
+        self.session = Partitions.get_game_session(game_id)
         self.game_id = game_id
         self.load_static_game_features()
         self.session.close()
 
     def set_obs(self, game_id):
-        self.session = Session()
+        # the season features look back over the prior seasons' partitions
+        self.session = Partitions.get_game_session(game_id, self.season_ts_lag_count)
         self.game_id = game_id
         self.set_teams()
         self.set_game_date()
@@ -179,7 +181,7 @@ class NBASequenceObs():
                               .group_by(PlayerBoxScore.team_id,
                                         PlayerBoxScore.player_id))
         self.bench = set()
-        for team_id, df in pd.read_sql(bench_query.statement, session.bind).groupby(['team_id']):
+        for team_id, df in read_query_frame(bench_query.statement, session.bind).groupby(['team_id']):
             criteria = df['player_id'].isin(self.starters)
             self.bench |= set(df.loc[~criteria,]
                                 .sort_values(by=['total_sec'], ascending=False)
@@ -266,7 +268,7 @@ class NBASequenceObs():
                              .filter(TeamBoxScore.game_id==self.game_id)
                              .filter(TeamBoxScore.team_id.in_(self.players.keys())))
         team_ind_query=player_query.union(team_query)
-        team_ind = pd.read_sql_query(team_ind_query.statement, session.bind)
+        team_ind = read_query_frame(team_ind_query.statement, session.bind)
         team_ind['column_num'] = team_ind['player_id'].replace(self.players)
         team_ind['matrix_num'] = self.matrix_num_iter
         self.team_ind_features=team_ind[self.static_game_columns].set_index(self.static_game_columns[:4])
@@ -306,7 +308,7 @@ class NBASequenceObs():
                                                 starter_query.c.period==total_team_games.c.period))
                                 .filter(GameEvent.id <= 26)
                                 .filter(starter_query.c.player_id!=None))
-        self.period_start_pct_features = pd.read_sql_query(starter_query.statement, session.bind)
+        self.period_start_pct_features = read_query_frame(starter_query.statement, session.bind)
         self.period_start_pct_features['game_id'] = self.game_id
         self.period_start_pct_features['column_num'] = (self.period_start_pct_features['player_id']
                                                             .replace(self.players))
@@ -350,7 +352,7 @@ class NBASequenceObs():
                                                player_avg_played_pct.c.value,
                                                (GameEvent.id - 1).label('row_num'))
                                         .filter(GameEvent.id <= 26))
-        self.avg_played_pct_features = pd.read_sql_query(player_avg_played_pct.statement,
+        self.avg_played_pct_features = read_query_frame(player_avg_played_pct.statement,
                                                          session.bind)
         self.avg_played_pct_features['game_id'] = self.game_id
         self.avg_played_pct_features['column_num'] = (self.avg_played_pct_features['player_id']
@@ -395,7 +397,7 @@ class NBASequenceObs():
                              .filter(TeamBoxScore.game_id==self.game_id)
                              .filter(TeamBoxScore.team_id.in_(self.players.keys())))
         active_ind_query=player_query.union(team_query)
-        active_ind = pd.read_sql_query(active_ind_query.statement,
+        active_ind = read_query_frame(active_ind_query.statement,
                                             session.bind)
         active_ind['column_num'] = active_ind['player_id'].replace(self.players)
         active_ind['matrix_num'] = self.matrix_num_iter
@@ -434,7 +436,7 @@ class NBASequenceObs():
                              .filter(GameTeam.game_id==self.game_id)
                              .filter(GameTeam.home_away==True))
         static_game_ind_query=player_query.union(team_query)
-        static_game_ind = pd.read_sql_query(static_game_ind_query.statement,
+        static_game_ind = read_query_frame(static_game_ind_query.statement,
                                             session.bind)
         static_game_ind['column_num'] = static_game_ind['player_id'].replace(self.players)
         static_game_ind['matrix_num'] = self.matrix_num_iter
@@ -574,7 +576,7 @@ class NBASequenceObs():
                                        TeamBoxScore.team_id,
                                        GameEvent.id))
         period_pct_remain_feature=player_query.union(team_query)
-        period_pct_remain_feature = pd.read_sql_query(period_pct_remain_feature.statement,
+        period_pct_remain_feature = read_query_frame(period_pct_remain_feature.statement,
                                                       session.bind)
         period_pct_remain_feature['column_num'] = period_pct_remain_feature['player_id'].replace(self.players)
         period_pct_remain_feature['matrix_num'] = self.matrix_num_iter
@@ -619,7 +621,7 @@ class NBASequenceObs():
                                          TeamBoxScore.team_id,
                                          GameEvent.id))
         game_score_margin_query=player_query.union(team_query)
-        game_score_margin_feature = pd.read_sql_query(game_score_margin_query.statement,
+        game_score_margin_feature = read_query_frame(game_score_margin_query.statement,
                                                       session.bind)
         game_score_margin_feature['column_num'] = game_score_margin_feature['player_id'].replace(self.players)
         game_score_margin_feature['matrix_num'] = self.matrix_num_iter
@@ -678,7 +680,7 @@ class NBASequenceObs():
                                .group_by(GameSequence.game_id,
                                          GameSequence.model_event_num,
                                          GameEvent.id))
-        event_sec_elapsed_feature = pd.read_sql_query(sec_elapsed_query.statement, session.bind)
+        event_sec_elapsed_feature = read_query_frame(sec_elapsed_query.statement, session.bind)
         event_sec_elapsed_feature['matrix_num'] = self.matrix_num_iter
         self.event_sec_elapsed_feature = event_sec_elapsed_feature[self.in_game_columns].set_index(self.in_game_columns[:5])
         self.in_game_features.append(self.event_sec_elapsed_feature)
@@ -767,7 +769,7 @@ class NBASequenceObs():
                                        TeamBoxScore.team_id,
                                        GameEvent.id))
         in_game_ind_query=player_query.union(team_query)
-        in_game_ind = pd.read_sql_query(in_game_ind_query.statement,
+        in_game_ind = read_query_frame(in_game_ind_query.statement,
                                         session.bind)
         in_game_ind['column_num'] = in_game_ind['player_id'].replace(self.players)
         in_game_ind['matrix_num'] = self.matrix_num_iter
@@ -809,7 +811,7 @@ class NBASequenceObs():
                                        GameEvent.id,
                                        TeamBoxScore.team_id))
         in_game_ind_query=player_query.union(team_query)
-        in_game_ind = pd.read_sql_query(in_game_ind_query.statement,
+        in_game_ind = read_query_frame(in_game_ind_query.statement,
                                         session.bind)
         in_game_ind['column_num'] = in_game_ind['player_id'].replace(self.players)
         in_game_ind['matrix_num'] = self.matrix_num_iter
@@ -875,7 +877,7 @@ class NBASequenceObs():
                                        TeamBoxScore.team_id,
                                        GameEvent.id))
         prior_event_ind_query=player_query.union(team_query)
-        prior_event_ind = pd.read_sql_query(prior_event_ind_query.statement,
+        prior_event_ind = read_query_frame(prior_event_ind_query.statement,
                                             session.bind)
         prior_event_ind['column_num'] = prior_event_ind['player_id'].replace(self.players)
         prior_event_ind['matrix_num'] = self.matrix_num_iter
@@ -894,7 +896,7 @@ class NBASequenceObs():
                                          .filter(GameSequence.player_id.in_(self.players.keys()))
                                          .filter(GameSequence.model_event_num<=max(self.model_events))
                                          .filter(GameSequence.action_category.in_(self.stat_rows.keys())))
-        in_game_player_features = pd.read_sql_query(in_game_features_query.statement,
+        in_game_player_features = read_query_frame(in_game_features_query.statement,
                                                     session.bind)
         in_game_player_features['row_num'] = (
                         in_game_player_features['action'].replace(self.stat_rows))
@@ -947,7 +949,7 @@ class NBASequenceObs():
                                                        GameSequence.model_event_num)
                                              .order_by(GameSequence.game_id,
                                                        GameSequence.model_event_num))
-            in_game_team_features = pd.read_sql_query(in_game_features_query.statement,
+            in_game_team_features = read_query_frame(in_game_features_query.statement,
                                                       session.bind)
             index_columns=['game_id','model_event_num','matrix_num']
             in_game_team_features = in_game_team_features.set_index(index_columns)
@@ -991,7 +993,7 @@ class NBASequenceObs():
                                 .filter(GameSequence.game_id==lagged_events.c.game_id)
                                 .filter(lagged_events.c.model_event_num<GameSequence.model_event_num)
                                 .filter(lagged_events.c.model_event_num>=lag_event_lb))
-        lagged_groups = (pd.read_sql_query(lagged_events.statement,
+        lagged_groups = (read_query_frame(lagged_events.statement,
                                            session.bind)
                            .groupby(['game_id','model_event_num']))
         for group, df in lagged_groups:
@@ -1032,7 +1034,7 @@ class NBASequenceObs():
                                            Game.game_date_est,
                                            GameSequence.player_id,
                                            GameSequence.action_category))
-        daily_ts_features = pd.read_sql_query(daily_ts_query.statement,
+        daily_ts_features = read_query_frame(daily_ts_query.statement,
                                               session.bind)
         daily_ts_features['matrix_num'] = (
           (self.game_date - daily_ts_features['game_date_est']).dt.days
@@ -1077,7 +1079,7 @@ class NBASequenceObs():
                                              daily_opp_ts_query.c.stat,
                                              daily_opp_ts_query.c.value)
                                       .filter(daily_opp_ts_query.c.opp_team_id==players_query.c.opp_team_id))
-        daily_opp_ts_features = pd.read_sql_query(daily_opp_ts_query.statement,
+        daily_opp_ts_features = read_query_frame(daily_opp_ts_query.statement,
                                                   session.bind)
         daily_opp_ts_features['matrix_num'] = (
           (self.game_date - daily_opp_ts_features['game_date_est']).dt.days
@@ -1118,7 +1120,7 @@ class NBASequenceObs():
                                            GameSequence.game_id,
                                            GameSequence.player_id,
                                            GameSequence.action_category))
-        season_ts_features = pd.read_sql_query(season_ts_query.statement,
+        season_ts_features = read_query_frame(season_ts_query.statement,
                                                session.bind)
         season_ts_features['column_num'] = season_ts_features['player_id'].replace(self.players)
         season_ts_features['row_num'] = season_ts_features['action'].replace(self.stat_rows)
@@ -1173,7 +1175,7 @@ class NBASequenceObs():
                                              season_opp_ts_query.c.stat,
                                              season_opp_ts_query.c.value)
                                       .filter(season_opp_ts_query.c.opp_team_id==players_query.c.opp_team_id))
-        season_opp_ts_features = pd.read_sql_query(season_opp_ts_query.statement,
+        season_opp_ts_features = read_query_frame(season_opp_ts_query.statement,
                                                session.bind)
         season_opp_ts_features['column_num'] = season_opp_ts_features['player_id'].replace(self.players)
         season_opp_ts_features['row_num'] = season_opp_ts_features['action'].replace(self.stat_rows)
@@ -1260,7 +1262,7 @@ class NBASequenceObs():
                                     .group_by(GameSequence.game_id,
                                               GameSequence.model_event_num,
                                               GameSequence.action_category))
-        game_event_labels = pd.read_sql_query(event_label_query.statement,
+        game_event_labels = read_query_frame(event_label_query.statement,
                                               session.bind,
                                               index_col=['game_id','model_event_num'])
         game_event_labels['label_0'] = game_event_labels['label_0'].replace(self.action_events)
@@ -1278,7 +1280,7 @@ class NBASequenceObs():
                                       .group_by(GameSequence.game_id,
                                                 GameSequence.model_event_num,
                                                 GameSequence.sub_event_num))
-        player_event_labels = pd.read_sql_query(player_event_labels.statement,
+        player_event_labels = read_query_frame(player_event_labels.statement,
                                                 session.bind)
         index_columns = ['game_id','model_event_num','sub_event_num']
         player_event_labels = (player_event_labels.set_index(index_columns)
@@ -1308,7 +1310,7 @@ class NBASequenceObs():
                                     .filter(GameSequence.game_id==self.game_id)
                                     .group_by(GameSequence.game_id,
                                               GameSequence.model_event_num))
-        self.second_event_labels = pd.read_sql_query(event_label_query.statement,
+        self.second_event_labels = read_query_frame(event_label_query.statement,
                                                      session.bind,
                                                      index_col=['game_id','model_event_num'])
 
@@ -1325,7 +1327,7 @@ class NBASequenceObs():
                                   .group_by(GameSequence.game_id,
                                             GameSequence.player_id,
                                             GameSequence.action_category))
-        reward_baseline = pd.read_sql_query(reward_baseline.statement,
+        reward_baseline = read_query_frame(reward_baseline.statement,
                                             session.bind)
         reward_baseline['row_num'] = reward_baseline['action'].replace(self.player_stats)
         reward_baseline['column_num'] = reward_baseline['player_id'].replace(self.players)
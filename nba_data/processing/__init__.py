@@ -1,5 +1,6 @@
 from . import db_config
 from . import date_windows
+from . import duckdb_mirror
 from . import nba_game_event_players
 from . import nba_game_events
 from . import nba_game_officials
@@ -17,6 +18,7 @@ from . import nba_game_win_prob
 from . import nba_games
 from . import nba_instance_container
 from . import nba_instance
+from . import nba_instance_frame
 from . import nba_player_boxes
 from . import nba_players
 from . import nba_rosters
@@ -28,3 +30,4 @@ from . import process_nba_seq_records
 from . import process_on_court_records
 from . import processing_config
 from . import process_error_period_starters
+from . import season_partitions
@@ -0,0 +1,221 @@
+from threading import RLock
+from sqlalchemy import (Table, types)
+from sqlalchemy.sql import visitors
+from nba_data.utilities.collection_config import duckdb_mirror_config
+import os
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+class DuckDBMirror():
+    # sqlite stays the source of truth, the mirror copies rows by id and is
+    # resynced from scratch when rows below its watermark were deleted
+    def __init__(self, mirror_dir=None, env_var=None, threads=None, batchsize=100000):
+        self.mirror_dir = (os.environ.get(env_var) if env_var else None) or mirror_dir
+        self.threads = threads
+        self.batchsize = batchsize
+        self.enabled = True
+        self.connections = {}
+        self.synced = {}
+        self.failed = set()
+        self.lock = RLock()
+
+    def is_enabled(self):
+        return self.enabled and duckdb is not None and self.mirror_dir is not None
+
+    def set_enabled(self, enabled):
+        previous_enabled = self.enabled
+        self.enabled = enabled
+        return previous_enabled
+
+    def get_source_path(self, bind):
+        engine = getattr(bind, 'engine', bind)
+        # union engines only see their partitions through temp views
+        if getattr(engine, 'season_partitions', None) is not None:
+            return None
+        return engine.url.database
+
+    def get_mirror_path(self, source_path):
+        file_name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.mirror_dir, '{}.duckdb'.format(file_name))
+
+    def get_connection(self, source_path):
+        with self.lock:
+            if source_path not in self.connections:
+                os.makedirs(self.mirror_dir, exist_ok=True)
+                connection = duckdb.connect(self.get_mirror_path(source_path))
+                # keeps the sqlite semantics of the queries written for it
+                connection.execute('SET integer_division = true')
+                connection.execute('SET old_implicit_casting = true')
+                if self.threads is not None:
+                    connection.execute('SET threads = {}'.format(int(self.threads)))
+                connection.execute('CREATE TABLE IF NOT EXISTS _mirror_watermark ('
+                                   'table_name VARCHAR PRIMARY KEY, '
+                                   'last_id BIGINT NOT NULL, '
+                                   'row_count BIGINT NOT NULL)')
+                self.connections[source_path] = connection
+                self.synced[source_path] = set()
+            return self.connections[source_path]
+
+    def get_watermark(self, connection, table):
+        watermark = connection.execute('SELECT last_id, row_count FROM _mirror_watermark '
+                                       'WHERE table_name = ?', [table.name]).fetchone()
+        return tuple(watermark) if watermark is not None else (0, 0)
+
+    def set_watermark(self, connection, table, last_id, row_count):
+        connection.execute('INSERT OR REPLACE INTO _mirror_watermark VALUES (?, ?, ?)',
+                           [table.name, last_id, row_count])
+
+    def create_table(self, connection, table):
+        columns = ', '.join('{} {}'.format(column.name, get_duckdb_type(column.type))
+                            for column in table.c)
+        connection.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(table.name, columns))
+
+    def sync_table(self, bind, connection, table):
+        self.create_table(connection, table)
+        last_id, row_count = self.get_watermark(connection, table)
+        engine = getattr(bind, 'engine', bind)
+        kept_count = engine.execute('SELECT count(*) FROM {} WHERE id <= ?'.format(table.name),
+                                    (last_id, )).scalar()
+        if kept_count != row_count:
+            connection.execute('DELETE FROM {}'.format(table.name))
+            last_id, row_count = 0, 0
+        column_names = [column.name for column in table.c]
+        casts = ', '.join('CAST({} AS {})'.format(column.name, get_duckdb_type(column.type))
+                          for column in table.c)
+        batch_sql = ('SELECT {} FROM {} WHERE id > ? ORDER BY id LIMIT ?'
+                     .format(', '.join(column_names), table.name))
+        id_index = column_names.index('id')
+        copied_count = 0
+        raw_connection = engine.raw_connection()
+        try:
+            while True:
+                rows = raw_connection.execute(batch_sql, (last_id, self.batchsize)).fetchall()
+                if len(rows) == 0:
+                    break
+                batch = pd.DataFrame(rows, columns=column_names, dtype=object)
+                connection.register('mirror_batch', batch)
+                connection.execute('INSERT INTO {} ({}) SELECT {} FROM mirror_batch'
+                                   .format(table.name, ', '.join(column_names), casts))
+                connection.unregister('mirror_batch')
+                last_id = rows[-1][id_index]
+                copied_count += len(rows)
+        finally:
+            raw_connection.close()
+        self.set_watermark(connection, table, last_id, row_count + copied_count)
+        return copied_count
+
+    def sync(self, bind, tables):
+        source_path = self.get_source_path(bind)
+        with self.lock:
+            connection = self.get_connection(source_path)
+            for table in tables:
+                if table.name not in self.synced[source_path]:
+                    copied_count = self.sync_table(bind, connection, table)
+                    if copied_count:
+                        print('Mirrored {} {} records into duckdb'.format(copied_count,
+                                                                          table.name))
+                    self.synced[source_path].add(table.name)
+        return connection
+
+    def invalidate(self, bind, tables):
+        source_path = self.get_source_path(bind)
+        with self.lock:
+            for table in tables:
+                self.synced.get(source_path, set()).discard(get_table(table).name)
+        return True
+
+    def can_read(self, bind):
+        return self.is_enabled() and self.get_source_path(bind) is not None
+
+    def read_query_frame(self, statement, bind, index_col=None):
+        compiled = statement.compile(dialect=bind.dialect)
+        params = [compiled.params[name] for name in compiled.positiontup]
+        with self.lock:
+            connection = self.sync(bind, get_statement_tables(statement))
+            try:
+                result = connection.execute(str(compiled), params)
+            except duckdb.Error as e:
+                # queries leaning on sqlite only behaviour keep reading from sqlite
+                if str(compiled) not in self.failed:
+                    self.failed.add(str(compiled))
+                    print('DuckDB mirror could not run a query, reading from sqlite: {}'
+                          .format(str(e).splitlines()[0]))
+                return pd.read_sql_query(statement, bind, index_col=index_col)
+            if pa is not None:
+                frame = result.fetch_arrow_table().to_pandas()
+            else:
+                frame = get_numpy_frame(result.df())
+        frame = process_result_columns(frame, statement, bind.dialect)
+        if index_col is not None:
+            frame = frame.set_index(index_col)
+        return frame
+
+def get_duckdb_type(column_type):
+    if isinstance(column_type, types.TypeDecorator):
+        column_type = column_type.impl
+    if isinstance(column_type, types.Boolean):
+        return 'BOOLEAN'
+    if isinstance(column_type, types.Integer):
+        return 'BIGINT'
+    if isinstance(column_type, (types.Float, types.Numeric)):
+        return 'DOUBLE'
+    if isinstance(column_type, types.DateTime):
+        return 'TIMESTAMP'
+    if isinstance(column_type, types.Date):
+        return 'DATE'
+    return 'VARCHAR'
+
+def get_table(table):
+    return table.__table__ if hasattr(table, '__table__') else table
+
+def get_statement_tables(statement):
+    tables = {}
+    for element in visitors.iterate(statement, {}):
+        if isinstance(element, Table):
+            tables[element.name] = element
+    return list(tables.values())
+
+def get_numpy_frame(frame):
+    # matches read_sql, nullable integer columns come back as float
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.api.extensions.ExtensionDtype):
+            if pd.api.types.is_integer_dtype(frame[column].dtype):
+                frame[column] = (frame[column].astype('float64') if frame[column].hasnans
+                                 else frame[column].astype('int64'))
+    return frame
+
+def process_result_columns(frame, statement, dialect):
+    # the mirror holds stored values, so decorated types are converted here
+    column_types = [column.type for column in statement.c]
+    if len(column_types) != len(frame.columns):
+        return frame
+    for column, column_type in zip(list(frame.columns), column_types):
+        if isinstance(column_type, types.NullType) and frame[column].isna().all():
+            frame[column] = pd.Series([None] * len(frame.index), index=frame.index,
+                                      dtype=object)
+        elif isinstance(column_type, types.TypeDecorator):
+            frame[column] = [column_type.process_result_value(None if pd.isna(value) else value,
+                                                              dialect)
+                             for value in frame[column].tolist()]
+    return frame
+
+def read_query_frame(statement, bind, index_col=None):
+    if Mirror.can_read(bind):
+        return Mirror.read_query_frame(statement, bind, index_col)
+    return pd.read_sql_query(statement, bind, index_col=index_col)
+
+def invalidate_tables(bind, *tables):
+    if Mirror.is_enabled():
+        Mirror.invalidate(bind, tables)
+    return True
+
+Mirror = DuckDBMirror(**duckdb_mirror_config)
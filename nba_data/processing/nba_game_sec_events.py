@@ -1,6 +1,7 @@
 import pandas as pd
 from sqlalchemy import (and_, func, cast, literal)
 from sqlalchemy.dialects.sqlite import INTEGER
+from .duckdb_mirror import read_query_frame
 from .nba_game_events import GameEvent
 from .nba_game_starters import GameStarter
 from .nba_game_teams import GameTeam
@@ -8,7 +9,7 @@ from .nba_game_win_prob import GameWinProbEvent
 
 def get_sec_elapse_events(session, game_ids):
     sec_elapse_events_query=set_sec_elapse_events_query(session, game_ids)
-    sec_elapse_events=pd.read_sql_query(sec_elapse_events_query.statement, session.bind)
+    sec_elapse_events=read_query_frame(sec_elapse_events_query.statement, session.bind)
     del sec_elapse_events['prior_id']
     sec_elapse_events = clip_sec_categories(sec_elapse_events)
     return sec_elapse_events
@@ -1,6 +1,7 @@
 import pandas as pd
 from sqlalchemy import (and_, or_, case, func, literal)
 from sqlalchemy.orm import aliased
+from .duckdb_mirror import read_query_frame
 from .nba_game_event_players import GameEventPlayer
 from .nba_game_events import GameEvent
 from .nba_game_shots import GameShot
@@ -9,7 +10,7 @@ from .nba_game_win_prob import GameWinProbEvent
 
 def get_game_events(session, game_ids):
     game_events_query=set_game_events_query(session, game_ids)
-    game_events=pd.read_sql_query(game_events_query.statement, session.bind)
+    game_events=read_query_frame(game_events_query.statement, session.bind)
     game_events=add_action_categories(game_events)
     game_events = game_events.sort_values(by=['game_id','model_event_num','sub_event_num'])
     game_events=fill_missing_sequence(game_events)
@@ -158,20 +159,31 @@ def add_poss_pts_data(session, game_events, game_ids):
 
 def prior_events_data(session, game_events, game_ids):
     PriorWPEvent = aliased(GameWinProbEvent)
-    prior_events = (session.query(GameWinProbEvent.id,
-                                  GameWinProbEvent.game_id,
-                                  GameWinProbEvent.event_num,
-                                  func.max(PriorWPEvent.id).label('prior_win_prob_event_id'),
-                                  PriorWPEvent.home_poss_ind,
-                                  PriorWPEvent.home_pts,
-                                  PriorWPEvent.away_pts)
-                           .filter(PriorWPEvent.game_id==GameWinProbEvent.game_id)
-                           .filter(PriorWPEvent.period==GameWinProbEvent.period)
-                           .filter(GameWinProbEvent.id>PriorWPEvent.id)
-                           .filter(PriorWPEvent!=None)
-                           .filter(GameWinProbEvent.event_num!=None)
-                           .filter(GameWinProbEvent.game_id.in_(game_ids))
-                           .group_by(GameWinProbEvent.id))
+    prior_event_ids = (session.query(GameWinProbEvent.id,
+                                     GameWinProbEvent.game_id,
+                                     GameWinProbEvent.event_num,
+                                     func.max(PriorWPEvent.id).label('prior_win_prob_event_id'))
+                              .filter(PriorWPEvent.game_id==GameWinProbEvent.game_id)
+                              .filter(PriorWPEvent.period==GameWinProbEvent.period)
+                              .filter(GameWinProbEvent.id>PriorWPEvent.id)
+                              .filter(PriorWPEvent!=None)
+                              .filter(GameWinProbEvent.event_num!=None)
+                              .filter(GameWinProbEvent.game_id.in_(game_ids))
+                              .group_by(GameWinProbEvent.id,
+                                        GameWinProbEvent.game_id,
+                                        GameWinProbEvent.event_num)).subquery()
+    # the prior event's columns are joined from its row instead of relying on
+    # sqlite returning bare columns from the max() row
+    PriorEvent = aliased(GameWinProbEvent)
+    prior_events = (session.query(prior_event_ids.c.id,
+                                  prior_event_ids.c.game_id,
+                                  prior_event_ids.c.event_num,
+                                  prior_event_ids.c.prior_win_prob_event_id,
+                                  PriorEvent.home_poss_ind,
+                                  PriorEvent.home_pts,
+                                  PriorEvent.away_pts)
+                           .join(PriorEvent,
+                                 PriorEvent.id==prior_event_ids.c.prior_win_prob_event_id))
     return prior_events
 
 def is_jumpball(game_events):
@@ -1,4 +1,5 @@
 from ..utilities.date_utilities import format_datetime_string
+from ..utilities.sqlalchemy_utilities import get_record_transformer
 from .processing_config import basketball_rename_fields as rename_fields
 from .processing_config import basketball_date_fields as date_fields
 from .processing_config import basketball_integer_fields as integer_fields
@@ -105,3 +106,114 @@ class NBADataInstance():
         for key, value in kwargs.items():
             if key in self.instance:
                 self.instance[key]=value
+
+class NBARowTransformer():
+    # NBADataInstance worked out once per table, rows come out as records in column order
+    def __init__(self, tableClass):
+        self.tableClass=tableClass
+        self.table_name=tableClass.__table__.name
+        record_transformer=get_record_transformer(tableClass)
+        self.column_names=record_transformer.column_names
+        self.column_index=record_transformer.column_index
+        self.defaults=list(record_transformer.defaults)
+        self.rename_items=list(rename_fields.get(self.table_name, {}).items())
+        self.date_keys=set(date_fields.get(self.table_name, []))
+        self.integer_keys=set(integer_fields.get(self.table_name, []))
+        self.event_id_index=self.column_index.get('event_id')
+        self.fg2_indexes=[self.get_indexes(keys) for keys in [('fg2a', 'fga', 'fg3a'),
+                                                              ('fg2m', 'fgm', 'fg3m')]]
+        self.fg2_indexes=[indexes for indexes in self.fg2_indexes if indexes is not None]
+        self.min_index=self.column_index.get('min')
+        self.sec_index=self.column_index.get('sec')
+        self.plans={}
+
+    def get_indexes(self, keys):
+        if all(key in self.column_index for key in keys):
+            return tuple(self.column_index[key] for key in keys)
+        return None
+
+    def get_plan(self, keys):
+        # renames are replayed on the header positions, so each key is resolved once
+        if keys not in self.plans:
+            sources=dict((key, i) for i, key in enumerate(keys))
+            for key, new_key in self.rename_items:
+                if key in sources:
+                    sources[new_key]=sources.pop(key)
+            self.plans[keys]=[(i, self.column_index[key],
+                               key in self.date_keys, key in self.integer_keys)
+                              for key, i in sources.items() if key in self.column_index]
+        return self.plans[keys]
+
+    def get_constraint_getter(self, column_names):
+        constraint_indexes=[self.column_index[column_name] for column_name in column_names]
+        return lambda record: tuple(record[i] for i in constraint_indexes)
+
+    def get_records(self, rows, event_ids=True, **kwargs):
+        # rows are (keys, values) pairs, event ids count every row from one
+        updates=[(self.column_index[key], value) for key, value in kwargs.items()
+                 if key in self.column_index]
+        records=[]
+        for i, (keys, values) in enumerate(rows):
+            records.append(self.get_record(keys, values, i + 1 if event_ids else None,
+                                           kwargs, updates))
+        return records
+
+    def get_record(self, keys, values, event_id, kwargs, updates):
+        record=self.defaults.copy()
+        if keys and values:
+            for i, column_i, is_date, is_integer in self.get_plan(keys):
+                value=values[i]
+                if is_date and value is not None:
+                    value=format_datetime_string(value)
+                if is_integer:
+                    try:
+                        value=int(value)
+                    except:
+                        pass
+                if value is not None:
+                    record[column_i]=value
+            if event_id and self.event_id_index is not None:
+                record[self.event_id_index]=event_id
+            for fg2_i, fg_i, fg3_i in self.fg2_indexes:
+                record[fg2_i]=record[fg_i] - record[fg3_i]
+            if self.min_index is not None:
+                self.fill_sec_data(record)
+            for i, value in enumerate(record):
+                if isinstance(value, str):
+                    record[i]=value.strip()
+        if kwargs:
+            self.update(record, kwargs, updates)
+        return tuple(record)
+
+    def fill_sec_data(self, record):
+        # sec is still worked out without a sec column, so bad minutes raise the same way
+        min_value=record[self.min_index]
+        if min_value is not None:
+            sec=None
+            try:
+                min, sec=min_value.split(':')
+                sec=int(min) * 60 + int(sec)
+            except AttributeError:
+                if min_value==0:
+                    sec=0
+            if sec is not None and self.sec_index is not None:
+                record[self.sec_index]=sec
+
+    def update(self, record, kwargs, updates):
+        column_index=self.column_index
+        if 'home_team_id' in kwargs:
+            home_away=record[column_index['team_id']] == kwargs.get('home_team_id')
+            if 'home_away' in column_index:
+                record[column_index['home_away']]=home_away
+        if 'game_date' in kwargs:
+            if record[column_index['game_date_est']] is None:
+                record[column_index['game_date_est']]=kwargs.get('home_team_id')
+        for i, value in updates:
+            record[i]=value
+
+row_transformers={}
+
+def get_row_transformer(tableClass):
+    if tableClass not in row_transformers:
+        row_transformers[tableClass]=NBARowTransformer(tableClass)
+    return row_transformers[tableClass]
@@ -1,8 +1,13 @@
 import pandas as pd
-from nba_data.utilities.sqlalchemy_utilities import bulk_insert_records
-from .db_config import (Engine, Session)
+from nba_data.utilities.collection_classes import JSONPayload
+from nba_data.utilities.sqlalchemy_utilities import bulk_merge_records
+from .db_config import Engine
+from .duckdb_mirror import invalidate_tables
+from .season_partitions import Partitions
 from .processing_config import basketball_resultSets as resultSets
 from .processing_config import basketball_bundles as bundles
+from .processing_config import basketball_columnar_tables as columnar_tables
+from .processing_config import basketball_columnar_min_rows as columnar_min_rows
 from .nba_game_event_players import GameEventPlayer
 from .nba_game_events import GameEvent
 from .nba_game_officials import GameOfficial
@@ -14,15 +19,35 @@ from .nba_game_win_prob import GameWinProbEvent
 from .nba_games import Game
 from .nba_player_boxes import PlayerBoxScore
 from .nba_team_boxes import TeamBoxScore
-from .nba_instance import NBADataInstance
+from .nba_instance import get_row_transformer
+from .nba_instance_frame import (NBADataFrame, is_columnar_result_set)
 
 class NBAInstanceContainer():
     def __init__(self, tableClass, sport, season):
         self.tableClass=tableClass
         self.table_name=tableClass.__table__.name
+        self.columnar=self.table_name in columnar_tables
+        self.columnar_min_rows=columnar_min_rows
+        self.row_transformer=get_row_transformer(tableClass)
+        self.constraint_names=[c.name for c in bundles[self.table_name].c]
+        self.get_record_constraints=(self.row_transformer
+                                         .get_constraint_getter(self.constraint_names))
         self.set_resultSets()
         self.instances=[]
-        self.set_constraints(sport, season)
+        # columnar payloads wait here so the transform path is picked for the batch
+        self.pending=[]
+        self.pending_rows=0
+        self.frame_row_count=0
+        # keys seen since the last insert, stored rows are skipped by the database
+        self.constraints=set()
+        self.set_partition(sport, season)
+
+    def set_partition(self, sport, season):
+        # players are not scoped by season so they stay in the main database
+        if self.table_name!='players':
+            self.engine=Partitions.get_engine(sport, season)
+        else:
+            self.engine=Engine
 
     def set_resultSets(self):
         if self.table_name in resultSets:
@@ -30,40 +55,60 @@ class NBAInstanceContainer():
         else:
             self.resultSets=None
 
-    def set_constraints(self, sport, season):
-        session=Session()
-        if self.table_name!='players':
-            query_records=(session.query(bundles[self.table_name])
-                                  .filter(self.tableClass.sport==sport)
-                                  .filter(self.tableClass.season==season)
-                                  .all())
-        else:
-            query_records=(session.query(bundles[self.table_name])
-                                  .all())
-        self.constraints=set(record[0] for record in query_records)
-        session.close()
-
     def update_constraints(self, instance_contraints):
         self.constraints|={instance_contraints}
 
     def get_instance_contraints(self, instance):
-        instance_contraints=tuple(instance[c.name] for c in bundles[self.table_name].c)
+        instance_contraints=self.get_record_constraints(instance)
         return instance_contraints
 
     def add(self, data, **kwargs):
-        row_data=self.transform_data(data)
-        for i, row in enumerate(row_data):
-            event_id = i + 1
-            nba_instance=NBADataInstance(self.tableClass, row, event_id=event_id, **kwargs)
-            if self.validate_instance(nba_instance.instance):
-                self.instances.append(nba_instance.instance)
+        if self.columnar:
+            result_sets=get_result_sets(data, self.resultSets)
+            if all(is_columnar_result_set(result_set) for result_set in result_sets):
+                self.pending.append((result_sets, kwargs))
+                self.pending_rows+=sum(len(result_set['rowSet']) for result_set in result_sets)
+                if self.pending_rows >= self.columnar_min_rows:
+                    self.add_pending()
+                return
+        # rows stay in the order their payloads were added
+        self.add_pending()
+        self.add_records(self.row_transformer.get_records(self.get_row_items(data), **kwargs))
+
+    def add_records(self, records):
+        for record in records:
+            if self.validate_instance(record):
+                self.instances.append(record)
             # else:
             #     print('Error duplicate record for: {}\n'.format(self.table_name))
-            #     print(nba_instance.instance)
+            #     print(record)
+
+    def add_pending(self):
+        if self.pending_rows >= self.columnar_min_rows:
+            self.add_frame(self.pending)
+        else:
+            for result_sets, kwargs in self.pending:
+                row_items=self.get_result_set_items(result_sets)
+                self.add_records(self.row_transformer.get_records(row_items, **kwargs))
+        self.pending=[]
+        self.pending_rows=0
+
+    def add_frame(self, payloads):
+        nba_frame=NBADataFrame(self.tableClass, payloads)
+        records=nba_frame.get_column_tuples(self.row_transformer.column_names)
+        for record, instance_contraints in zip(records,
+                                               nba_frame.get_column_tuples(self.constraint_names)):
+            if instance_contraints not in self.constraints:
+                self.update_constraints(instance_contraints)
+                self.instances.append(record)
+        self.frame_row_count+=len(records)
 
     def insert(self):
+        self.add_pending()
         if self.instances:
-            bulk_insert_records(Engine, self.instances, self.tableClass, batchsize=500000)
+            bulk_merge_records(self.engine, self.instances, self.tableClass,
+                               self.constraint_names, batchsize=500000)
+            invalidate_tables(self.engine, self.tableClass)
             self.flush()
 
     def validate_instance(self, instance):
@@ -76,6 +121,26 @@ class NBAInstanceContainer():
 
     def flush(self):
         self.instances=[]
+        self.constraints=set()
+
+    def get_row_items(self, data):
+        # plain result set rows skip the row dicts, their headers are resolved once
+        if self.table_name in ['game_players', 'games', 'game_teams', 'game_event_players',
+                               'game_officials']:
+            return [(tuple(row), tuple(row.values())) for row in self.transform_data(data)]
+        return self.get_result_set_items(get_result_sets(data, self.resultSets))
+
+    def get_result_set_items(self, result_sets):
+        row_items=[]
+        for result_set in result_sets:
+            keys=tuple(h.lower() for h in result_set['headers'])
+            for row_set in result_set['rowSet']:
+                if len(row_set)==len(keys):
+                    row_items.append((keys, row_set))
+                else:
+                    row=dict(zip(keys, row_set))
+                    row_items.append((tuple(row), tuple(row.values())))
+        return row_items
 
     def transform_data(self, data):
         if self.table_name == 'game_players':
@@ -95,61 +160,56 @@ class NBAInstanceContainer():
 
     def get_nba_data_game_players(self, box_score_data, game_summary_data):
         row_data = {}
-        for result_set in box_score_data['resultSets']:
-            if result_set['name'] == 'PlayerStats':
-                keys = [h.lower() for h in result_set['headers']]
-                for row_set in result_set['rowSet']:
-                    row=dict(zip(keys, row_set))
-                    row.update({'inactive': False})
-                    row_data.update({row['player_id']: row})
-        for result_set in game_summary_data['resultSets']:
-            if result_set['name'] == 'InactivePlayers':
-                keys = [h.lower() for h in result_set['headers']]
-                for row_set in result_set['rowSet']:
-                    row=dict(zip(keys, row_set))
-                    if 'player_id' in row:
-                        if row['player_id'] in row_data:
-                            row_data[row['player_id']].update({'inactive': True})
-                        else:
-                            player_name='{} {}'.format(row['first_name'], row['last_name'])
-                            row.update({'inactive': True})
-                            row.update({'player_name': player_name})
-                            row_data.update({row['player_id']: row})
+        for result_set in get_result_sets(box_score_data, 'PlayerStats'):
+            keys = [h.lower() for h in result_set['headers']]
+            for row_set in result_set['rowSet']:
+                row=dict(zip(keys, row_set))
+                row.update({'inactive': False})
+                row_data.update({row['player_id']: row})
+        for result_set in get_result_sets(game_summary_data, 'InactivePlayers'):
+            keys = [h.lower() for h in result_set['headers']]
+            for row_set in result_set['rowSet']:
+                row=dict(zip(keys, row_set))
+                if 'player_id' in row:
+                    if row['player_id'] in row_data:
+                        row_data[row['player_id']].update({'inactive': True})
+                    else:
+                        player_name='{} {}'.format(row['first_name'], row['last_name'])
+                        row.update({'inactive': True})
+                        row.update({'player_name': player_name})
+                        row_data.update({row['player_id']: row})
         return list(row_data.values())
 
     def get_nba_data_games(self, schedule_data):
         row_data = {}
-        for result_set in schedule_data['resultSets']:
-            if result_set['name'] == 'GameHeader':
-                keys = [h.lower() for h in result_set['headers']]
-                for row_set in result_set['rowSet']:
-                    row=dict(zip(keys, row_set))
-                    if row['game_id'] not in row_data:
-                        row_data.update({row['game_id']: row})
-        for result_set in schedule_data['resultSets']:
-            if result_set['name'] == 'Available':
-                keys = [h.lower() for h in result_set['headers']]
-                for row_set in result_set['rowSet']:
-                    row=dict(zip(keys, row_set))
-                    if 'game_id' in row:
-                        if row['game_id'] in row_data:
-                            row_data[row['game_id']].update({'pt_available': row['pt_available']})
+        for result_set in get_result_sets(schedule_data, 'GameHeader'):
+            keys = [h.lower() for h in result_set['headers']]
+            for row_set in result_set['rowSet']:
+                row=dict(zip(keys, row_set))
+                if row['game_id'] not in row_data:
+                    row_data.update({row['game_id']: row})
+        for result_set in get_result_sets(schedule_data, 'Available'):
+            keys = [h.lower() for h in result_set['headers']]
+            for row_set in result_set['rowSet']:
+                row=dict(zip(keys, row_set))
+                if 'game_id' in row:
+                    if row['game_id'] in row_data:
+                        row_data[row['game_id']].update({'pt_available': row['pt_available']})
         return list(row_data.values())
 
     def get_nba_data_game_teams(self, nba_data):
         row_data = {}
         for result_set_name in self.resultSets:
-            for result_set in nba_data['resultSets']:
-                if result_set['name'] == result_set_name:
-                    keys = [h.lower() for h in result_set['headers']]
-                    for row_set in result_set['rowSet']:
-                        row=dict(zip(keys, row_set))
-                        if 'team_id' in row:
-                            if row['team_id'] not in row_data:
-                                row_data.update({row['team_id']: row})
-                            else:
-                                row_data[row['team_id']] = {**row_data[row['team_id']],
-                                                            **row}
+            for result_set in get_result_sets(nba_data, result_set_name):
+                keys = [h.lower() for h in result_set['headers']]
+                for row_set in result_set['rowSet']:
+                    row=dict(zip(keys, row_set))
+                    if 'team_id' in row:
+                        if row['team_id'] not in row_data:
+                            row_data.update({row['team_id']: row})
+                        else:
+                            row_data[row['team_id']] = {**row_data[row['team_id']],
+                                                        **row}
         return list(row_data.values())
 
     def get_nba_data_event_players(self, nba_event_data):
@@ -209,10 +269,16 @@ class NBAInstanceContainer():
 
     def get_nba_data_single_result_set(self, nba_data):
         row_data=[]
-        for result_set in nba_data['resultSets']:
-            if result_set['name']==self.resultSets:
-                keys=[h.lower() for h in result_set['headers']]
-                for row_set in result_set['rowSet']:
-                    row=dict(zip(keys, row_set))
-                    row_data.append(row)
+        for result_set in get_result_sets(nba_data, self.resultSets):
+            keys=[h.lower() for h in result_set['headers']]
+            for row_set in result_set['rowSet']:
+                row=dict(zip(keys, row_set))
+                row_data.append(row)
         return row_data
+
+def get_result_sets(nba_data, name):
+    # staged payloads decode only the named result set
+    if isinstance(nba_data, JSONPayload):
+        result_set = nba_data.get_result_set(name)
+        return [result_set] if result_set is not None else []
+    return [result_set for result_set in nba_data['resultSets'] if result_set['name'] == name]
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+from ..utilities.date_utilities import format_datetime_string
+from .processing_config import basketball_rename_fields as rename_fields
+from .processing_config import basketball_date_fields as date_fields
+from .processing_config import basketball_integer_fields as integer_fields
+
+# inferred column types that can not hold text, so strip_text skips them
+UNSTRIPPED_TYPES = {'empty', 'integer', 'floating', 'mixed-integer-float', 'boolean',
+                    'decimal', 'complex'}
+
+class NBADataFrame():
+    # the columnar counterpart of NBADataInstance, rows come out identical;
+    # payloads are (result_sets, kwargs) pairs, result sets sharing headers are
+    # transformed together and event ids restart for every payload like the row path
+    def __init__(self, tableClass, payloads, event_ids=True):
+        self.tableClass=tableClass
+        self.table_name=tableClass.__table__.name
+        self.columns=[col for col in tableClass.__table__.c if not col.primary_key]
+        self.extra_columns=[]
+        header_groups, segments=self.get_header_groups(payloads)
+        frames=[]
+        for keys, group in header_groups.items():
+            data=self.get_result_set_frame(keys, group['rows'])
+            data=self.rename_data_fields(data)
+            data=self.reformat_date_fields(data)
+            data=self.reformat_integer_fields(data)
+            frames.append(self.fill(data, self.get_event_ids(group) if event_ids else None))
+        columns=self.concat(frames, self.get_row_order(header_groups, segments))
+        self.update(columns, self.get_payload_ranges(payloads, segments))
+        self.frame=pd.DataFrame(columns, dtype=object)
+
+    def get_header_groups(self, payloads):
+        header_keys={}
+        header_groups={}
+        segments=[]
+        for payload_index, (result_sets, kwargs) in enumerate(payloads):
+            event_offset=0
+            for result_set in result_sets:
+                headers=tuple(result_set['headers'])
+                if headers not in header_keys:
+                    header_keys[headers]=tuple(h.lower() for h in headers)
+                keys=header_keys[headers]
+                group=header_groups.setdefault(keys, {'rows': [], 'event_offsets': [],
+                                                      'row_counts': []})
+                row_count=len(result_set['rowSet'])
+                segments.append((keys, len(group['rows']), row_count, payload_index))
+                group['event_offsets'].append(event_offset - len(group['rows']))
+                group['row_counts'].append(row_count)
+                group['rows']+=result_set['rowSet']
+                event_offset+=row_count
+        return header_groups, segments
+
+    def get_event_ids(self, group):
+        return (np.arange(1, len(group['rows']) + 1)
+                + np.repeat(np.array(group['event_offsets'], dtype=np.int64),
+                            group['row_counts']))
+
+    def get_row_order(self, header_groups, segments):
+        # groups are stacked one after another, this puts rows back in payload order
+        if len(header_groups) < 2:
+            return None
+        group_offsets={}
+        offset=0
+        for keys, group in header_groups.items():
+            group_offsets[keys]=offset
+            offset+=len(group['rows'])
+        return np.concatenate([np.arange(group_offsets[keys] + start,
+                                         group_offsets[keys] + start + row_count)
+                               for keys, start, row_count, payload_index in segments])
+
+    def get_payload_ranges(self, payloads, segments):
+        row_counts=[0] * len(payloads)
+        for keys, start, row_count, payload_index in segments:
+            row_counts[payload_index]+=row_count
+        payload_ranges=[]
+        start=0
+        for (result_sets, kwargs), row_count in zip(payloads, row_counts):
+            payload_ranges.append((start, start + row_count, kwargs))
+            start+=row_count
+        return payload_ranges
+
+    def get_result_set_frame(self, keys, rows):
+        columns={}
+        for key, values in zip(keys, zip(*rows)):
+            columns[key]=values
+        frame=pd.DataFrame(columns, index=pd.RangeIndex(len(rows)), dtype=object)
+        return frame
+
+    def rename_data_fields(self, data):
+        if self.table_name in rename_fields:
+            for key, new_key in rename_fields[self.table_name].items():
+                if key in data.columns:
+                    data[new_key]=data.pop(key)
+        return data
+
+    def reformat_date_fields(self, data):
+        if self.table_name in date_fields:
+            for key in date_fields[self.table_name]:
+                if key in data.columns:
+                    data[key]=pd.Series(map_unique(data[key].values, format_date_value),
+                                        index=data.index, dtype=object)
+        return data
+
+    def reformat_integer_fields(self, data):
+        if self.table_name in integer_fields:
+            for key in integer_fields[self.table_name]:
+                if key in data.columns:
+                    data[key]=pd.Series(map_unique(data[key].values, format_integer_value),
+                                        index=data.index, dtype=object)
+        return data
+
+    def create(self, row_count):
+        columns={}
+        for col in self.columns:
+            columns[col.name]=np.full(row_count,
+                                      col.default.arg if col.default is not None else None,
+                                      dtype=object)
+        return columns
+
+    def fill(self, data, event_ids):
+        columns=self.create(len(data.index))
+        for col in self.columns:
+            if col.name in data.columns:
+                values=data[col.name].values
+                columns[col.name]=np.where(values != None, values, columns[col.name])
+        if event_ids is not None and 'event_id' in columns:
+            columns['event_id']=event_ids.astype(object)
+        self.fill_fg2_data(columns)
+        self.fill_sec_data(columns)
+        self.strip_text(columns)
+        return columns
+
+    def fill_fg2_data(self, columns):
+        if all(key in columns for key in ['fg2a', 'fg3a', 'fga']):
+            columns['fg2a']=columns['fga'] - columns['fg3a']
+        if all(key in columns for key in ['fg2m', 'fg3m', 'fgm']):
+            columns['fg2m']=columns['fgm'] - columns['fg3m']
+
+    def fill_sec_data(self, columns):
+        if 'min' in columns:
+            sec_values=map_unique(columns['min'], get_sec_value)
+            if 'sec' not in columns:
+                # the row path adds sec only to the rows it could compute it for
+                if 'sec' not in self.extra_columns:
+                    self.extra_columns.append('sec')
+                columns['sec']=sec_values
+            else:
+                columns['sec']=np.where(sec_values != None, sec_values, columns['sec'])
+
+    def strip_text(self, columns):
+        for key, values in columns.items():
+            if pd.api.types.infer_dtype(values, skipna=True) in UNSTRIPPED_TYPES:
+                continue
+            try:
+                stripped=pd.Series(values, dtype=object).str.strip().values
+            except AttributeError:
+                continue
+            columns[key]=np.where(pd.isna(stripped), values, stripped)
+
+    def concat(self, frames, row_order=None):
+        column_names=[col.name for col in self.columns] + self.extra_columns
+        if len(frames) == 0:
+            frames=[self.create(0)]
+        columns={}
+        for column_name in column_names:
+            columns[column_name]=np.concatenate([frame.get(column_name,
+                                                           np.full(len(frame[self.columns[0].name]),
+                                                                   None, dtype=object))
+                                                 for frame in frames])
+            if row_order is not None:
+                columns[column_name]=columns[column_name][row_order]
+        return columns
+
+    def update(self, columns, payload_ranges):
+        keys=[]
+        for start, end, kwargs in payload_ranges:
+            if 'home_team_id' in kwargs:
+                home_team_id=kwargs.get('home_team_id')
+                if 'home_away' not in columns:
+                    columns['home_away']=np.full(len(columns['team_id']), None, dtype=object)
+                columns['home_away'][start:end]=[team_id == home_team_id
+                                                 for team_id in columns['team_id'][start:end]]
+            if 'game_date' in kwargs:
+                game_date_est=columns['game_date_est'][start:end]
+                game_date_est[game_date_est == None]=kwargs.get('home_team_id')
+            keys+=[key for key in kwargs if key not in keys]
+        # keyword values are spread over their payload rows in one pass per key
+        row_counts=[end - start for start, end, kwargs in payload_ranges]
+        for key in keys:
+            if key in columns and key not in self.extra_columns:
+                values=np.empty(len(payload_ranges), dtype=object)
+                present=np.zeros(len(payload_ranges), dtype=bool)
+                for i, (start, end, kwargs) in enumerate(payload_ranges):
+                    if key in kwargs:
+                        values[i]=kwargs[key]
+                        present[i]=True
+                columns[key]=np.where(np.repeat(present, row_counts),
+                                      np.repeat(values, row_counts), columns[key])
+
+    def get_column_tuples(self, column_names):
+        return list(zip(*[self.frame[column_name].tolist() for column_name in column_names]))
+
+    def get_instances(self):
+        column_names=[col.name for col in self.columns]
+        column_values=[self.frame[column_name].tolist() for column_name in column_names]
+        instances=[dict(zip(column_names, values)) for values in zip(*column_values)]
+        for column_name in self.extra_columns:
+            for instance, value in zip(instances, self.frame[column_name].tolist()):
+                if value is not None:
+                    instance[column_name]=value
+        return instances
+
+def map_unique(values, function):
+    # every distinct value is converted once, the same way as the row path
+    converted={}
+    mapped=np.empty(len(values), dtype=object)
+    for i, value in enumerate(values.tolist()):
+        try:
+            mapped[i]=converted[value]
+        except KeyError:
+            converted[value]=function(value)
+            mapped[i]=converted[value]
+        except TypeError:
+            mapped[i]=function(value)
+    return mapped
+
+def format_date_value(value):
+    if value is not None:
+        return format_datetime_string(value)
+    return value
+
+def format_integer_value(value):
+    try:
+        return int(value)
+    except:
+        return value
+
+def get_sec_value(value):
+    # None leaves sec untouched, matching NBADataInstance.fill_sec_data
+    if value is not None:
+        try:
+            min, sec=value.split(':')
+            return int(min) * 60 + int(sec)
+        except AttributeError:
+            if value==0:
+                return 0
+    return None
+
+def is_columnar_result_set(result_set):
+    key_count=len(result_set['headers'])
+    return key_count > 0 and all(len(row)==key_count for row in result_set['rowSet'])
@@ -1,6 +1,7 @@
 import pandas as pd
 from sqlalchemy import (and_, case, func, literal)
 from sqlalchemy.orm import aliased
+from .duckdb_mirror import read_query_frame
 from .nba_game_events import GameEvent
 from .nba_game_players import GamePlayer
 from .nba_game_starters import GameStarter
@@ -14,7 +15,7 @@ def get_period_start_sub_actions(session, game_events):
 def set_period_start_subs(session, game_events):
     period_min_events = get_period_min_events(game_events)
     period_start_subs_query = get_period_start_subs_query(session, game_events)
-    period_start_subs = pd.read_sql_query(period_start_subs_query.statement, session.bind)
+    period_start_subs = read_query_frame(period_start_subs_query.statement, session.bind)
     period_start_subs = pd.merge(left=period_start_subs,
                                  right=period_min_events,
                                  on=['game_id','period'],
@@ -1,5 +1,8 @@
-from datetime import datetime
-from ..staging.db_config import Session
+from sqlalchemy import (Column, MetaData, Table)
+from sqlalchemy.dialects.sqlite import VARCHAR
+from sqlalchemy.orm import Bundle
+from ..staging.db_config import (Engine, Session)
+from ..staging.processing_ledger import ProcessingLedger
 from ..staging.period_starters import StagePeriodStarters
 from ..staging.game_summary import StageGameSummary
 from ..staging.box_scores import StageBoxScore
@@ -10,6 +13,26 @@ from ..staging.win_prob import StageWinProb
 from ..staging.shot_chart import StageShotChart
 from ..staging.roster import StageRoster
 from ..staging.player import StagePlayer
+from .processing_config import basketball_unprocessed_yield_per as yield_per
+from .processing_config import basketball_unprocessed_chunk_size as chunk_size
+from ..utilities.sqlalchemy_utilities import get_chunks
+
+# game ids of the run, joined against instead of an IN list that can outgrow
+# the sqlite bound parameter limit over a full season
+unprocessed_game_ids=Table('unprocessed_game_ids', MetaData(),
+                           Column('game_id', VARCHAR(10), primary_key=True),
+                           prefixes=['TEMP'])
+
+# a staging row is only marked processed once every table built from it is inserted
+staging_dependents={StageSchedule: ['games'],
+                    StageGameSummary: ['game_teams', 'game_officials', 'game_players'],
+                    StageBoxScore: ['player_boxscores', 'team_boxscores', 'game_players'],
+                    StagePlayByPlay: ['game_events', 'game_event_players'],
+                    StagePeriodStarters: ['game_starters'],
+                    StageWinProb: ['game_win_prob_events'],
+                    StageShotChart: ['game_shots'],
+                    StageRoster: ['team_rosters'],
+                    StagePlayer: ['players']}
 
 class UnprocessedData():
     def __init__(self, sport, season):
@@ -17,122 +40,179 @@ class UnprocessedData():
         self.sport=sport
         self.season=season
         self.game_ids=set()
+        self.table_game_ids=set()
+        self.ledger=ProcessingLedger(sport, season)
+        self.watermarks=self.ledger.get_watermarks(self.session)
         self.set_unprocessed_date_count()
 
-    def commit(self):
-        # self.session.commit()
+    def commit(self, inserted_tables=()):
+        # the read transaction is closed first so the ledger update never waits on it
         self.session.close()
+        self.table_game_ids=set()
+        processed_tables=[tableClass for tableClass, table_names in staging_dependents.items()
+                          if all(table_name in inserted_tables for table_name in table_names)]
+        self.ledger.mark_processed(Engine, processed_tables, chunk_size)
         return True
 
+    def get_watermark(self, tableClass):
+        return self.ledger.get_watermark(self.watermarks, tableClass)
+
     def set_unprocessed_date_count(self):
+        watermark=self.get_watermark(StageSchedule)
         self.unprocessed_date_count=(self.session.query(StageSchedule)
                                          # .filter(StageSchedule.processed == False)
+                                         .filter(StageSchedule.id > watermark)
                                          .filter(StageSchedule.sport == self.sport)
                                          .filter(StageSchedule.season == self.season)
                                          .filter(StageSchedule.status_code == 200)
                                          .count())
 
+    def set_game_id_table(self):
+        # the temp table lives on the session connection, so it is only topped up
+        connection=self.session.connection()
+        if len(self.table_game_ids)==0:
+            unprocessed_game_ids.create(connection, checkfirst=True)
+        game_ids=sorted(self.game_ids - self.table_game_ids)
+        for game_id_chunk in get_chunks(game_ids, chunk_size):
+            connection.execute(unprocessed_game_ids.insert()
+                                                   .values([{'game_id': game_id}
+                                                            for game_id in game_id_chunk]))
+        self.table_game_ids|=set(game_ids)
+
+    def get_game_id_query(self, game_id, *entities):
+        self.set_game_id_table()
+        return (self.session.query(game_id, *entities)
+                            .join(unprocessed_game_ids,
+                                  unprocessed_game_ids.c.game_id==game_id))
+
     @property
     def dates(self):
-        dates=(self.session.query(StageSchedule)
+        dates=(self.session.query(StageSchedule.id,
+                                  StageSchedule.json)
                            .filter(StageSchedule.processed == False)
+                           .filter(StageSchedule.id > self.get_watermark(StageSchedule))
                            .filter(StageSchedule.sport == self.sport)
                            .filter(StageSchedule.season == self.season)
-                           .filter(StageSchedule.status_code == 200))
+                           .filter(StageSchedule.status_code == 200)
+                           .yield_per(yield_per))
         for unprocessed_date in dates:
             game_ids=self.get_game_ids(unprocessed_date)
-            self.update_processed_fields(unprocessed_date)
+            self.update_processed_fields(StageSchedule, unprocessed_date)
             yield unprocessed_date
 
     @property
     def shot_charts(self):
-        shot_charts=(self.session.query(StageShotChart)
+        shot_charts=(self.session.query(StageShotChart.id,
+                                        StageShotChart.json)
                                  .filter(StageShotChart.processed == False)
+                                 .filter(StageShotChart.id > self.get_watermark(StageShotChart))
                                  .filter(StageShotChart.sport == self.sport)
                                  .filter(StageShotChart.season == self.season)
-                                 .filter(StageShotChart.status_code == 200))
+                                 .filter(StageShotChart.status_code == 200)
+                                 .yield_per(yield_per))
         for unprocessed_shot_chart in shot_charts:
-            self.update_processed_fields(unprocessed_shot_chart)
+            self.update_processed_fields(StageShotChart, unprocessed_shot_chart)
             yield unprocessed_shot_chart
 
     @property
     def team_rosters(self):
-        team_rosters=(self.session.query(StageRoster)
+        team_rosters=(self.session.query(StageRoster.id,
+                                         StageRoster.json)
                                   .filter(StageRoster.processed == False)
+                                  .filter(StageRoster.id > self.get_watermark(StageRoster))
                                   .filter(StageRoster.sport == self.sport)
-                                  .filter(StageShotChart.season == self.season)
-                                  .filter(StageRoster.status_code == 200))
+                                  .filter(StageRoster.season == self.season)
+                                  .filter(StageRoster.status_code == 200)
+                                  .yield_per(yield_per))
         for unprocessed_roster in team_rosters:
-            self.update_processed_fields(unprocessed_roster)
+            self.update_processed_fields(StageRoster, unprocessed_roster)
             yield unprocessed_roster
 
     @property
     def players(self):
-        players=(self.session.query(StagePlayer)
+        players=(self.session.query(StagePlayer.id,
+                                    StagePlayer.json)
                              .filter(StagePlayer.processed == False)
-                             .filter(StagePlayer.status_code == 200))
+                             .filter(StagePlayer.id > self.get_watermark(StagePlayer))
+                             .filter(StagePlayer.status_code == 200)
+                             .yield_per(yield_per))
         for unprocessed_player in players:
-            self.update_processed_fields(unprocessed_player)
+            self.update_processed_fields(StagePlayer, unprocessed_player)
             yield unprocessed_player
 
     @property
     def game_players(self):
-        players=(self.session.query(StageBoxScore,
-                                    StageGameSummary)
-                             .filter(StageGameSummary.game_id==StageBoxScore.game_id)
-                             .filter(StageGameSummary.status_code == 200)
-                             .filter(StageGameSummary.game_id.in_(self.game_ids)))
-        for unprocessed_game_player in players:
-            yield unprocessed_game_player
+        players=(self.get_game_id_query(StageGameSummary.game_id,
+                                        Bundle('box_score',
+                                               StageBoxScore.game_id,
+                                               StageBoxScore.json),
+                                        Bundle('game_summary',
+                                               StageGameSummary.game_id,
+                                               StageGameSummary.json))
+                     .filter(StageGameSummary.game_id==StageBoxScore.game_id)
+                     .filter(StageGameSummary.status_code == 200)
+                     .yield_per(yield_per))
+        for game_id, box_score, game_summary in players:
+            yield box_score, game_summary
 
     @property
     def game_summaries(self):
-        summaries=(self.session.query(StageGameSummary)
-                               .filter(StageGameSummary.processed == False)
-                               .filter(StageGameSummary.status_code == 200)
-                               .filter(StageGameSummary.game_id.in_(self.game_ids)))
+        summaries=(self.get_game_id_query(StageGameSummary.game_id,
+                                          StageGameSummary.id,
+                                          StageGameSummary.json)
+                       .filter(StageGameSummary.processed == False)
+                       .filter(StageGameSummary.status_code == 200)
+                       .yield_per(yield_per))
         for unprocessed_game_summary in summaries:
-            self.update_processed_fields(unprocessed_game_summary)
+            self.update_processed_fields(StageGameSummary, unprocessed_game_summary)
             yield unprocessed_game_summary
 
     @property
     def box_scores(self):
-        box_scores=(self.session.query(StageBoxScore)
-                                .filter(StageBoxScore.processed == False)
-                                .filter(StageBoxScore.status_code == 200)
-                                .filter(StageBoxScore.game_id.in_(self.game_ids)))
+        box_scores=(self.get_game_id_query(StageBoxScore.game_id,
+                                           StageBoxScore.id,
+                                           StageBoxScore.json)
+                        .filter(StageBoxScore.processed == False)
+                        .filter(StageBoxScore.status_code == 200)
+                        .yield_per(yield_per))
         for unprocessed_box_score in box_scores:
-            self.update_processed_fields(unprocessed_box_score)
+            self.update_processed_fields(StageBoxScore, unprocessed_box_score)
             yield unprocessed_box_score
 
     @property
     def starters(self):
-        starters=(self.session.query(StagePeriodStarters)
-                              # .filter(StagePeriodStarters.processed == False)
-                              .filter(StagePeriodStarters.status_code == 200)
-                              .filter(StagePeriodStarters.game_id.in_(self.game_ids)))
+        starters=(self.get_game_id_query(StagePeriodStarters.game_id,
+                                         StagePeriodStarters.id,
+                                         StagePeriodStarters.json)
+                      # .filter(StagePeriodStarters.processed == False)
+                      .filter(StagePeriodStarters.status_code == 200)
+                      .yield_per(yield_per))
         for unprocessed_starter in starters:
-            self.update_processed_fields(unprocessed_starter)
+            self.update_processed_fields(StagePeriodStarters, unprocessed_starter)
             yield unprocessed_starter
 
     @property
     def events(self):
-        events=(self.session.query(StagePlayByPlay)
-                            .filter(StagePlayByPlay.processed == False)
-                            .filter(StagePlayByPlay.status_code == 200)
-                            .filter(StagePlayByPlay.game_id.in_(self.game_ids)))
+        events=(self.get_game_id_query(StagePlayByPlay.game_id,
+                                       StagePlayByPlay.id,
+                                       StagePlayByPlay.json)
+                    .filter(StagePlayByPlay.processed == False)
+                    .filter(StagePlayByPlay.status_code == 200)
+                    .yield_per(yield_per))
         for unprocessed_event in events:
-            self.update_processed_fields(unprocessed_event)
+            self.update_processed_fields(StagePlayByPlay, unprocessed_event)
             yield unprocessed_event
 
     @property
     def win_prob_events(self):
-        win_probs=(self.session.query(StageWinProb)
-                               # .filter(StageWinProb.processed == False)
-                               .filter(StageWinProb.status_code == 200)
-                               .filter(StageWinProb.game_id.in_(self.game_ids)))
+        win_probs=(self.get_game_id_query(StageWinProb.game_id,
+                                          StageWinProb.id,
+                                          StageWinProb.json)
+                       # .filter(StageWinProb.processed == False)
+                       .filter(StageWinProb.status_code == 200)
+                       .yield_per(yield_per))
         for unprocessed_win_prob_event in win_probs:
-            self.update_processed_fields(unprocessed_win_prob_event)
+            self.update_processed_fields(StageWinProb, unprocessed_win_prob_event)
             yield unprocessed_win_prob_event
 
     def get_game_ids(self, unprocessed_date):
@@ -148,9 +228,9 @@ class UnprocessedData():
             self.update_game_ids(game_ids)
         return game_ids
 
-    def update_processed_fields(self, sql_object):
-        sql_object.processed = True
-        sql_object.processed_date = datetime.now()
+    def update_processed_fields(self, tableClass, row):
+        # rows are read as plain columns, so the ids are kept for a bulk update
+        self.ledger.add(tableClass, row.id)
         return True
 
     def update_game_ids(self, game_ids):
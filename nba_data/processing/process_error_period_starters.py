@@ -1,11 +1,12 @@
 import pandas as pd
-from .db_config import Session
+from .duckdb_mirror import (invalidate_tables, read_query_frame)
+from .season_partitions import (Partitions, get_game_partition)
 from nba_data.processing.nba_game_starters import GameStarter
 
-def remove_error_period_starters(game_ids):
-    session = Session()
+def remove_error_period_starters(game_ids, sport=None, season=None):
+    session = get_partition_session(game_ids, sport, season)
     period_starters_query = session.query(GameStarter).filter(GameStarter.game_id.in_(game_ids))
-    period_starters = pd.read_sql_query(period_starters_query.statement, session.bind)
+    period_starters = read_query_frame(period_starters_query.statement, session.bind)
     starters_error_ids = []
     for group, df in period_starters.groupby(['sport','season','game_id','period',
                                               'team_id']):
@@ -15,5 +16,11 @@ def remove_error_period_starters(game_ids):
         delete_records = session.query(GameStarter).filter(GameStarter.id==str(error_id))
         delete_records.delete(synchronize_session=False)
     session.commit()
+    invalidate_tables(session.bind, GameStarter)
     session.close()
     return True
+
+def get_partition_session(game_ids, sport=None, season=None):
+    if (sport is None or season is None) and Partitions.is_enabled() and len(game_ids):
+        sport, season = get_game_partition(next(iter(game_ids)))
+    return Partitions.get_session(sport, season)
@@ -1,13 +1,14 @@
 import pandas as pd
-from .db_config import (Session, Engine)
+from .duckdb_mirror import invalidate_tables
+from .process_error_period_starters import get_partition_session
 from .nba_game_seq import GameSequence
 from .nba_game_seq_starts import GameSequenceStarters
 from .nba_game_seq_sec import GameSequenceSec
 from .nba_game_sequence_events import get_game_events
 from .nba_starter_events import get_period_start_sub_actions
 
-def process_game_sequences(game_ids):
-    session=Session()
+def process_game_sequences(game_ids, sport=None, season=None):
+    session=get_partition_session(game_ids, sport, season)
 
     game_events = get_game_events(session, game_ids)
     period_start_subs=get_period_start_sub_actions(session, game_events)
@@ -57,6 +58,7 @@ def insert_sequence_event_records(session, tableClass, events_df):
                               index=False,
                               chunksize=500000)
     session.commit()
+    invalidate_tables(session.bind, tableClass)
     return True
 
 def merge_game_events_and_sub_actions(game_events, period_start_sub_actions):
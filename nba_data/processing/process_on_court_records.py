@@ -1,11 +1,13 @@
 import pandas as pd
 from sqlalchemy import (and_, case, func, literal)
-from nba_data.processing.db_config import Session
+from nba_data.processing.duckdb_mirror import (invalidate_tables, read_query_frame)
+from nba_data.processing.nba_game_on_court import GameOnCourt
+from nba_data.processing.season_partitions import Partitions
 from nba_data.processing.nba_game_seq import GameSequence
 from nba_data.processing.nba_player_boxes import PlayerBoxScore
 
 def process_on_court_records(game_ids, sport, season):
-    session=Session()
+    session=Partitions.get_session(sport, season)
     on_court_events = get_on_court_events(session, game_ids, sport, season)
     on_court_events = add_on_court_ind(on_court_events)
     on_court_events = remove_off_court_records(on_court_events)
@@ -34,11 +36,12 @@ def insert_on_court_records(session, on_court_events):
                                     if_exists='append',
                                     index=False,
                                     chunksize=500000)
+    invalidate_tables(session.bind, GameOnCourt)
     return True
 
 def get_on_court_events(session, game_ids, sport, season):
     on_court_events_query=set_on_court_events_query(session, game_ids, sport, season)
-    on_court_events=pd.read_sql_query(on_court_events_query.statement, session.bind)
+    on_court_events=read_query_frame(on_court_events_query.statement, session.bind)
     return on_court_events
 
 def set_on_court_events_query(session, game_ids, sport, season):
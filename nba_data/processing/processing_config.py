@@ -108,3 +108,19 @@ basketball_date_fields={'games': ['game_date_est'],
 
 basketball_integer_fields={'players': ['weight','draft_year','draft_round',
                                        'draft_number']}
+
+# tables read from a single result set are transformed column by column
+basketball_columnar_tables=['game_events', 'game_win_prob_events', 'game_shots',
+                            'player_boxscores', 'team_boxscores', 'game_starters',
+                            'team_rosters', 'players']
+
+# columnar payloads are buffered until this many rows and transformed as one frame,
+# a smaller batch goes through the compiled row transformer
+basketball_columnar_min_rows=10000
+
+# staged rows are streamed in pages of this size while processing a season
+basketball_unprocessed_yield_per=100
+
+# game ids are written to the temp join table this many at a time, under the
+# sqlite bound parameter limit
+basketball_unprocessed_chunk_size=500
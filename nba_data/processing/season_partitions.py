@@ -0,0 +1,183 @@
+from contextlib import contextmanager
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from nba_data.utilities.collection_config import (nba_league_id_dict,
+                                                  processing_partition_config)
+from nba_data.utilities.sqlite_engine import (create_sqlite_engine, set_engine_profile)
+from .db_config import (Base, Engine, Session, db_path)
+import os
+import re
+
+PARTITION_FILE_PATTERN = re.compile(r'^nba_data_([a-z_]+)_(\d{4})\.db$')
+
+class SeasonPartitions():
+    def __init__(self, partition_dir=None, env_var=None, profile='safe', max_attached=10):
+        self.partition_dir = (os.environ.get(env_var) if env_var else None) or partition_dir
+        self.profile = profile
+        self.max_attached = max_attached
+        self.engines = {}
+        self.sessionmakers = {}
+        self.union_engines = {}
+        self.lock = Lock()
+
+    def is_enabled(self):
+        return self.partition_dir is not None
+
+    def get_partition_path(self, sport, season):
+        return os.path.join(self.partition_dir, 'nba_data_{}_{}.db'.format(sport, season))
+
+    def get_partitions(self):
+        if not self.is_enabled() or not os.path.isdir(self.partition_dir):
+            return []
+        partitions = []
+        for file_name in os.listdir(self.partition_dir):
+            match = PARTITION_FILE_PATTERN.match(file_name)
+            if match is not None:
+                partitions.append((match.group(1), int(match.group(2))))
+        return sorted(partitions)
+
+    def get_engine(self, sport, season):
+        if not self.is_enabled():
+            return Engine
+        with self.lock:
+            if (sport, season) not in self.engines:
+                os.makedirs(self.partition_dir, exist_ok=True)
+                engine = create_sqlite_engine(self.get_partition_path(sport, season),
+                                              self.profile)
+                Base.metadata.create_all(bind=engine, tables=get_partitioned_tables(),
+                                         checkfirst=True)
+                self.engines[(sport, season)] = engine
+                self.sessionmakers[(sport, season)] = sessionmaker(bind=engine)
+            return self.engines[(sport, season)]
+
+    def get_session(self, sport, season):
+        if not self.is_enabled():
+            return Session()
+        self.get_engine(sport, season)
+        return self.sessionmakers[(sport, season)]()
+
+    def set_profile(self, profile):
+        previous_profile = self.profile
+        self.profile = profile
+        with self.lock:
+            for engine in self.engines.values():
+                set_engine_profile(engine, profile)
+        return previous_profile
+
+    @contextmanager
+    def use_profile(self, profile):
+        previous_profile = self.set_profile(profile)
+        try:
+            yield self
+        finally:
+            self.set_profile(previous_profile)
+
+    def get_union_engine(self, partitions):
+        # reads run against the main database, with every partitioned table
+        # shadowed by a temp view over the attached partition files
+        partitions = tuple(sorted(set(partitions)))
+        if len(partitions) > self.max_attached:
+            raise ValueError('Can not attach {} partitions, the limit is {}'
+                             .format(len(partitions), self.max_attached))
+        for sport, season in partitions:
+            self.get_engine(sport, season)
+        with self.lock:
+            if partitions not in self.union_engines:
+                self.union_engines[partitions] = self.create_union_engine(partitions)
+            return self.union_engines[partitions]
+
+    def create_union_engine(self, partitions):
+        engine = create_sqlite_engine(db_path, 'fast')
+        engine.season_partitions = partitions
+        schemas = [(get_schema_name(sport, season), self.get_partition_path(sport, season))
+                   for sport, season in partitions]
+
+        @event.listens_for(engine, 'connect')
+        def attach_partitions(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for schema, partition_path in schemas:
+                cursor.execute('ATTACH DATABASE ? AS {}'.format(schema), (partition_path, ))
+            for table in get_partitioned_tables():
+                columns = ', '.join(column.name for column in table.c)
+                selects = ' UNION ALL '.join('SELECT {} FROM {}.{}'.format(columns, schema,
+                                                                           table.name)
+                                             for schema, partition_path in schemas)
+                cursor.execute('CREATE TEMP VIEW {} AS {}'.format(table.name, selects))
+            cursor.close()
+
+        return engine
+
+    def get_window_session(self, sport, season, season_count):
+        if not self.is_enabled():
+            return Session()
+        partitions = [(sport, window_season)
+                      for window_season in range(season - season_count + 1, season + 1)
+                      if os.path.exists(self.get_partition_path(sport, window_season))]
+        if (sport, season) not in partitions:
+            partitions.append((sport, season))
+        return sessionmaker(bind=self.get_union_engine(partitions))()
+
+    def get_game_session(self, game_id, season_count=1):
+        if not self.is_enabled():
+            return Session()
+        sport, season = get_game_partition(game_id)
+        return self.get_window_session(sport, season, season_count)
+
+    def split_database(self, partitions=None):
+        # copies the partitioned tables of the main database into season files
+        partitions = partitions if partitions is not None else get_main_partitions()
+        for sport, season in partitions:
+            engine = self.get_engine(sport, season)
+            with engine.connect() as connection:
+                connection.execute('ATTACH DATABASE ? AS source', (db_path, ))
+                with connection.begin():
+                    for table in get_partitioned_tables():
+                        columns = ', '.join(column.name for column in table.c)
+                        connection.execute('INSERT OR IGNORE INTO {table} ({columns}) '
+                                           'SELECT {columns} FROM source.{table} '
+                                           'WHERE sport = ? AND season = ?'
+                                           .format(table=table.name, columns=columns),
+                                           (sport, season))
+                connection.execute('DETACH DATABASE source')
+            print('Split {} {} into {}'.format(sport, season,
+                                               self.get_partition_path(sport, season)))
+        return partitions
+
+    def remove_partition(self, sport, season):
+        # a partition is rebuilt by removing its file and processing the season again
+        with self.lock:
+            engine = self.engines.pop((sport, season), None)
+            self.sessionmakers.pop((sport, season), None)
+            for partitions in [partitions for partitions in self.union_engines
+                               if (sport, season) in partitions]:
+                self.union_engines.pop(partitions).dispose()
+        if engine is not None:
+            engine.dispose()
+        partition_path = self.get_partition_path(sport, season)
+        for suffix in ['', '-wal', '-shm', '-journal']:
+            if os.path.exists(partition_path + suffix):
+                os.remove(partition_path + suffix)
+        return True
+
+def get_partitioned_tables():
+    return [table for table in Base.metadata.sorted_tables
+            if 'sport' in table.c and 'season' in table.c]
+
+def get_schema_name(sport, season):
+    return 'p_{}_{}'.format(sport, season)
+
+def get_game_partition(game_id):
+    # game ids start with the league id and carry the season's two digit year
+    sport_lookup = dict((league_id, sport) for sport, league_id in nba_league_id_dict.items())
+    return sport_lookup[game_id[:2]], 2000 + int(game_id[3:5])
+
+def get_main_partitions():
+    partitions = set()
+    for table in get_partitioned_tables():
+        partitions |= set(tuple(row) for row in
+                          Engine.execute('SELECT DISTINCT sport, season FROM {}'
+                                         .format(table.name)))
+    return sorted(partitions)
+
+Partitions = SeasonPartitions(**processing_partition_config)
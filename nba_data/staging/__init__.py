@@ -1,13 +1,22 @@
 from . import box_scores
+from . import collection_journal
+from . import columnar_store
 from . import db_config
+from . import fetch_manifest
 from . import game_summary
+from . import nba_collection_job
 from . import nba_staging_instance_config
 from . import nba_staging_instances
+from . import payload_compression
 from . import period_starters
 from . import play_by_play
+from . import processing_ledger
 from . import player
 from . import roster
 from . import schedule
 from . import season
+from . import season_index
 from . import shot_chart
+from . import shot_chart_planner
+from . import staging_writer
 from . import win_prob
@@ -0,0 +1,52 @@
+from threading import Lock
+import os
+import pickle
+import sqlite3
+
+class CollectionJournal():
+    def __init__(self, journal_path, synchronous='NORMAL'):
+        self.journal_path = journal_path
+        journal_dir = os.path.dirname(journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self.connection = sqlite3.connect(journal_path,
+                                          isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous={}'.format(synchronous))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS journal ('
+                                'id INTEGER PRIMARY KEY, '
+                                'kind TEXT NOT NULL, '
+                                'payload BLOB NOT NULL)')
+        self.lock = Lock()
+
+    def append(self, kind, payload):
+        payload = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            cursor = self.connection.execute('INSERT INTO journal (kind, payload) '
+                                             'VALUES (?, ?)', (kind, payload))
+            return cursor.lastrowid
+
+    def remove(self, journal_ids):
+        journal_ids = [(journal_id, ) for journal_id in journal_ids if journal_id is not None]
+        if journal_ids:
+            with self.lock:
+                self.connection.execute('BEGIN')
+                self.connection.executemany('DELETE FROM journal WHERE id = ?', journal_ids)
+                self.connection.execute('COMMIT')
+        return len(journal_ids)
+
+    def get_entries(self):
+        with self.lock:
+            entries = self.connection.execute('SELECT id, kind, payload FROM journal '
+                                              'ORDER BY id').fetchall()
+        return [(journal_id, kind, pickle.loads(payload)) for journal_id, kind, payload in entries]
+
+    def get_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT count(*) FROM journal').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.connection.close()
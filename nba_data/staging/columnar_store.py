@@ -0,0 +1,183 @@
+from sqlalchemy import (and_, select)
+from .payload_compression import payload_tables
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# players are staged once for every sport and season
+UNSCOPED_PARTITION = ('all', 0)
+
+class ColumnarStore():
+    def __init__(self, store_dir, batchsize=500):
+        if pa is None:
+            raise RuntimeError('pyarrow is required for the columnar store')
+        self.store_dir = store_dir
+        self.batchsize = batchsize
+
+    def get_partition_dir(self, endpoint, sport, season, result_set_name):
+        return os.path.join(self.store_dir, endpoint, sport, str(season), result_set_name)
+
+    def get_watermark_path(self, endpoint):
+        return os.path.join(self.store_dir, endpoint, '_watermark.json')
+
+    def get_watermark(self, endpoint):
+        try:
+            with open(self.get_watermark_path(endpoint)) as f:
+                return json.load(f)['staging_id']
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def set_watermark(self, endpoint, staging_id):
+        watermark_path = self.get_watermark_path(endpoint)
+        os.makedirs(os.path.dirname(watermark_path), exist_ok=True)
+        tmp_path = '{}.tmp'.format(watermark_path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'staging_id': staging_id}, f)
+        os.replace(tmp_path, watermark_path)
+
+    def get_batch_query(self, tableClass, last_id):
+        columns = [tableClass.id, tableClass.json]
+        if 'sport' in tableClass.__table__.c:
+            columns += [tableClass.sport, tableClass.season]
+        return (select(columns)
+                .where(and_(tableClass.id > last_id,
+                            tableClass.status_code == 200,
+                            tableClass.json.isnot(None)))
+                .order_by(tableClass.id)
+                .limit(self.batchsize))
+
+    def ingest_endpoint(self, engine, endpoint):
+        tableClass = payload_tables[endpoint]
+        last_id = self.get_watermark(endpoint)
+        ingested_count = 0
+        while True:
+            rows = engine.execute(self.get_batch_query(tableClass, last_id)).fetchall()
+            if len(rows) == 0:
+                break
+            partitions = {}
+            for row in rows:
+                partition = (row[2], row[3]) if len(row) > 2 else UNSCOPED_PARTITION
+                try:
+                    payload_json = row[1].get_data()
+                except ValueError:
+                    continue
+                add_payload_columns(partitions, partition, row[0], payload_json)
+            # part files are named by their staging id range, so a batch that is
+            # ingested again after a crash overwrites its earlier parts
+            part_names = {}
+            for (sport, season, result_set_name, headers), columns in partitions.items():
+                partition_dir = self.get_partition_dir(endpoint, sport, season, result_set_name)
+                variant = part_names.setdefault(partition_dir, 0)
+                part_names[partition_dir] += 1
+                part_name = 'part-{}-{}{}.arrow'.format(rows[0][0], rows[-1][0],
+                                                        '-{}'.format(variant) if variant else '')
+                self.write_part(os.path.join(partition_dir, part_name),
+                                get_result_set_table(columns))
+            last_id = rows[-1][0]
+            self.set_watermark(endpoint, last_id)
+            ingested_count += len(rows)
+        print('Ingested {} {} payloads into the columnar store'.format(ingested_count,
+                                                                        endpoint))
+        return ingested_count
+
+    def ingest(self, engine, endpoints=None):
+        endpoints = endpoints if endpoints is not None else list(payload_tables)
+        return dict((endpoint, self.ingest_endpoint(engine, endpoint))
+                    for endpoint in endpoints)
+
+    def write_part(self, part_path, table):
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        tmp_path = '{}.tmp'.format(part_path)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, part_path)
+
+    def get_part_paths(self, endpoint, sport, season, result_set_name):
+        partition_dir = self.get_partition_dir(endpoint, sport, season, result_set_name)
+        if not os.path.isdir(partition_dir):
+            return []
+        return [os.path.join(partition_dir, file_name)
+                for file_name in sorted(os.listdir(partition_dir))
+                if file_name.endswith('.arrow')]
+
+    def read_result_set(self, endpoint, sport, season, result_set_name, columns=None,
+                        staging_ids=None):
+        # parts are memory mapped, so the columns are read without copying
+        tables = []
+        for part_path in self.get_part_paths(endpoint, sport, season, result_set_name):
+            with pa.memory_map(part_path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(['staging_id'] + [column for column in columns
+                                                       if column != 'staging_id'])
+            if staging_ids is not None:
+                table = table.filter(pc.is_in(table['staging_id'],
+                                              value_set=pa.array(sorted(staging_ids),
+                                                                 type=pa.int64())))
+            tables.append(table)
+        if len(tables) == 0:
+            return None
+        return concat_tables(tables)
+
+    def read_result_set_frame(self, endpoint, sport, season, result_set_name, columns=None,
+                              staging_ids=None):
+        table = self.read_result_set(endpoint, sport, season, result_set_name, columns,
+                                     staging_ids)
+        return table.to_pandas() if table is not None else None
+
+def get_column_names(headers):
+    column_names = []
+    for header in headers:
+        column_name = str(header).lower()
+        while column_name in column_names or column_name == 'staging_id':
+            column_name = '{}_'.format(column_name)
+        column_names.append(column_name)
+    return column_names
+
+def add_payload_columns(partitions, partition, staging_id, payload_json):
+    # result sets whose headers change within a batch are kept as separate parts
+    result_sets = payload_json.get('resultSets') if isinstance(payload_json, dict) else None
+    if not isinstance(result_sets, list):
+        return partitions
+    for result_set in result_sets:
+        headers = result_set.get('headers')
+        row_set = result_set.get('rowSet')
+        if (not isinstance(result_set.get('name'), str)
+                or not isinstance(headers, list) or not isinstance(row_set, list)
+                or not all(isinstance(header, str) for header in headers)):
+            continue
+        width = len(headers)
+        columns = partitions.setdefault(partition + (result_set.get('name'), tuple(headers)),
+                                        {'staging_id': [], 'headers': headers, 'rows': []})
+        columns['staging_id'] += [staging_id] * len(row_set)
+        columns['rows'] += [row if len(row) == width else (list(row) + [None] * width)[:width]
+                            for row in row_set]
+    return partitions
+
+def concat_tables(tables):
+    # parts written with different headers are unified, missing columns read as null
+    try:
+        return pa.concat_tables(tables, promote_options='default')
+    except TypeError:
+        return pa.concat_tables(tables, promote=True)
+
+def get_column_array(values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([str(value) if value is not None else None for value in values],
+                        type=pa.string())
+
+def get_result_set_table(columns):
+    column_names = get_column_names(columns['headers'])
+    column_values = list(zip(*columns['rows'])) if columns['rows'] else [()] * len(column_names)
+    arrays = [pa.array(columns['staging_id'], type=pa.int64())]
+    arrays += [get_column_array(list(values)) for values in column_values]
+    return pa.Table.from_arrays(arrays, names=['staging_id'] + column_names)
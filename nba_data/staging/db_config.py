@@ -1,11 +1,12 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from nba_data.utilities.collection_config import database_config
+from nba_data.utilities.sqlite_engine import (create_sqlite_engine, get_db_path)
 
 Base = declarative_base()
 
-db_path = '/Volumes/Sports Data/nba_staging_data.db'
+db_path = get_db_path('staging')
 
-Engine = create_engine('sqlite:///{}'.format(db_path))
+Engine = create_sqlite_engine(db_path, database_config['staging']['profile'])
 
 Session = sessionmaker(bind=Engine)
@@ -0,0 +1,254 @@
+from sqlalchemy import (Column, Index, UniqueConstraint, and_, func, or_, text)
+from sqlalchemy.dialects.sqlite import (DATETIME, VARCHAR, INTEGER)
+from .db_config import Base
+from .box_scores import StageBoxScore
+from .game_summary import StageGameSummary
+from .period_starters import StagePeriodStarters
+from .play_by_play import StagePlayByPlay
+from .player import StagePlayer
+from .roster import StageRoster
+from .schedule import StageSchedule
+from .shot_chart import StageShotChart
+from .win_prob import StageWinProb
+from datetime import (datetime, timedelta)
+import hashlib
+
+# players are fetched once for every sport and season
+UNSCOPED_SPORT = ''
+UNSCOPED_SEASON = 0
+
+class StageFetchManifest(Base):
+    __tablename__ = 'fetch_manifest'
+
+    id = Column(INTEGER, primary_key=True, nullable=False)
+    endpoint = Column(VARCHAR(16), nullable=False)
+    sport = Column(VARCHAR(5), nullable=False)
+    season = Column(INTEGER, nullable=False)
+    key = Column(VARCHAR(40), nullable=False)
+    status_code = Column(INTEGER, nullable=False)
+    payload_hash = Column(VARCHAR(64), nullable=True)
+    load_date = Column(DATETIME, nullable=False)
+
+    __table_args__ = (UniqueConstraint(endpoint, sport, season, key,
+                                       name='uix_fetch_manifest'),
+                      Index('ix_fetch_manifest_status', sport, season, endpoint,
+                            status_code, key),
+                      {})
+
+# a 200 row is never replaced by a later failed fetch of the same key
+upsert_manifest_sql = text('''
+    INSERT INTO fetch_manifest (endpoint, sport, season, key, status_code,
+                                payload_hash, load_date)
+    VALUES (:endpoint, :sport, :season, :key, :status_code, :payload_hash,
+            :load_date)
+    ON CONFLICT (endpoint, sport, season, key) DO UPDATE SET
+        status_code = excluded.status_code,
+        payload_hash = excluded.payload_hash,
+        load_date = excluded.load_date
+    WHERE excluded.status_code = 200 OR fetch_manifest.status_code != 200
+''')
+
+# a staged instance is committed once its exact manifest row exists
+committed_manifest_sql = text('''
+    SELECT 1 FROM fetch_manifest
+    WHERE endpoint = :endpoint AND sport = :sport AND season = :season AND key = :key
+      AND status_code = :status_code AND payload_hash IS :payload_hash
+''')
+
+def get_manifest_key(endpoint, instance):
+    if endpoint == 'schedule':
+        return instance['date'].strftime('%Y-%m-%d')
+    if endpoint in ['win_prob', 'game_summary', 'box_score', 'pbp']:
+        return instance['game_id']
+    if endpoint == 'period_starters':
+        return '{}:{}'.format(instance['game_id'], instance['period'])
+    if endpoint == 'roster':
+        return str(instance['team_id'])
+    if endpoint == 'player':
+        return str(instance['player_id'])
+    if endpoint == 'shot_chart':
+        return get_shot_chart_key(instance)
+    return None
+
+def get_shot_chart_key(instance):
+    # one per staged player split of a planned request, hashed to fit the key column;
+    # the date coverage keys of the planner are never 40 characters long
+    request_key = '|'.join([instance['season_type'],
+                            instance['start_date'].strftime('%Y-%m-%d'),
+                            instance['end_date'].strftime('%Y-%m-%d'),
+                            instance['context'],
+                            str(instance['team_id']),
+                            str(instance['player_id']),
+                            instance['url']])
+    return hashlib.sha1(request_key.encode('utf-8')).hexdigest()
+
+def get_payload_hash(instance):
+    if instance.get('json') is None:
+        return None
+    return hashlib.sha256(instance['json'].content).hexdigest()
+
+def get_manifest_record(endpoint, instance):
+    key = get_manifest_key(endpoint, instance)
+    if key is None:
+        return None
+    if endpoint == 'player':
+        sport, season = UNSCOPED_SPORT, UNSCOPED_SEASON
+    else:
+        sport, season = instance['sport'], instance['season']
+    load_date = instance['load_date']
+    return {'endpoint': endpoint,
+            'sport': sport,
+            'season': season,
+            'key': key,
+            'status_code': instance['status_code'],
+            'payload_hash': get_payload_hash(instance),
+            'load_date': load_date.strftime('%Y-%m-%d %H:%M:%S.%f')
+                         if load_date is not None else None}
+
+def get_coverage_record(endpoint, sport, season, key, load_date=None):
+    load_date = load_date if load_date is not None else datetime.now()
+    return {'endpoint': endpoint,
+            'sport': sport,
+            'season': season,
+            'key': key,
+            'status_code': 200,
+            'payload_hash': None,
+            'load_date': load_date.strftime('%Y-%m-%d %H:%M:%S.%f')}
+
+def upsert_manifest_records(connection, manifest_records):
+    manifest_records = [record for record in manifest_records if record is not None]
+    if manifest_records:
+        connection.execute(upsert_manifest_sql, manifest_records)
+    return len(manifest_records)
+
+def is_manifest_committed(connection, endpoint, instance):
+    if endpoint in ['manifest', 'ready']:
+        return False
+    manifest_record = get_manifest_record(endpoint, instance)
+    if manifest_record is None:
+        return False
+    committed = connection.execute(committed_manifest_sql, manifest_record).fetchone()
+    return committed is not None
+
+def get_fetched_keys(session, sport, season):
+    fetched_keys = {}
+    query_records = (session.query(StageFetchManifest.endpoint,
+                                   StageFetchManifest.key)
+                            .filter(and_(StageFetchManifest.status_code == 200,
+                                         or_(and_(StageFetchManifest.sport == sport,
+                                                  StageFetchManifest.season == season),
+                                             and_(StageFetchManifest.endpoint == 'player',
+                                                  StageFetchManifest.sport == UNSCOPED_SPORT,
+                                                  StageFetchManifest.season == UNSCOPED_SEASON))))
+                            .all())
+    for endpoint, key in query_records:
+        fetched_keys.setdefault(endpoint, set()).add(key)
+    return fetched_keys
+
+def get_ready_game_ids(session, sport, season):
+    game_ids = (session.query(StageFetchManifest.key)
+                       .filter(and_(StageFetchManifest.sport == sport,
+                                    StageFetchManifest.season == season,
+                                    StageFetchManifest.endpoint == 'game_ready',
+                                    StageFetchManifest.status_code == 200))
+                       .all())
+    return set(game_id for (game_id, ) in game_ids)
+
+def get_manifest_count(session):
+    return session.query(func.count(StageFetchManifest.id)).scalar()
+
+def get_backfill_queries(session):
+    game_id_tables = {'win_prob': StageWinProb,
+                      'game_summary': StageGameSummary,
+                      'box_score': StageBoxScore,
+                      'pbp': StagePlayByPlay}
+    queries = [('schedule', session.query(StageSchedule.sport,
+                                          StageSchedule.season,
+                                          StageSchedule.date,
+                                          StageSchedule.status_code,
+                                          StageSchedule.load_date))]
+    for endpoint, tableClass in game_id_tables.items():
+        queries.append((endpoint, session.query(tableClass.sport,
+                                                tableClass.season,
+                                                tableClass.game_id,
+                                                tableClass.status_code,
+                                                tableClass.load_date)))
+    queries.append(('period_starters', session.query(StagePeriodStarters.sport,
+                                                     StagePeriodStarters.season,
+                                                     StagePeriodStarters.game_id,
+                                                     StagePeriodStarters.period,
+                                                     StagePeriodStarters.status_code,
+                                                     StagePeriodStarters.load_date)))
+    queries.append(('roster', session.query(StageRoster.sport,
+                                            StageRoster.season,
+                                            StageRoster.team_id,
+                                            StageRoster.status_code,
+                                            StageRoster.load_date)))
+    queries.append(('player', session.query(StagePlayer.player_id,
+                                            StagePlayer.status_code,
+                                            StagePlayer.load_date)))
+    return queries
+
+def get_backfill_instance(endpoint, row):
+    if endpoint == 'schedule':
+        sport, season, date, status_code, load_date = row
+        return {'sport': sport, 'season': season, 'date': date,
+                'status_code': status_code, 'load_date': load_date}
+    if endpoint == 'period_starters':
+        sport, season, game_id, period, status_code, load_date = row
+        return {'sport': sport, 'season': season, 'game_id': game_id, 'period': period,
+                'status_code': status_code, 'load_date': load_date}
+    if endpoint == 'roster':
+        sport, season, team_id, status_code, load_date = row
+        return {'sport': sport, 'season': season, 'team_id': team_id,
+                'status_code': status_code, 'load_date': load_date}
+    if endpoint == 'player':
+        player_id, status_code, load_date = row
+        return {'player_id': player_id, 'status_code': status_code,
+                'load_date': load_date}
+    sport, season, game_id, status_code, load_date = row
+    return {'sport': sport, 'season': season, 'game_id': game_id,
+            'status_code': status_code, 'load_date': load_date}
+
+def rebuild_fetch_manifest(engine, session, batchsize=50000):
+    # backfills from the narrow key columns only, so payload_hash stays empty
+    manifest_count = 0
+    for endpoint, query in get_backfill_queries(session):
+        manifest_records = [get_manifest_record(endpoint, get_backfill_instance(endpoint, row))
+                            for row in query.all()]
+        session.commit()
+        for i in range(0, len(manifest_records), batchsize):
+            with engine.begin() as connection:
+                manifest_count += upsert_manifest_records(connection,
+                                                          manifest_records[i:i + batchsize])
+    with engine.begin() as connection:
+        manifest_count += upsert_manifest_records(connection,
+                                                  get_shot_chart_coverage_records(session))
+    print('Rebuilt {} fetch manifest records'.format(manifest_count))
+    return manifest_count
+
+def get_shot_chart_coverage_records(session):
+    # every date inside a fetched shot chart range counts as covered
+    coverage_records = {}
+    shot_chart_ranges = (session.query(StageShotChart.sport,
+                                       StageShotChart.season,
+                                       StageShotChart.season_type,
+                                       StageShotChart.context,
+                                       StageShotChart.start_date,
+                                       StageShotChart.end_date)
+                                .filter(StageShotChart.status_code == 200)
+                                .distinct()
+                                .all())
+    session.commit()
+    for sport, season, season_type, context, start_date, end_date in shot_chart_ranges:
+        for day in range((end_date - start_date).days + 1):
+            key = '{}:{}:{}'.format((start_date + timedelta(days=day)).strftime('%Y-%m-%d'),
+                                    context, season_type)
+            coverage_records[(sport, season, key)] = get_coverage_record('shot_chart', sport,
+                                                                         season, key)
+    return list(coverage_records.values())
+
+def init_fetch_manifest(engine, session):
+    if get_manifest_count(session) == 0:
+        return rebuild_fetch_manifest(engine, session)
+    return 0
@@ -0,0 +1,488 @@
+from concurrent.futures import (ProcessPoolExecutor, as_completed)
+from datetime import datetime
+from datetime import timedelta
+from threading import Thread
+from nba_data.utilities.proxy_queue import (ProxyQueue, split_proxy_ips)
+from nba_data.utilities.fetch_pool import (FetchPool, FetchStats)
+from nba_data.utilities.fetch_scheduler import FetchScheduler
+from nba_data.utilities.response_cache import Cache
+from nba_data.utilities.collection_functions import Retries
+from nba_data.utilities.collection_config import nba_league_id_dict
+from nba_data.utilities.sqlalchemy_utilities import get_chunks
+from .db_config import (Engine, Session)
+from .nba_staging_instances import (create_nba_staging_instances,
+                                    get_game_dates,
+                                    get_games_played,
+                                    get_period_start_ranges,
+                                    get_teams,
+                                    has_starter_rows,
+                                    get_players)
+from .fetch_manifest import (get_coverage_record, get_fetched_keys, get_ready_game_ids)
+from .play_by_play import StagePlayByPlay
+from .season_index import SeasonIndex
+from .shot_chart_planner import ShotChartPlanner
+from .collection_journal import CollectionJournal
+from .staging_writer import (QueueSink, StagingSink, drain_staging_queue)
+from .nba_staging_instance_config import (boxscores_config,
+                                          game_summary_config,
+                                          period_starters_config,
+                                          pbp_config,
+                                          schedule_config,
+                                          season_config,
+                                          shot_chart_config,
+                                          win_prob_config,
+                                          roster_config,
+                                          player_config,
+                                          staging_writer_config,
+                                          collection_job_config,
+                                          collection_journal_config)
+import multiprocessing
+
+SPORTS = ['nba', 'wnba', 'g_lg']
+SEASON_TYPES = ['Regular Season', 'Pre Season', 'Playoffs', 'All Star']
+# schedule -> game endpoints -> period starters -> shot charts
+ENDPOINT_STAGES = {'schedule': 0,
+                   'win_prob': 1,
+                   'game_summary': 1,
+                   'box_score': 1,
+                   'pbp': 1,
+                   'period_starters': 2,
+                   'shot_chart': 3}
+# rosters and players are not part of any game, so they run after game work
+UNSCOPED_PRIORITY = (1, 0, 0)
+
+WORKER_PROXIES = None
+WORKER_SINK = None
+
+class NBACollectionJob():
+    def __init__(self, sport, season, season_type, max_in_flight=None):
+        self.sport = sport
+        self.league_id = nba_league_id_dict[sport]
+        self.season = season
+        self.season_type = season_type
+        self.max_in_flight = max_in_flight
+        self.proxies = None
+        self.sink = None
+        self.session = None
+        self.fetch_pool = None
+        self.scheduler = None
+        self.game_id_dates = {}
+        self.ready_game_count = 0
+        self.seasons = []
+        self.shot_chart_planner = None
+        self.staged_counts = {}
+        self.max_season_date = None
+        self.downloaded_dates = None
+        self.downloaded_win_prob = None
+        self.downloaded_game_summary = None
+        self.downloaded_game_boxes = None
+        self.downloaded_pbp = None
+        self.downloaded_starters = None
+        self.downloaded_rosters = None
+        self.downloaded_players = None
+        self.covered_shot_charts = None
+        self.ready_game_ids = None
+
+    def get_name(self):
+        return '{} {} {}'.format(self.sport, self.season, self.season_type)
+
+    def run(self, proxies, sink):
+        self.proxies = proxies
+        self.sink = sink
+        self.session = Session()
+        self.fetch_pool = FetchPool(max_in_flight=self.max_in_flight, proxies=proxies)
+        self.scheduler = FetchScheduler(self.fetch_pool)
+        self.scheduler.add_group_callback(self.add_ready_game)
+        try:
+            self.load_downloaded()
+            self.gather_nba_staging_instances()
+        finally:
+            self.fetch_pool.shutdown()
+            self.session.close()
+        print('{}: {} games ready'.format(self.get_name(), self.ready_game_count))
+        FetchStats.print_report()
+        FetchStats.reset()
+        self.proxies.print_session_counters()
+        self.proxies.print_proxy_scores()
+        Cache.print_counters()
+        Retries.print_dead_letters()
+        return self.staged_counts
+
+    def load_downloaded(self):
+        fetched_keys = get_fetched_keys(self.session, self.sport, self.season)
+        schedule_keys = fetched_keys.get('schedule', set())
+        self.max_season_date = self.get_max_season_date(schedule_keys)
+        self.downloaded_dates = set((datetime.strptime(key, '%Y-%m-%d'), )
+                                    for key in schedule_keys)
+        self.downloaded_win_prob = self.get_downloaded_game_ids(fetched_keys, 'win_prob')
+        self.downloaded_game_summary = self.get_downloaded_game_ids(fetched_keys,
+                                                                    'game_summary')
+        self.downloaded_game_boxes = self.get_downloaded_game_ids(fetched_keys, 'box_score')
+        self.downloaded_pbp = self.get_downloaded_game_ids(fetched_keys, 'pbp')
+        self.downloaded_starters = set((key.split(':')[0], int(key.split(':')[1]))
+                                       for key in fetched_keys.get('period_starters', set()))
+        self.downloaded_rosters = set((self.sport, self.season, int(key))
+                                      for key in fetched_keys.get('roster', set()))
+        self.downloaded_players = set((int(key), )
+                                      for key in fetched_keys.get('player', set()))
+        self.covered_shot_charts = fetched_keys.get('shot_chart', set())
+        self.ready_game_ids = get_ready_game_ids(self.session, self.sport, self.season)
+        return True
+
+    def get_stored_pbp(self, game_ids, chunk_size=500):
+        stored_pbp = {}
+        for game_id_chunk in get_chunks(game_ids, chunk_size):
+            query_records = (self.session.query(StagePlayByPlay.game_id, StagePlayByPlay.json)
+                                         .filter(StagePlayByPlay.sport == self.sport)
+                                         .filter(StagePlayByPlay.season == self.season)
+                                         .filter(StagePlayByPlay.status_code == 200)
+                                         .filter(StagePlayByPlay.game_id.in_(game_id_chunk))
+                                         .all())
+            for game_id, pbp_json in query_records:
+                if pbp_json is not None:
+                    stored_pbp[game_id] = pbp_json
+        self.session.commit()
+        return stored_pbp
+
+    def get_max_season_date(self, schedule_keys):
+        if len(schedule_keys) == 0:
+            return None
+        return datetime.strptime(max(schedule_keys), '%Y-%m-%d').date()
+
+    def get_downloaded_game_ids(self, fetched_keys, endpoint):
+        return set((game_id, ) for game_id in fetched_keys.get(endpoint, set()))
+
+    def get_season_instance(self):
+        if self.max_season_date is not None:
+            date_from = self.max_season_date + timedelta(days=1)
+        else:
+            date_from = None
+        date_to = datetime.now().date() + timedelta(days=-1)
+        season_instance = create_nba_staging_instances(season_config['instance_template'],
+                                                       season_config['rename_dict'],
+                                                       date_from=date_from,
+                                                       date_to=date_to,
+                                                       season=self.season,
+                                                       sport=self.sport,
+                                                       season_type=self.season_type,
+                                                       endpoint='season',
+                                                       participant='P',
+                                                       proxies=self.proxies)
+        if season_instance is not None:
+            self.seasons.append(season_instance)
+        return season_instance
+
+    def get_schedule_instance(self, game_date):
+        schedule_instance = create_nba_staging_instances(schedule_config['instance_template'],
+                                                         schedule_config['rename_dict'],
+                                                         season=self.season,
+                                                         sport=self.sport,
+                                                         date=game_date,
+                                                         endpoint='schedule',
+                                                         proxies=self.proxies)
+        return schedule_instance
+
+    def get_win_prob_instance(self, game_id):
+        win_prob_instance = create_nba_staging_instances(win_prob_config['instance_template'],
+                                                         win_prob_config['rename_dict'],
+                                                         season=self.season,
+                                                         sport=self.sport,
+                                                         endpoint='win_prob',
+                                                         game_id=game_id,
+                                                         proxies=self.proxies)
+        return win_prob_instance
+
+    def get_game_summary_instance(self, game_id):
+        game_summary_instance = create_nba_staging_instances(game_summary_config['instance_template'],
+                                                             game_summary_config['rename_dict'],
+                                                             season=self.season,
+                                                             sport=self.sport,
+                                                             game_id=game_id,
+                                                             endpoint='game_summary',
+                                                             proxies=self.proxies)
+        return game_summary_instance
+
+    def get_game_box_instance(self, game_id):
+        game_box_instance = create_nba_staging_instances(boxscores_config['instance_template'],
+                                                         boxscores_config['rename_dict'],
+                                                         season=self.season,
+                                                         sport=self.sport,
+                                                         game_id=game_id,
+                                                         endpoint='box_score',
+                                                         proxies=self.proxies)
+        return game_box_instance
+
+    def get_pbp_instance(self, game_id):
+        pbp_instance = create_nba_staging_instances(pbp_config['instance_template'],
+                                                    pbp_config['rename_dict'],
+                                                    season=self.season,
+                                                    sport=self.sport,
+                                                    game_id=game_id,
+                                                    endpoint='pbp',
+                                                    proxies=self.proxies)
+        return pbp_instance
+
+    def get_period_starter_instance(self, game_id, period, start_ranges):
+        for start_range, end_range in start_ranges:
+            starter_instance = create_nba_staging_instances(period_starters_config['instance_template'],
+                                                            period_starters_config['rename_dict'],
+                                                            season=self.season,
+                                                            sport=self.sport,
+                                                            game_id=game_id,
+                                                            period=period,
+                                                            start_range=start_range,
+                                                            end_range=end_range,
+                                                            range_type=2,
+                                                            endpoint='period_starters',
+                                                            proxies=self.proxies)
+            if starter_instance is None:
+                continue
+            if has_starter_rows(starter_instance):
+                return starter_instance
+        return None
+
+    def get_shot_chart_instance(self, request_spec):
+        shot_chart_instance = create_nba_staging_instances(shot_chart_config['instance_template'],
+                                                           shot_chart_config['rename_dict'],
+                                                           season=self.season,
+                                                           sport=self.sport,
+                                                           season_type=self.season_type,
+                                                           start_date=request_spec['start_date'],
+                                                           end_date=request_spec['end_date'],
+                                                           context=request_spec['context'],
+                                                           player_id=request_spec['player_id'],
+                                                           team_id=request_spec['team_id'],
+                                                           game_id=request_spec['game_id'],
+                                                           endpoint='shot_chart',
+                                                           proxies=self.proxies)
+        return request_spec, shot_chart_instance
+
+    def get_roster_instance(self, team_id):
+        roster_instance = create_nba_staging_instances(roster_config['instance_template'],
+                                                       roster_config['rename_dict'],
+                                                       season=self.season,
+                                                       sport=self.sport,
+                                                       team_id=team_id,
+                                                       endpoint='roster',
+                                                       proxies=self.proxies)
+        return roster_instance
+
+    def get_player_instance(self, player_id):
+        player_instance = create_nba_staging_instances(player_config['instance_template'],
+                                                       player_config['rename_dict'],
+                                                       sport=self.sport,
+                                                       player_id=player_id,
+                                                       endpoint='player',
+                                                       proxies=self.proxies)
+        return player_instance
+
+    def add_shot_chart_instance(self, request_spec, instance):
+        player_instances, fallback_specs = self.shot_chart_planner.resolve(request_spec,
+                                                                           instance)
+        for player_instance in player_instances:
+            self.sink.add('shot_chart', player_instance)
+        self.staged_counts['shot_chart'] = (self.staged_counts.get('shot_chart', 0)
+                                            + len(player_instances))
+        for fallback_spec in fallback_specs:
+            self.add_shot_chart_task(fallback_spec)
+        self.add_shot_chart_coverage()
+        return True
+
+    def add_schedule_task(self, game_date, game_ids):
+        priority = self.get_game_priority(game_date, 'schedule')
+        return self.scheduler.add_task('schedule', self.get_schedule_instance, game_date,
+                                       priority=priority,
+                                       groups=game_ids)
+
+    def add_game_task(self, endpoint, func, game_id, *args, depends_on=()):
+        priority = self.get_game_priority(self.game_id_dates[game_id], endpoint)
+        return self.scheduler.add_task(endpoint, func, game_id, *args,
+                                       priority=priority,
+                                       groups=[game_id],
+                                       depends_on=depends_on)
+
+    def add_shot_chart_task(self, request_spec, pbp_tasks=None):
+        pbp_tasks = pbp_tasks if pbp_tasks is not None else {}
+        priority = self.get_game_priority(min(request_spec['dates']), 'shot_chart')
+        return self.scheduler.add_task('shot_chart', self.get_shot_chart_instance, request_spec,
+                                       priority=priority,
+                                       groups=request_spec['game_ids'],
+                                       depends_on=[pbp_tasks.get(game_id)
+                                                   for game_id in request_spec['game_ids']])
+
+    def get_game_priority(self, game_date, endpoint):
+        return (0, game_date.toordinal(), ENDPOINT_STAGES[endpoint])
+
+    def add_ready_game(self, game_id):
+        self.ready_game_count += 1
+        self.sink.add_ready(self.sport, self.season, game_id)
+        return True
+
+    def add_shot_chart_coverage(self):
+        covered_keys = self.shot_chart_planner.pop_covered_keys()
+        if covered_keys:
+            self.sink.add_manifest([get_coverage_record('shot_chart', self.sport, self.season,
+                                                        key)
+                                    for key in covered_keys])
+        return True
+
+    def add_starter_tasks(self, pbp_instance):
+        game_id = pbp_instance['game_id']
+        for period, start_ranges in get_period_start_ranges(pbp_instance).items():
+            if (game_id, period) not in self.downloaded_starters:
+                self.add_game_task('period_starters', self.get_period_starter_instance,
+                                   game_id, period, start_ranges)
+        return True
+
+    def add_stored_starter_tasks(self, games_played):
+        # play by play can be committed before its starters are fetched, a game
+        # that never became ready plans its missing periods from the stored payload
+        game_ids = sorted(game_id for (game_id, ) in (games_played & self.downloaded_pbp)
+                          if game_id not in self.ready_game_ids)
+        for game_id, pbp_json in sorted(self.get_stored_pbp(game_ids).items()):
+            self.add_starter_tasks({'sport': self.sport, 'game_id': game_id, 'json': pbp_json})
+            if not self.scheduler.has_group(game_id):
+                self.add_ready_game(game_id)
+        return True
+
+    def add_fetched_instance(self, endpoint, instance):
+        if endpoint == 'shot_chart':
+            return self.add_shot_chart_instance(*instance)
+        if instance is None:
+            return False
+        self.sink.add(endpoint, instance)
+        self.staged_counts[endpoint] = self.staged_counts.get(endpoint, 0) + 1
+        if endpoint == 'schedule':
+            self.downloaded_dates |= {(instance['date'], )}
+        elif endpoint == 'win_prob':
+            self.downloaded_win_prob |= {(instance['game_id'], )}
+        elif endpoint == 'game_summary':
+            self.downloaded_game_summary |= {(instance['game_id'], )}
+        elif endpoint == 'box_score':
+            self.downloaded_game_boxes |= {(instance['game_id'], )}
+        elif endpoint == 'pbp':
+            self.downloaded_pbp |= {(instance['game_id'], )}
+            self.add_starter_tasks(instance)
+        elif endpoint == 'period_starters':
+            self.downloaded_starters |= {(instance['game_id'], instance['period'])}
+        elif endpoint == 'roster':
+            self.downloaded_rosters |= {(self.sport, self.season, instance['team_id'])}
+        elif endpoint == 'player':
+            self.downloaded_players |= {(instance['player_id'], )}
+        return True
+
+    def collect_fetched_instances(self):
+        for endpoint, instance in self.scheduler.completed():
+            self.add_fetched_instance(endpoint, instance)
+        return True
+
+    def gather_nba_staging_instances(self):
+        print(self.season, self.season_type)
+        season_instance = self.get_season_instance()
+        if season_instance is None:
+            return False
+        season_index = SeasonIndex(season_instance)
+        self.game_id_dates = season_index.game_id_dates
+        game_dates = get_game_dates(season_index)
+        schedule_tasks = {}
+        for game_date in game_dates:
+            if (game_date, ) not in self.downloaded_dates:
+                print(game_date)
+                game_ids = list(season_index.get_game_players([game_date]))
+                schedule_tasks[game_date] = self.add_schedule_task(game_date, game_ids)
+        games_played = get_games_played(season_index)
+        pbp_tasks = {}
+        for endpoint, get_instance, downloaded in [('win_prob', self.get_win_prob_instance,
+                                                    self.downloaded_win_prob),
+                                                   ('game_summary', self.get_game_summary_instance,
+                                                    self.downloaded_game_summary),
+                                                   ('box_score', self.get_game_box_instance,
+                                                    self.downloaded_game_boxes),
+                                                   ('pbp', self.get_pbp_instance,
+                                                    self.downloaded_pbp)]:
+            for game_played in (games_played - downloaded):
+                game_id = game_played[0]
+                schedule_task = schedule_tasks.get(self.game_id_dates[game_id])
+                game_task = self.add_game_task(endpoint, get_instance, game_id,
+                                               depends_on=[schedule_task])
+                if endpoint == 'pbp':
+                    pbp_tasks[game_id] = game_task
+        teams = get_teams(season_index)
+        for sport, season, team_id in (teams - self.downloaded_rosters):
+            self.scheduler.add_task('roster', self.get_roster_instance, team_id,
+                                    priority=UNSCOPED_PRIORITY)
+        players = get_players(season_index)
+        for player in (players - self.downloaded_players):
+            self.scheduler.add_task('player', self.get_player_instance, player[0],
+                                    priority=UNSCOPED_PRIORITY)
+        self.shot_chart_planner = ShotChartPlanner(season_index, self.season_type)
+        for request_spec in self.shot_chart_planner.plan(game_dates, self.covered_shot_charts):
+            self.add_shot_chart_task(request_spec, pbp_tasks)
+        self.add_stored_starter_tasks(games_played)
+        self.collect_fetched_instances()
+        self.shot_chart_planner.print_report()
+        return True
+
+def get_collection_jobs(seasons, sports=None, season_types=None, max_in_flight=None):
+    sports = sports if sports is not None else SPORTS
+    season_types = season_types if season_types is not None else SEASON_TYPES
+    return [NBACollectionJob(sport, season, season_type, max_in_flight=max_in_flight)
+            for season in seasons
+            for sport in sports
+            for season_type in season_types]
+
+def init_collection_worker(proxy_ip_queue, staging_queue, cache_mode):
+    global WORKER_PROXIES, WORKER_SINK
+    WORKER_PROXIES = ProxyQueue(ips=proxy_ip_queue.get())
+    WORKER_SINK = QueueSink(staging_queue)
+    Cache.set_mode(cache_mode)
+
+def run_collection_job(job):
+    global WORKER_PROXIES, WORKER_SINK
+    return job.run(WORKER_PROXIES, WORKER_SINK)
+
+def run_collection_jobs(jobs, proxies, workers=None):
+    workers = workers if workers is not None else collection_job_config['workers']
+    journal = CollectionJournal(**collection_journal_config)
+    sink = StagingSink(Engine, journal=journal, **staging_writer_config)
+    sink.replay_journal()
+    if workers <= 1:
+        collected = run_jobs_in_process(jobs, proxies, sink)
+    else:
+        collected = run_jobs_in_processes(jobs, proxies, sink, workers)
+    journal.close()
+    return collected
+
+def run_jobs_in_process(jobs, proxies, sink):
+    for job in jobs:
+        job.run(proxies, sink)
+        sink.flush()
+    return True
+
+def run_jobs_in_processes(jobs, proxies, sink, workers):
+    proxy_ip_groups = split_proxy_ips(proxies.ips, workers)
+    proxy_ip_queue = multiprocessing.Queue()
+    for proxy_ips in proxy_ip_groups:
+        proxy_ip_queue.put(proxy_ips)
+    staging_queue = multiprocessing.Queue(maxsize=collection_job_config['staging_queue_size'])
+    writer = Thread(target=drain_staging_queue, args=(staging_queue, sink))
+    writer.start()
+    failed_jobs = []
+    try:
+        with ProcessPoolExecutor(max_workers=len(proxy_ip_groups),
+                                 initializer=init_collection_worker,
+                                 initargs=(proxy_ip_queue, staging_queue, Cache.mode)) as executor:
+            futures = dict((executor.submit(run_collection_job, job), job) for job in jobs)
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    staged_counts = future.result()
+                except Exception as e:
+                    print('{} failed: {!r}'.format(job.get_name(), e))
+                    failed_jobs.append(job)
+                    continue
+                print('{} staged {}'.format(job.get_name(), sum(staged_counts.values())))
+    finally:
+        staging_queue.put(None)
+        writer.join()
+    return len(failed_jobs) == 0
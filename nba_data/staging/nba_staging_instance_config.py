@@ -1,3 +1,20 @@
+# StagingWriter flush thresholds
+staging_writer_config = {'max_instances': 500,
+                         'max_mb': 64,
+                         'max_ready_games': 25}
+
+# CollectionJournal of staged instances not yet committed
+collection_journal_config = {'journal_path': '/Volumes/Sports Data/nba_collection_journal.db',
+                             'synchronous': 'NORMAL'}
+
+# NBACollectionJob process runner
+collection_job_config = {'workers': 1,
+                         'staging_queue_size': 1000}
+
+# ColumnarStore of staged result sets, one Arrow IPC file per batch
+columnar_store_config = {'store_dir': '/Volumes/Sports Data/nba_columnar_store',
+                         'batchsize': 500}
+
 # StageBoxScore config info
 boxscores_config = {'instance_template': {'sport': None,
                                    'league_id': None,
@@ -1,5 +1,9 @@
 from datetime import datetime
+from ..utilities.collection_classes import JSONPayload
 from ..utilities.collection_functions import (request_data, set_status_values)
+from ..utilities.fetch_pool import timed_request
+from ..utilities.response_cache import Cache
+from .season_index import get_season_index
 from nba_data.utilities.collection_config import (nba_league_id_dict,
                                                   nba_headers,
                                                   basketball_stats_urls,
@@ -17,8 +21,10 @@ def create_nba_staging_instances(instance_template,
     # 6. StageSeason (season, sport, endpoint, season_type, participant)
     # 7. StageShotChart (season, sport, endpoint, season_type, start_date, end_date, context, player_id, team_id)
     # 8. StageWinProb (season, sport, endpoint, game_id)
-    instance = init_instance(instance_template)
     req_response = request_nba_endpoint(**kwargs)
+    if req_response is None:
+        return None
+    instance = init_instance(instance_template)
     instance = fill_staging_json(instance, req_response)
     instance = fill_league_id(instance, kwargs.get('sport'))
     instance = fill_url(instance, req_response)
@@ -104,7 +110,7 @@ def request_nba_endpoint(**kwargs):
                                        DateTo=date_to,
                                        EndPeriod='',
                                        EndRange='',
-                                       GameID='',
+                                       GameID=kwargs.get('game_id') or '',
                                        GameSegment='',
                                        LastNGames='0',
                                        LeagueID=league_id,
@@ -127,11 +133,16 @@ def request_nba_endpoint(**kwargs):
                                        TeamID=kwargs.get('team_id'),
                                        VsConference='',
                                        VsDivision='')
-    Proxies = kwargs.get('proxies')
-    req_response = request_data(base_url,
-                                params,
-                                nba_headers,
-                                Proxies)
+    req_response = Cache.get(base_url, params)
+    if req_response is None and Cache.mode != 'replay':
+        Proxies = kwargs.get('proxies')
+        req_response = timed_request(endpoint,
+                                     request_data,
+                                     base_url,
+                                     params,
+                                     nba_headers,
+                                     Proxies)
+        Cache.put(base_url, params, req_response)
     return req_response
 
 def set_base_url(endpoint, sport):
@@ -142,14 +153,15 @@ def set_basketball_params(**kwargs):
     return params
 
 def fill_staging_json(instance, req_response):
+    # the response is staged as raw bytes once it parses; only collectors that
+    # need fields keep the parsed result
+    instance['json'] = None
     if req_response.ok:
-        try:
-            instance['json'] = req_response.json()
-        except ValueError:
-            instance['json'] = None
+        payload = JSONPayload(req_response.content)
+        if payload.is_valid():
+            instance['json'] = payload
+        else:
             instance['status_reason'] = 'Invalid JSON'
-    else:
-        instance['json'] = None
     return instance
 
 def fill_league_id(instance, sport):
@@ -181,119 +193,66 @@ def rename_instance_fields(rename_dict, instance):
             instance.update({new_key:instance.pop(old_key)})
     return instance
 
+def get_period_start_ranges(pbp_instance):
+    period_start_ranges = {}
+    if pbp_instance['json'] is None:
+        return period_start_ranges
+    minutes_in_period = period_min[pbp_instance['sport']]
+    minutes_in_ot = ot_min[pbp_instance['sport']]
+    try:
+        result_set = pbp_instance['json'].json()['resultSets'][0]
+    except ValueError:
+        return period_start_ranges
+    headers = result_set['headers']
+    period_idx = headers.index('PERIOD')
+    pc_time_idx = headers.index('PCTIMESTRING')
+    event_type_idx = headers.index('EVENTMSGTYPE')
+    for play in result_set['rowSet']:
+        if play[event_type_idx] not in [10, 12, 13]:
+            period = play[period_idx]
+            minutes, seconds = play[pc_time_idx].split(':')
+            sec_remaining = (int(minutes) * 60 + int(seconds))
+            if period < 5:
+                start_range = ((period - 1) * minutes_in_period * 60) * 10
+                end_range = (start_range + (minutes_in_period * 60 - sec_remaining) * 10)
+            else:
+                start_range = (4 * minutes_in_period * 60
+                               + (period - 4) * minutes_in_ot * 60) * 10
+                end_range = (start_range + (minutes_in_ot * 60 - sec_remaining) * 10)
+            period_start_ranges.setdefault(period, []).append((start_range, end_range))
+    return period_start_ranges
+
+def has_starter_rows(starter_instance):
+    if starter_instance['json'] is None:
+        return False
+    try:
+        return len(starter_instance['json'].json()['resultSets'][0]['rowSet']) > 0
+    except ValueError:
+        return False
+
 def get_starter_params(instance):
     starter_params = []
-    period_set = set()
-    minutes_in_period = period_min[instance['sport']]
-    minutes_in_ot = ot_min[instance['sport']]
-    if instance['json'] is not None:
-        dict_col_names = instance['json']['resultSets'][0]['headers']
-        for game in instance['json']['resultSets'][0]['rowSet']:
-            play_details = dict(zip(dict_col_names, game))
-            if play_details['EVENTMSGTYPE'] not in [10, 12, 13]:
-                period = play_details['PERIOD']
-                game_id = play_details['GAME_ID']
-                range_type = 2
-                if period not in period_set:
-                    period_set |= {period}
-                    time_remain = play_details['PCTIMESTRING'].split(':')
-                    sec_remaining = (int(time_remain[0]) * 60 + int(time_remain[1]))
-                    if period < 5:
-                        game_sec_elapsed = ((period - 1) * minutes_in_period * 60) * 10
-                        first_event = (game_sec_elapsed
-                                       + (minutes_in_period * 60 - sec_remaining) * 10)
-                    else:
-                        game_sec_elapsed = (4 * minutes_in_period * 60
-                                              + (period - 4) * minutes_in_ot * 60) * 10
-                        first_event = (game_sec_elapsed
-                                       + (minutes_in_ot * 60 - sec_remaining) * 10)
-                    lookup_tuple = (game_id,
-                                    range_type,
-                                    period,
-                                    game_sec_elapsed,
-                                    first_event)
-                    starter_params.append(lookup_tuple)
+    range_type = 2
+    for period, start_ranges in get_period_start_ranges(instance).items():
+        game_sec_elapsed, first_event = start_ranges[0]
+        starter_params.append((instance['game_id'],
+                               range_type,
+                               period,
+                               game_sec_elapsed,
+                               first_event))
     return starter_params
 
 def get_game_dates(season_instance):
-    game_dates = set()
-    if season_instance['json'] is not None:
-        if 'resultSets' in season_instance['json']:
-            for result in season_instance['json']['resultSets']:
-                if 'name' in result:
-                    if result['name'] == 'LeagueGameLog':
-                        if 'rowSet' in result:
-                            fields = [f.lower() for f in result['headers']]
-                            for player_game in result['rowSet']:
-                                player_record = dict(zip(fields, player_game))
-                                game_date = datetime.strptime(player_record['game_date'],
-                                                              '%Y-%m-%d')
-                                game_dates |= {game_date}
-    return game_dates
-
+    return set(get_season_index(season_instance).game_dates)
 
 def get_games_played(season_instance):
-    games_played = set()
-    if season_instance['json'] is not None:
-        if 'resultSets' in season_instance['json']:
-            for result in season_instance['json']['resultSets']:
-                if 'name' in result:
-                    if result['name'] == 'LeagueGameLog':
-                        if 'rowSet' in result:
-                            fields = [f.lower() for f in result['headers']]
-                            for player_game in result['rowSet']:
-                                player_record = dict(zip(fields, player_game))
-                                games_played |= {(player_record['game_id'], )}
-    return games_played
+    return set(get_season_index(season_instance).games_played)
 
 def get_teams(season_instance):
-    sport_lookup = dict((value, key) for key, value in nba_league_id_dict.items())
-    teams = set()
-    if season_instance['json'] is not None:
-        if 'resultSets' in season_instance['json']:
-            for result in season_instance['json']['resultSets']:
-                if 'name' in result:
-                    if result['name'] == 'LeagueGameLog':
-                        if 'rowSet' in result:
-                            fields = [f.lower() for f in result['headers']]
-                            for player_game in result['rowSet']:
-                                player_record = dict(zip(fields, player_game))
-                                sport = sport_lookup[player_record['game_id'][:2]]
-                                season = int(player_record['season_id'][-4:])
-                                team_id = player_record['team_id']
-                                teams |= {(sport, season, team_id)}
-    return teams
+    return set(get_season_index(season_instance).teams)
 
 def get_players(season_instance):
-    players = set()
-    if season_instance['json'] is not None:
-        if 'resultSets' in season_instance['json']:
-            for result in season_instance['json']['resultSets']:
-                if 'name' in result:
-                    if result['name'] == 'LeagueGameLog':
-                        if 'rowSet' in result:
-                            fields = [f.lower() for f in result['headers']]
-                            for player_game in result['rowSet']:
-                                player_record = dict(zip(fields, player_game))
-                                players |= {(player_record['player_id'], )}
-    return players
+    return set(get_season_index(season_instance).players)
 
 def get_shot_chart_players(season_instance, date_list):
-    dates = set(dt.strftime('%Y-%m-%d') for dt in date_list)
-    shot_chart_players = set()
-    if season_instance['json'] is not None:
-        if 'resultSets' in season_instance['json']:
-            for result in season_instance['json']['resultSets']:
-                if 'name' in result:
-                    if result['name'] == 'LeagueGameLog':
-                        if 'rowSet' in result:
-                            fields = [f.lower() for f in result['headers']]
-                            for player_game in result['rowSet']:
-                                player_record = dict(zip(fields, player_game))
-                                if 'game_date' in player_record:
-                                    if player_record['game_date'] in dates:
-                                        team_id = player_record['team_id']
-                                        player_id = player_record['player_id']
-                                        arg_tuple = (team_id, player_id)
-                                        shot_chart_players |= {arg_tuple}
-    return shot_chart_players
+    return get_season_index(season_instance).get_shot_chart_players(date_list)
@@ -0,0 +1,179 @@
+from sqlalchemy import (select, text)
+from nba_data.utilities.collection_classes import (Compressor, JSONPayload,
+                                                   find_result_set, json_loads)
+from .season import StageSeason
+from .staging_writer import staging_tables
+import json
+import time
+
+payload_tables = dict(staging_tables, season=StageSeason)
+
+# the result set processing reads from each endpoint
+payload_result_sets = {'schedule': 'GameHeader',
+                       'win_prob': 'WinProbPBP',
+                       'game_summary': 'Officials',
+                       'box_score': 'PlayerStats',
+                       'pbp': 'PlayByPlay',
+                       'period_starters': 'PlayerStats',
+                       'shot_chart': 'Shot_Chart_Detail',
+                       'roster': 'CommonTeamRoster',
+                       'player': 'CommonPlayerInfo',
+                       'season': 'LeagueGameLog'}
+
+def get_payload_samples(engine, tableClass, sample_count=2000):
+    # samples are read raw so both legacy text and compressed rows can be used
+    table_name = tableClass.__table__.name
+    sample_sql = text('SELECT json FROM {} WHERE json IS NOT NULL '
+                      'ORDER BY random() LIMIT :sample_count'.format(table_name))
+    samples = []
+    for (value, ) in engine.execute(sample_sql, sample_count=sample_count):
+        value = Compressor.decompress(value)
+        samples.append(value.encode('utf-8') if isinstance(value, str) else value)
+    return samples
+
+def train_payload_dictionaries(engine, sample_count=2000):
+    dictionary_ids = {}
+    for endpoint, tableClass in payload_tables.items():
+        dictionary_id = Compressor.train_dictionary(endpoint,
+                                                    get_payload_samples(engine, tableClass,
+                                                                        sample_count))
+        if dictionary_id is not None:
+            dictionary_ids[endpoint] = dictionary_id
+            print('Trained {} payload dictionary {}'.format(endpoint, dictionary_id))
+    return dictionary_ids
+
+def compress_payload_table(engine, endpoint, tableClass, batchsize=1000):
+    table_name = tableClass.__table__.name
+    batch_sql = text('SELECT id, json FROM {} WHERE id > :last_id AND json IS NOT NULL '
+                     'ORDER BY id LIMIT :batchsize'.format(table_name))
+    update_sql = text('UPDATE {} SET json = :json WHERE id = :id'.format(table_name))
+    last_id = 0
+    compressed_count = 0
+    while True:
+        rows = engine.execute(batch_sql, last_id=last_id, batchsize=batchsize).fetchall()
+        if len(rows) == 0:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for row_id, value in rows:
+            if not Compressor.is_compressed(value):
+                if isinstance(value, str):
+                    value = value.encode('utf-8')
+                updates.append({'id': row_id, 'json': Compressor.compress(endpoint, value)})
+        if updates:
+            with engine.begin() as connection:
+                connection.execute(update_sql, updates)
+            compressed_count += len(updates)
+    print('Compressed {} {} payloads'.format(compressed_count, table_name))
+    return compressed_count
+
+def get_database_bytes(engine):
+    page_size = engine.execute('PRAGMA page_size').scalar()
+    page_count = engine.execute('PRAGMA page_count').scalar()
+    freelist_count = engine.execute('PRAGMA freelist_count').scalar()
+    return page_size * page_count, page_size * freelist_count
+
+def get_payload_benchmark(engine):
+    database_bytes, free_bytes = get_database_bytes(engine)
+    benchmark = {'database_bytes': database_bytes, 'free_bytes': free_bytes, 'tables': {}}
+    for endpoint, tableClass in payload_tables.items():
+        table_name = tableClass.__table__.name
+        payload_bytes = engine.execute(text('SELECT count(*), coalesce(sum(length(json)), 0) '
+                                            'FROM {}'.format(table_name))).fetchone()
+        start = time.perf_counter()
+        for (payload, ) in engine.execute(select([tableClass.json])):
+            pass
+        benchmark['tables'][table_name] = {'rows': payload_bytes[0],
+                                           'payload_bytes': payload_bytes[1],
+                                           'scan_sec': time.perf_counter() - start}
+    return benchmark
+
+def print_payload_benchmark(before, after=None):
+    print('{:<24}{:>10}{:>16}{:>12}{:>16}{:>12}'.format('table', 'rows', 'bytes before',
+                                                        'scan before', 'bytes after',
+                                                        'scan after'))
+    for table_name, table_before in before['tables'].items():
+        table_after = after['tables'][table_name] if after is not None else {}
+        print('{:<24}{:>10}{:>16}{:>12.3f}{:>16}{:>12}'
+              .format(table_name,
+                      table_before['rows'],
+                      table_before['payload_bytes'],
+                      table_before['scan_sec'],
+                      table_after.get('payload_bytes', ''),
+                      '{:.3f}'.format(table_after['scan_sec']) if table_after else ''))
+    print('database file: {} bytes before{}'
+          .format(before['database_bytes'],
+                  ', {} bytes after'.format(after['database_bytes'])
+                  if after is not None else ''))
+
+def compress_staging_payloads(engine, batchsize=1000, train=False, sample_count=2000,
+                              vacuum=False):
+    before = get_payload_benchmark(engine)
+    if train:
+        train_payload_dictionaries(engine, sample_count)
+    compressed_count = 0
+    for endpoint, tableClass in payload_tables.items():
+        compressed_count += compress_payload_table(engine, endpoint, tableClass, batchsize)
+    if vacuum:
+        engine.execute('VACUUM')
+    after = get_payload_benchmark(engine)
+    print('payload codec: {}'.format(Compressor.codec))
+    print_payload_benchmark(before, after)
+    return compressed_count
+
+def get_payload_corpus(engine, tableClass, sample_count=200):
+    return [JSONPayload(payload) for payload in get_payload_samples(engine, tableClass,
+                                                                     sample_count)]
+
+def time_payload_decoder(corpus, decoder, repeat=3):
+    best_sec = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for payload in corpus:
+            decoder(payload)
+        elapsed_sec = time.perf_counter() - start
+        best_sec = elapsed_sec if best_sec is None else min(best_sec, elapsed_sec)
+    return best_sec
+
+def get_decode_benchmark(engine, sample_count=200, repeat=3):
+    decoders = [('stdlib', lambda payload: json.loads(payload.content)),
+                ('fast', lambda payload: json_loads(payload.content)),
+                ('lazy', None),
+                ('view', None)]
+    benchmark = {}
+    for endpoint, tableClass in payload_tables.items():
+        corpus = get_payload_corpus(engine, tableClass, sample_count)
+        if len(corpus) == 0:
+            continue
+        result_set_name = payload_result_sets[endpoint]
+        decoder_times = {}
+        for decoder_name, decoder in decoders:
+            if decoder_name == 'lazy':
+                decoder = lambda payload: find_result_set(payload.content, result_set_name)
+            elif decoder_name == 'view':
+                decoder = lambda payload: (JSONPayload(payload.content)
+                                           .get_result_set(result_set_name))
+            decoder_times[decoder_name] = time_payload_decoder(corpus, decoder, repeat)
+        benchmark[endpoint] = {'payloads': len(corpus),
+                               'bytes': sum(payload.get_size() for payload in corpus),
+                               'result_set': result_set_name,
+                               'decode_sec': decoder_times}
+    return benchmark
+
+def print_decode_benchmark(benchmark):
+    print('json decoder: {}'.format(json_loads.__module__))
+    print('{:<18}{:>10}{:>14}{:>20}{:>12}{:>12}{:>12}{:>12}'.format('endpoint', 'payloads',
+                                                                     'bytes', 'result set',
+                                                                     'stdlib ms', 'fast ms',
+                                                                     'lazy ms', 'view ms'))
+    for endpoint, endpoint_benchmark in benchmark.items():
+        decode_sec = endpoint_benchmark['decode_sec']
+        print('{:<18}{:>10}{:>14}{:>20}{:>12.2f}{:>12.2f}{:>12.2f}{:>12.2f}'
+              .format(endpoint,
+                      endpoint_benchmark['payloads'],
+                      endpoint_benchmark['bytes'],
+                      endpoint_benchmark['result_set'],
+                      decode_sec['stdlib'] * 1000,
+                      decode_sec['fast'] * 1000,
+                      decode_sec['lazy'] * 1000,
+                      decode_sec['view'] * 1000))
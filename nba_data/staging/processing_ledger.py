@@ -0,0 +1,113 @@
+from sqlalchemy import (Column, MetaData, Table, UniqueConstraint, select, text)
+from sqlalchemy.dialects.sqlite import (DATETIME, VARCHAR, INTEGER)
+from nba_data.utilities.sqlalchemy_utilities import get_chunks
+from .db_config import Base
+from .fetch_manifest import (UNSCOPED_SPORT, UNSCOPED_SEASON)
+from .staging_writer import staging_tables
+from datetime import datetime
+
+staging_endpoints = dict((tableClass, endpoint) for endpoint, tableClass in staging_tables.items())
+
+# game scoped rows are read through the dates they were played on, not in id
+# order, so only the season wide readers keep a watermark
+watermark_endpoints = ['schedule', 'shot_chart', 'roster', 'player']
+
+class StageProcessingWatermark(Base):
+    __tablename__ = 'processing_watermarks'
+
+    id = Column(INTEGER, primary_key=True, nullable=False)
+    sport = Column(VARCHAR(5), nullable=False)
+    season = Column(INTEGER, nullable=False)
+    endpoint = Column(VARCHAR(16), nullable=False)
+    last_id = Column(INTEGER, nullable=False)
+    processed_date = Column(DATETIME, nullable=False)
+
+    __table_args__ = (UniqueConstraint(sport, season, endpoint,
+                                       name='uix_processing_watermarks'),
+                      {})
+
+# staging ids marked by one bulk update, one per connection and never persisted
+processed_ids = Table('processed_ids', MetaData(),
+                      Column('id', INTEGER, primary_key=True),
+                      prefixes=['TEMP'])
+
+# a watermark only moves forward, every staging id at or below it is processed
+upsert_watermark_sql = text('''
+    INSERT INTO processing_watermarks (sport, season, endpoint, last_id, processed_date)
+    VALUES (:sport, :season, :endpoint, :last_id, :processed_date)
+    ON CONFLICT (sport, season, endpoint) DO UPDATE SET
+        last_id = max(processing_watermarks.last_id, excluded.last_id),
+        processed_date = excluded.processed_date
+''')
+
+class ProcessingLedger():
+    def __init__(self, sport, season):
+        self.sport = sport
+        self.season = season
+        self.processed_ids = {}
+
+    def add(self, tableClass, row_id):
+        self.processed_ids.setdefault(tableClass, set()).add(row_id)
+
+    def get_scope(self, tableClass):
+        # players are processed once for every sport and season
+        if staging_endpoints[tableClass] == 'player':
+            return UNSCOPED_SPORT, UNSCOPED_SEASON
+        return self.sport, self.season
+
+    def get_watermarks(self, session):
+        watermarks = {}
+        query_records = (session.query(StageProcessingWatermark.sport,
+                                       StageProcessingWatermark.season,
+                                       StageProcessingWatermark.endpoint,
+                                       StageProcessingWatermark.last_id)
+                                .filter(StageProcessingWatermark.sport.in_([self.sport,
+                                                                            UNSCOPED_SPORT]))
+                                .all())
+        for sport, season, endpoint, last_id in query_records:
+            watermarks[(sport, season, endpoint)] = last_id
+        return watermarks
+
+    def get_watermark(self, watermarks, tableClass):
+        sport, season = self.get_scope(tableClass)
+        return watermarks.get((sport, season, staging_endpoints[tableClass]), 0)
+
+    def set_watermark(self, connection, tableClass, last_id, processed_date):
+        sport, season = self.get_scope(tableClass)
+        connection.execute(upsert_watermark_sql,
+                           sport=sport,
+                           season=season,
+                           endpoint=staging_endpoints[tableClass],
+                           last_id=last_id,
+                           processed_date=processed_date.strftime('%Y-%m-%d %H:%M:%S.%f'))
+
+    def mark_processed(self, engine, tableClasses, chunk_size=500):
+        # run once the processed rows built from these staging rows are inserted
+        processed_date = datetime.now()
+        marked_count = 0
+        with engine.begin() as connection:
+            processed_ids.drop(connection, checkfirst=True)
+            processed_ids.create(connection)
+            for tableClass in tableClasses:
+                row_ids = sorted(self.processed_ids.pop(tableClass, set()))
+                if len(row_ids) == 0:
+                    continue
+                for row_id_chunk in get_chunks(row_ids, chunk_size):
+                    connection.execute(processed_ids.insert()
+                                                    .values([{'id': row_id}
+                                                             for row_id in row_id_chunk]))
+                connection.execute(tableClass.__table__.update()
+                                             .where(tableClass.id.in_(select([processed_ids.c.id])))
+                                             .values(processed=True,
+                                                     processed_date=processed_date))
+                connection.execute(processed_ids.delete())
+                if staging_endpoints[tableClass] in watermark_endpoints:
+                    self.set_watermark(connection, tableClass, row_ids[-1], processed_date)
+                marked_count += len(row_ids)
+            processed_ids.drop(connection)
+        print('Marked {} staging records processed'.format(marked_count))
+        return marked_count
+
+def init_processing_ledger(engine):
+    StageProcessingWatermark.__table__.create(engine, checkfirst=True)
+    return True
@@ -1,5 +1,6 @@
 from sqlalchemy import Column, UniqueConstraint
-from sqlalchemy.dialects.sqlite import (DATETIME, JSON, VARCHAR, INTEGER, BOOLEAN)
+from sqlalchemy.dialects.sqlite import (DATETIME, VARCHAR, INTEGER, BOOLEAN)
+from nba_data.utilities.collection_classes import CompressedJSON
 from .db_config import Base
 
 class StageRoster(Base):
@@ -13,7 +14,7 @@ class StageRoster(Base):
     load_date = Column(DATETIME, nullable=False)
     status_reason = Column(VARCHAR(12), nullable=True)
     url = Column(VARCHAR(70), nullable=False)
-    json = Column(JSON, nullable=True)
+    json = Column(CompressedJSON('roster'), nullable=True)
     processed = Column(BOOLEAN, nullable=True)
     processed_date = Column(DATETIME, nullable=True)
 
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, UniqueConstraint
-from sqlalchemy.dialects.sqlite import (DATE, DATETIME, JSON, VARCHAR, INTEGER,
+from sqlalchemy.dialects.sqlite import (DATE, DATETIME, VARCHAR, INTEGER,
                                         BOOLEAN)
+from nba_data.utilities.collection_classes import CompressedJSON
 from .db_config import Base
 
 class StageSchedule(Base):
@@ -15,7 +16,7 @@ class StageSchedule(Base):
     load_date = Column(DATETIME, nullable=False)
     url = Column(VARCHAR(85), nullable=False)
     status_reason = Column(VARCHAR(12), nullable=True)
-    json = Column(JSON, nullable=True)
+    json = Column(CompressedJSON('schedule'), nullable=True)
     processed = Column(BOOLEAN, nullable=True)
     processed_date = Column(DATETIME, nullable=True)
 
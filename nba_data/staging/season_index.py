@@ -0,0 +1,86 @@
+from datetime import datetime
+from nba_data.utilities.collection_config import nba_league_id_dict
+import pandas as pd
+
+class SeasonIndex():
+    def __init__(self, season_instance):
+        self.frame = get_game_log_frame(season_instance)
+        self.game_dates = set()
+        self.games_played = set()
+        self.teams = set()
+        self.players = set()
+        self.date_players = {}
+        self.date_game_players = {}
+        self.game_id_dates = {}
+        if len(self.frame.index) > 0:
+            self.index_frame()
+
+    def index_frame(self):
+        sport_lookup = dict((value, key) for key, value in nba_league_id_dict.items())
+        frame = self.frame
+        frame['game_dt'] = pd.to_datetime(frame['game_date'], format='%Y-%m-%d')
+        frame['sport'] = frame['game_id'].str[:2].map(sport_lookup)
+        frame['season'] = frame['season_id'].str[-4:].astype(int)
+        self.game_dates = set(frame['game_dt'].drop_duplicates().dt.to_pydatetime())
+        self.games_played = set((game_id, ) for game_id in frame['game_id'].unique().tolist())
+        self.players = set((player_id, ) for player_id in frame['player_id'].unique().tolist())
+        teams = frame[['sport', 'season', 'team_id']].drop_duplicates()
+        self.teams = set(zip(teams['sport'].tolist(),
+                             teams['season'].tolist(),
+                             teams['team_id'].tolist()))
+        for game_date, game_id, team_id, player_id in zip(frame['game_date'].tolist(),
+                                                          frame['game_id'].tolist(),
+                                                          frame['team_id'].tolist(),
+                                                          frame['player_id'].tolist()):
+            (self.date_game_players.setdefault(game_date, {})
+                                   .setdefault(game_id, set())
+                                   .add((team_id, player_id)))
+        for game_date, game_players in self.date_game_players.items():
+            self.date_players[game_date] = set().union(*game_players.values())
+            game_dt = datetime.strptime(game_date, '%Y-%m-%d')
+            for game_id in game_players:
+                self.game_id_dates[game_id] = game_dt
+
+    def get_shot_chart_players(self, date_list):
+        shot_chart_players = set()
+        for dt in date_list:
+            shot_chart_players |= self.date_players.get(dt.strftime('%Y-%m-%d'), set())
+        return shot_chart_players
+
+    def get_game_players(self, date_list):
+        game_players = {}
+        for dt in date_list:
+            game_players.update(self.date_game_players.get(dt.strftime('%Y-%m-%d'), {}))
+        return game_players
+
+    def get_team_players(self, date_list):
+        team_players = {}
+        for dt in date_list:
+            for team_id, player_id in self.date_players.get(dt.strftime('%Y-%m-%d'), set()):
+                team_players.setdefault(team_id, set()).add(player_id)
+        return team_players
+
+    def get_team_dates(self, date_list):
+        team_dates = {}
+        for dt in date_list:
+            for team_id, player_id in self.date_players.get(dt.strftime('%Y-%m-%d'), set()):
+                team_dates.setdefault(team_id, set()).add(dt)
+        return team_dates
+
+def get_game_log_frame(season_instance):
+    frames = []
+    if season_instance['json'] is not None:
+        season_json = season_instance['json'].json()
+        if 'resultSets' in season_json:
+            for result in season_json['resultSets']:
+                if result.get('name') == 'LeagueGameLog' and 'rowSet' in result:
+                    fields = [f.lower() for f in result['headers']]
+                    frames.append(pd.DataFrame(result['rowSet'], columns=fields))
+    if len(frames) == 0:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def get_season_index(season):
+    if isinstance(season, SeasonIndex):
+        return season
+    return SeasonIndex(season)
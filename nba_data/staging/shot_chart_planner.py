@@ -0,0 +1,188 @@
+from nba_data.utilities.collection_classes import JSONPayload
+
+SHOT_CHART_CONTEXTS = ['FGA', 'PF']
+SHOT_CHART_RESULT_SET = 'Shot_Chart_Detail'
+
+class ShotChartPlanner():
+    def __init__(self, season_index, season_type, contexts=None):
+        self.season_index = season_index
+        self.season_type = season_type
+        self.contexts = contexts if contexts is not None else SHOT_CHART_CONTEXTS
+        self.pending = {}
+        self.failed = set()
+        self.covered_keys = []
+        self.player_request_count = 0
+        self.request_counts = {'team': 0, 'game': 0, 'player': 0}
+
+    def get_coverage_key(self, dt, context):
+        return '{}:{}:{}'.format(dt.strftime('%Y-%m-%d'), context, self.season_type)
+
+    def plan(self, game_dates, covered_keys):
+        request_specs = []
+        for context in self.contexts:
+            for dates in self.get_uncovered_runs(game_dates, context, covered_keys):
+                self.player_request_count += len(self.season_index.get_shot_chart_players(dates))
+                team_dates = self.season_index.get_team_dates(dates)
+                game_players = self.season_index.get_game_players(dates)
+                if len(game_players) < len(team_dates):
+                    request_specs += self.get_game_specs(dates, context, game_players)
+                else:
+                    request_specs += self.get_team_specs(dates, context, team_dates)
+        for request_spec in request_specs:
+            self.add_pending(request_spec)
+        return request_specs
+
+    def get_uncovered_runs(self, game_dates, context, covered_keys):
+        # a team request spans its first to last date, so a covered game date
+        # inside that range would be fetched and staged again
+        runs = []
+        dates = []
+        for dt in sorted(game_dates):
+            if self.get_coverage_key(dt, context) in covered_keys:
+                if dates:
+                    runs.append(dates)
+                dates = []
+            else:
+                dates.append(dt)
+        if dates:
+            runs.append(dates)
+        return runs
+
+    def get_team_specs(self, dates, context, team_dates):
+        team_players = self.season_index.get_team_players(dates)
+        return [{'shape': 'team',
+                 'context': context,
+                 'start_date': dates[0],
+                 'end_date': dates[-1],
+                 'team_id': team_id,
+                 'player_id': 0,
+                 'game_id': '',
+                 'dates': sorted(team_dates[team_id]),
+                 'game_ids': self.get_team_game_ids(team_dates[team_id], team_id),
+                 'players': set((team_id, player_id)
+                                for player_id in team_players.get(team_id, set()))}
+                for team_id in sorted(team_dates)]
+
+    def get_team_game_ids(self, dates, team_id):
+        return sorted(game_id
+                      for game_id, players in self.season_index.get_game_players(dates).items()
+                      if any(player[0] == team_id for player in players))
+
+    def get_game_specs(self, dates, context, game_players):
+        game_dates = {}
+        for dt in dates:
+            for game_id in self.season_index.get_game_players([dt]):
+                game_dates[game_id] = dt
+        return [{'shape': 'game',
+                 'context': context,
+                 'start_date': game_dates[game_id],
+                 'end_date': game_dates[game_id],
+                 'team_id': 0,
+                 'player_id': 0,
+                 'game_id': game_id,
+                 'dates': [game_dates[game_id]],
+                 'game_ids': [game_id],
+                 'players': game_players[game_id]}
+                for game_id in sorted(game_players)]
+
+    def get_player_specs(self, request_spec):
+        return [{'shape': 'player',
+                 'context': request_spec['context'],
+                 'start_date': request_spec['start_date'],
+                 'end_date': request_spec['end_date'],
+                 'team_id': team_id,
+                 'player_id': player_id,
+                 'game_id': '',
+                 'dates': request_spec['dates'],
+                 'game_ids': request_spec['game_ids'],
+                 'players': {(team_id, player_id)}}
+                for team_id, player_id in sorted(request_spec['players'])]
+
+    def add_pending(self, request_spec):
+        self.request_counts[request_spec['shape']] += 1
+        for dt in request_spec['dates']:
+            coverage_key = self.get_coverage_key(dt, request_spec['context'])
+            self.pending[coverage_key] = self.pending.get(coverage_key, 0) + 1
+
+    def remove_pending(self, request_spec, failed=False):
+        for dt in request_spec['dates']:
+            coverage_key = self.get_coverage_key(dt, request_spec['context'])
+            self.pending[coverage_key] -= 1
+            if failed:
+                self.failed |= {coverage_key}
+            if self.pending[coverage_key] == 0 and coverage_key not in self.failed:
+                self.covered_keys.append(coverage_key)
+
+    def resolve(self, request_spec, instance):
+        # a request that exhausted its retries is left uncovered for the next run,
+        # one the api answered without a shot chart falls back to per player requests
+        if request_spec['shape'] == 'player':
+            self.remove_pending(request_spec, failed=not is_shot_chart_ok(instance))
+            return ([instance] if instance is not None else []), []
+        if instance is None:
+            self.remove_pending(request_spec, failed=True)
+            return [], []
+        shot_chart_json = get_shot_chart_json(instance)
+        if shot_chart_json is None:
+            fallback_specs = self.get_player_specs(request_spec)
+            for fallback_spec in fallback_specs:
+                self.add_pending(fallback_spec)
+            self.remove_pending(request_spec)
+            return [], fallback_specs
+        self.remove_pending(request_spec)
+        return split_shot_chart_instance(instance, request_spec, shot_chart_json), []
+
+    def pop_covered_keys(self):
+        covered_keys = self.covered_keys
+        self.covered_keys = []
+        return covered_keys
+
+    def print_report(self):
+        request_count = sum(self.request_counts.values())
+        print('shot chart planner: {} team, {} game, {} player requests '
+              'instead of {} per player ({} saved)'
+              .format(self.request_counts['team'],
+                      self.request_counts['game'],
+                      self.request_counts['player'],
+                      self.player_request_count,
+                      self.player_request_count - request_count))
+
+def get_shot_chart_json(instance):
+    if instance is None or instance['status_code'] != 200 or instance['json'] is None:
+        return None
+    try:
+        shot_chart_json = instance['json'].json()
+    except ValueError:
+        return None
+    if any(result.get('name') == SHOT_CHART_RESULT_SET
+           for result in shot_chart_json.get('resultSets', [])):
+        return shot_chart_json
+    return None
+
+def is_shot_chart_ok(instance):
+    return get_shot_chart_json(instance) is not None
+
+def split_shot_chart_instance(instance, request_spec, shot_chart_json=None):
+    if shot_chart_json is None:
+        shot_chart_json = instance['json'].json()
+    for result in shot_chart_json['resultSets']:
+        if result.get('name') == SHOT_CHART_RESULT_SET:
+            shot_result = result
+    fields = [f.lower() for f in shot_result['headers']]
+    team_index = fields.index('team_id')
+    player_index = fields.index('player_id')
+    player_rows = dict((player, []) for player in request_spec['players'])
+    for row in shot_result['rowSet']:
+        player_rows.setdefault((row[team_index], row[player_index]), []).append(row)
+    player_instances = []
+    for (team_id, player_id), rows in sorted(player_rows.items()):
+        player_json = dict(shot_chart_json)
+        player_json['resultSets'] = [dict(result, rowSet=rows)
+                                     if result is shot_result else result
+                                     for result in shot_chart_json['resultSets']]
+        player_instance = dict(instance)
+        player_instance.update({'team_id': team_id,
+                                'player_id': player_id,
+                                'json': JSONPayload.from_json(player_json)})
+        player_instances.append(player_instance)
+    return player_instances
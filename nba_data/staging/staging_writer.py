@@ -0,0 +1,198 @@
+from nba_data.utilities.sqlalchemy_utilities import bulk_insert_records
+from .box_scores import StageBoxScore
+from .fetch_manifest import (get_coverage_record, get_manifest_record,
+                             is_manifest_committed, upsert_manifest_records)
+from .game_summary import StageGameSummary
+from .period_starters import StagePeriodStarters
+from .play_by_play import StagePlayByPlay
+from .player import StagePlayer
+from .roster import StageRoster
+from .schedule import StageSchedule
+from .shot_chart import StageShotChart
+from .win_prob import StageWinProb
+
+staging_tables = {'schedule': StageSchedule,
+                  'win_prob': StageWinProb,
+                  'game_summary': StageGameSummary,
+                  'box_score': StageBoxScore,
+                  'pbp': StagePlayByPlay,
+                  'period_starters': StagePeriodStarters,
+                  'shot_chart': StageShotChart,
+                  'roster': StageRoster,
+                  'player': StagePlayer}
+
+class StagingWriter():
+    def __init__(self, engine, tableClass, endpoint=None, journal=None, max_instances=500,
+                 max_mb=64):
+        self.engine = engine
+        self.tableClass = tableClass
+        self.endpoint = endpoint
+        self.journal = journal
+        self.max_instances = max_instances
+        self.max_bytes = max_mb * 1024 ** 2
+        self.instances = []
+        self.journal_ids = []
+        self.pending_bytes = 0
+        self.inserted_count = 0
+
+    def add(self, instance, journal_id=None):
+        self.instances.append(instance)
+        self.journal_ids.append(journal_id)
+        self.pending_bytes += get_instance_bytes(instance)
+        if ((len(self.instances) >= self.max_instances)
+            or (self.pending_bytes >= self.max_bytes)):
+            self.flush()
+
+    def flush(self):
+        if self.instances:
+            with self.engine.begin() as connection:
+                bulk_insert_records(connection, self.instances, self.tableClass)
+                if self.endpoint is not None:
+                    upsert_manifest_records(connection,
+                                            [get_manifest_record(self.endpoint, instance)
+                                             for instance in self.instances])
+            self.inserted_count += len(self.instances)
+            if self.journal is not None:
+                self.journal.remove(self.journal_ids)
+        self.instances = []
+        self.journal_ids = []
+        self.pending_bytes = 0
+        return self.inserted_count
+
+class StagingSink():
+    def __init__(self, engine, journal=None, max_instances=500, max_mb=64,
+                 max_ready_games=25):
+        self.writers = dict((endpoint, StagingWriter(engine, tableClass,
+                                                     endpoint=endpoint,
+                                                     journal=journal,
+                                                     max_instances=max_instances,
+                                                     max_mb=max_mb))
+                            for endpoint, tableClass in staging_tables.items())
+        self.engine = engine
+        self.journal = journal
+        self.journal_ids = []
+        self.shared_keys = set()
+        self.manifest_records = []
+        self.max_ready_games = max_ready_games
+        self.ready_games = []
+        self.ready_callbacks = []
+
+    def add_ready_callback(self, callback):
+        self.ready_callbacks.append(callback)
+
+    def add(self, endpoint, instance):
+        shared_key = get_shared_key(endpoint, instance)
+        if shared_key is not None:
+            if shared_key in self.shared_keys:
+                return False
+            self.shared_keys |= {shared_key}
+        self.writers[endpoint].add(instance, self.append_journal(endpoint, instance))
+        return True
+
+    def add_manifest(self, manifest_records):
+        self.journal_ids.append(self.append_journal('manifest', manifest_records))
+        self.manifest_records += manifest_records
+        return True
+
+    def add_ready(self, sport, season, game_id):
+        # a game is announced only once everything staged before it is flushed
+        self.journal_ids.append(self.append_journal('ready', (sport, season, game_id)))
+        self.ready_games.append((sport, season, game_id))
+        if len(self.ready_games) >= self.max_ready_games:
+            self.flush()
+        return True
+
+    def flush(self):
+        inserted_counts = dict((endpoint, writer.flush())
+                               for endpoint, writer in self.writers.items())
+        ready_games = self.ready_games
+        self.manifest_records += [get_coverage_record('game_ready', sport, season, game_id)
+                                  for sport, season, game_id in ready_games]
+        if self.manifest_records:
+            with self.engine.begin() as connection:
+                upsert_manifest_records(connection, self.manifest_records)
+            self.manifest_records = []
+        if self.journal is not None:
+            self.journal.remove(self.journal_ids)
+        self.journal_ids = []
+        self.ready_games = []
+        if ready_games:
+            for callback in self.ready_callbacks:
+                callback(ready_games)
+        return inserted_counts
+
+    def add_entry(self, kind, payload):
+        if kind == 'manifest':
+            return self.add_manifest(payload)
+        if kind == 'ready':
+            return self.add_ready(*payload)
+        return self.add(kind, payload)
+
+    def append_journal(self, kind, payload):
+        if self.journal is None:
+            return None
+        return self.journal.append(kind, payload)
+
+    def replay_journal(self):
+        # entries left by an interrupted run are staged again unless their
+        # manifest row shows the batch was committed before the crash
+        if self.journal is None:
+            return 0
+        journal_entries = self.journal.get_entries()
+        with self.engine.connect() as connection:
+            replay_entries = [(kind, payload) for journal_id, kind, payload in journal_entries
+                              if not is_manifest_committed(connection, kind, payload)]
+        for kind, payload in replay_entries:
+            self.add_entry(kind, payload)
+        self.journal.remove([journal_id for journal_id, kind, payload in journal_entries])
+        self.flush()
+        if journal_entries:
+            print('Replayed {} of {} journal entries'.format(len(replay_entries),
+                                                             len(journal_entries)))
+        return len(replay_entries)
+
+class QueueSink():
+    def __init__(self, staging_queue):
+        self.staging_queue = staging_queue
+
+    def add(self, endpoint, instance):
+        self.staging_queue.put((endpoint, instance))
+        return True
+
+    def add_manifest(self, manifest_records):
+        self.staging_queue.put(('manifest', manifest_records))
+        return True
+
+    def add_ready(self, sport, season, game_id):
+        self.staging_queue.put(('ready', (sport, season, game_id)))
+        return True
+
+    def flush(self):
+        return None
+
+def drain_staging_queue(staging_queue, sink):
+    while True:
+        item = staging_queue.get()
+        if item is None:
+            break
+        kind, payload = item
+        sink.add_entry(kind, payload)
+    return sink.flush()
+
+def get_shared_key(endpoint, instance):
+    # season type shards of the same season can fetch the same roster, player
+    # or schedule date; only the first copy is staged
+    if instance.get('status_code') != 200:
+        return None
+    if endpoint == 'roster':
+        return (endpoint, instance['sport'], instance['season'], instance['team_id'])
+    if endpoint == 'player':
+        return (endpoint, instance['player_id'])
+    if endpoint == 'schedule':
+        return (endpoint, instance['sport'], instance['season'], instance['date'])
+    return None
+
+def get_instance_bytes(instance):
+    if instance.get('json') is None:
+        return 0
+    return instance['json'].get_size()
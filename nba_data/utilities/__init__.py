@@ -2,5 +2,12 @@ from . import collection_classes
 from . import collection_config
 from . import collection_functions
 from . import date_utilities
+from . import fetch_pool
+from . import fetch_scheduler
 from . import proxy_queue
+from . import proxy_scores
+from . import proxy_sessions
+from . import rate_limiter
+from . import response_cache
+from . import sqlite_engine
 from . import sqlalchemy_utilities
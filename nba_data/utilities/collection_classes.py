@@ -1,4 +1,41 @@
+from threading import Lock
+from .collection_config import payload_compression_config
+import json
+import os
+import re
 import sqlalchemy.types as types
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+ZLIB_PAYLOAD = b'\x01'
+ZSTD_PAYLOAD = b'\x02'
+
+def get_json_loads():
+    if orjson is not None:
+        return orjson.loads
+    if simdjson is not None:
+        return simdjson.loads
+    return json.loads
+
+json_loads = get_json_loads()
+json_decoder = json.JSONDecoder()
+fast_json_loads = json_loads is not json.loads
+# below this size a fast parser reads the whole payload before a scan pays off
+LAZY_PAYLOAD_BYTES = 64 * 1024
 
 class BetDecimal(types.TypeDecorator):
     impl = types.Integer
@@ -64,3 +101,210 @@ class SalaryCapDecimal(types.TypeDecorator):
         if value is not None:
             value = value / 10000
         return value
+
+class PayloadCompressor():
+    def __init__(self, codec='zstd', level=3, dictionary_dir=None, dictionary_size=112640):
+        if codec not in ['zstd', 'zlib']:
+            raise ValueError('Unknown payload codec: {}'.format(codec))
+        self.codec = codec if zstandard is not None else 'zlib'
+        self.level = level
+        self.dictionary_dir = dictionary_dir
+        self.dictionary_size = dictionary_size
+        self.lock = Lock()
+        self.compressors = None
+        self.decompressors = None
+
+    def get_dictionary_path(self, endpoint):
+        return os.path.join(self.dictionary_dir, '{}.zdict'.format(endpoint))
+
+    def load_dictionaries(self):
+        self.compressors = {None: zstandard.ZstdCompressor(level=self.level)}
+        self.decompressors = {0: zstandard.ZstdDecompressor()}
+        if self.dictionary_dir is None or not os.path.isdir(self.dictionary_dir):
+            return
+        for file_name in sorted(os.listdir(self.dictionary_dir)):
+            if file_name.endswith('.zdict'):
+                with open(os.path.join(self.dictionary_dir, file_name), 'rb') as f:
+                    self.add_dictionary(file_name[:-len('.zdict')],
+                                        zstandard.ZstdCompressionDict(f.read()))
+
+    def add_dictionary(self, endpoint, dictionary):
+        self.compressors[endpoint] = zstandard.ZstdCompressor(level=self.level,
+                                                             dict_data=dictionary)
+        self.decompressors[dictionary.dict_id()] = zstandard.ZstdDecompressor(dict_data=dictionary)
+
+    def train_dictionary(self, endpoint, samples):
+        if self.codec != 'zstd' or len(samples) == 0:
+            return None
+        dictionary = zstandard.train_dictionary(self.dictionary_size, samples)
+        os.makedirs(self.dictionary_dir, exist_ok=True)
+        with open(self.get_dictionary_path(endpoint), 'wb') as f:
+            f.write(dictionary.as_bytes())
+        with self.lock:
+            if self.compressors is None:
+                self.load_dictionaries()
+            self.add_dictionary(endpoint, dictionary)
+        return dictionary.dict_id()
+
+    def compress(self, endpoint, payload):
+        if self.codec == 'zlib':
+            return ZLIB_PAYLOAD + zlib.compress(payload, self.level)
+        with self.lock:
+            if self.compressors is None:
+                self.load_dictionaries()
+            compressor = self.compressors.get(endpoint, self.compressors[None])
+            return ZSTD_PAYLOAD + compressor.compress(payload)
+
+    def decompress(self, value):
+        # rows written before compression hold the json text itself
+        if isinstance(value, str):
+            return value
+        prefix = value[:1]
+        if prefix == ZLIB_PAYLOAD:
+            return zlib.decompress(value[1:])
+        if prefix == ZSTD_PAYLOAD:
+            if zstandard is None:
+                raise ValueError('zstandard is required to read zstd payloads')
+            frame = value[1:]
+            with self.lock:
+                if self.decompressors is None:
+                    self.load_dictionaries()
+                dict_id = zstandard.get_frame_parameters(frame).dict_id
+                if dict_id not in self.decompressors:
+                    raise ValueError('Missing payload dictionary {}'.format(dict_id))
+                return self.decompressors[dict_id].decompress(frame)
+        return value
+
+    def is_compressed(self, value):
+        return isinstance(value, bytes) and value[:1] in [ZLIB_PAYLOAD, ZSTD_PAYLOAD]
+
+Compressor = PayloadCompressor(**payload_compression_config)
+
+class JSONPayload():
+    # raw response bytes, parsed only where a field is actually read
+    def __init__(self, content):
+        self.content = content
+        self.data = None
+        self.text = None
+
+    def json(self):
+        return json_loads(self.content)
+
+    def get_data(self):
+        if self.data is None:
+            self.data = self.json()
+        return self.data
+
+    def __getitem__(self, key):
+        return self.get_data()[key]
+
+    def __contains__(self, key):
+        return key in self.get_data()
+
+    def get(self, key, default=None):
+        return self.get_data().get(key, default)
+
+    def get_text(self):
+        if self.text is None:
+            self.text = (self.content.decode('utf-8') if isinstance(self.content, bytes)
+                         else self.content)
+        return self.text
+
+    def is_lazy(self, name):
+        # a fast parser reads a payload whole quicker than the stdlib decodes
+        # one result set, unless that result set is a small part of the payload
+        if self.data is not None:
+            return False
+        if not fast_json_loads:
+            return True
+        if len(self.content) < LAZY_PAYLOAD_BYTES:
+            return False
+        return get_result_set_share(self.get_text(), name) < 0.5
+
+    def get_result_set(self, name):
+        if self.is_lazy(name):
+            result_set = find_result_set(self.get_text(), name)
+            if result_set is not None:
+                return result_set
+        for result_set in self.get_data().get('resultSets', []):
+            if result_set.get('name') == name:
+                return result_set
+        return None
+
+    def is_valid(self):
+        # parsed once in full so truncated bodies are never staged as 200 payloads,
+        # the result is dropped to keep the buffered instances small
+        try:
+            json_loads(self.content)
+        except ValueError:
+            return False
+        return True
+
+    def get_size(self):
+        return len(self.content)
+
+    def __getstate__(self):
+        return {'content': self.content, 'data': None, 'text': None}
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(json.dumps(value).encode('utf-8'))
+
+result_set_name_pattern = re.compile(r'"name"\s*:')
+
+def get_result_set_name_pattern(name):
+    return re.compile(r'"name"\s*:\s*{}'.format(re.escape(json.dumps(name))))
+
+def get_result_set_share(text, name):
+    # the text between this result set's name and the next one approximates its size
+    match = get_result_set_name_pattern(name).search(text)
+    if match is None or len(text) == 0:
+        return 1.0
+    next_match = result_set_name_pattern.search(text, match.end())
+    end = next_match.start() if next_match is not None else len(text)
+    return (end - match.start()) / len(text)
+
+def find_result_set(content, name):
+    # decodes only the object holding the named resultSet, the caller
+    # falls back to a full parse when it can not be located in the text
+    text = content.decode('utf-8') if isinstance(content, bytes) else content
+    for match in get_result_set_name_pattern(name).finditer(text):
+        start = text.rfind('{', 0, match.start())
+        if start < 0:
+            continue
+        try:
+            result_set, end = json_decoder.raw_decode(text, start)
+        except ValueError:
+            continue
+        if (isinstance(result_set, dict) and result_set.get('name') == name
+                and 'rowSet' in result_set):
+            return result_set
+    return None
+
+class CompressedJSON(types.TypeDecorator):
+    impl = types.LargeBinary
+
+    def __init__(self, endpoint=None, *args, **kwargs):
+        self.endpoint = endpoint
+        super().__init__(*args, **kwargs)
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, JSONPayload):
+            value = Compressor.compress(self.endpoint, value.content)
+        elif value is not None:
+            value = Compressor.compress(self.endpoint, json.dumps(value).encode('utf-8'))
+        return value
+
+    def result_processor(self, dialect, coltype):
+        # legacy rows come back as text, which the binary processor would reject
+        def process(value):
+            return self.process_result_value(value, dialect)
+        return process
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            value = Compressor.decompress(value)
+            value = value.encode('utf-8') if isinstance(value, str) else value
+            # legacy rows store a missing payload as json null
+            value = JSONPayload(value) if value.strip() != b'null' else None
+        return value
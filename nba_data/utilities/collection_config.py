@@ -15,6 +15,64 @@ site_dict = {'fd':"fd",
              'draftkings':"dk",
              'DraftKings':"dk"}
 
+response_cache_config = {'cache_dir': '/Volumes/Sports Data/nba_response_cache',
+                         'max_bytes': 20 * 1024 ** 3,
+                         'mode': 'read_write'}
+
+# each database path can be overridden by its environment variable
+database_config = {'staging': {'path': '/Volumes/Sports Data/nba_staging_data.db',
+                               'env_var': 'NBA_STAGING_DB',
+                               'profile': 'safe'},
+                   'processing': {'path': '/Volumes/Sports Data/nba_data.db',
+                                  'env_var': 'NBA_PROCESSING_DB',
+                                  'profile': 'safe'}}
+
+# processed tables scoped by sport and season can be stored one file per
+# season, partitioning is off while no partition_dir is set
+processing_partition_config = {'partition_dir': None,
+                               'env_var': 'NBA_PROCESSING_PARTITION_DIR',
+                               'profile': 'safe',
+                               'max_attached': 10}
+
+# processed tables can be mirrored into duckdb for the analytical reads,
+# the mirror is off while no mirror_dir is set or duckdb is not installed
+duckdb_mirror_config = {'mirror_dir': None,
+                        'env_var': 'NBA_DUCKDB_MIRROR_DIR',
+                        'threads': None,
+                        'batchsize': 100000}
+
+# pragmas applied to every new sqlite connection, in order. fast may lose the
+# last commits on power loss but never corrupts, bulk-load is only for data
+# that can be rebuilt
+sqlite_profiles = {'default': [],
+                   'safe': [('journal_mode', 'WAL'),
+                            ('synchronous', 'FULL'),
+                            ('busy_timeout', 30000)],
+                   'fast': [('journal_mode', 'WAL'),
+                            ('synchronous', 'NORMAL'),
+                            ('cache_size', -256 * 1024),
+                            ('mmap_size', 8 * 1024 ** 3),
+                            ('temp_store', 'MEMORY'),
+                            ('busy_timeout', 30000)],
+                   'bulk-load': [('journal_mode', 'WAL'),
+                                 ('synchronous', 'OFF'),
+                                 ('cache_size', -1024 * 1024),
+                                 ('mmap_size', 8 * 1024 ** 3),
+                                 ('temp_store', 'MEMORY'),
+                                 ('busy_timeout', 30000)]}
+
+# payloads fall back to zlib when zstandard is not installed
+payload_compression_config = {'codec': 'zstd',
+                              'level': 3,
+                              'dictionary_dir': '/Volumes/Sports Data/nba_payload_dictionaries',
+                              'dictionary_size': 112640}
+
+request_retry_config = {'max_retries': 5,
+                        'base_delay_sec': 1,
+                        'max_delay_sec': 60,
+                        'timeout_sec': 30,
+                        'retry_status_codes': [408, 429]}
+
 nba_headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:70.0) Gecko/20100101 Firefox/70.0',
                'Referer': 'https://stats.nba.com'}
 
@@ -1,19 +1,48 @@
-from datetime import datetime
-import requests
+from requests.exceptions import RequestException
+from .collection_config import request_retry_config
+from .rate_limiter import RetryPolicy
+import time
 
-def request_data(url, params, headers, Proxies):
-    proxy = Proxies.get_proxy()
-    try:
-        req_response = requests.get(url,
-                                    params=params,
-                                    headers=headers,
-                                    proxies=proxy['proxy_address'])
-        Proxies.put_proxy(proxy['proxy_address'])
-    except:
-        print('Request timeout error with base_url: {}'.format(url))
-        print('Request timeout error with params: {}'.format(params))
-        Proxies.timeout_proxy(proxy['proxy_address'], datetime.now())
-        req_response = request_data(url, params, headers)
+def request_data(url, params, headers, Proxies, retry_policy=None):
+    if retry_policy is None:
+        retry_policy = Retries
+    req_response = None
+    failure_reason = None
+    for attempt in range(retry_policy.max_retries + 1):
+        if attempt > 0:
+            time.sleep(retry_policy.get_delay(attempt - 1))
+        Proxies.concurrency.acquire()
+        proxy = None
+        latency_sec = None
+        try:
+            proxy = Proxies.get_proxy()
+            start_time = time.perf_counter()
+            try:
+                req_response = proxy['session'].get(url,
+                                                    params=params,
+                                                    headers=headers,
+                                                    timeout=retry_policy.timeout_sec)
+            except RequestException as request_error:
+                print('Request error with base_url: {}'.format(url))
+                print('Request error with params: {}'.format(params))
+                failure_reason = type(request_error).__name__
+                continue
+            if retry_policy.is_retry_status(req_response.status_code):
+                failure_reason = 'HTTP {}'.format(req_response.status_code)
+                continue
+            latency_sec = time.perf_counter() - start_time
+            return req_response
+        finally:
+            # every attempt that took a slot gives it back, whichever way it exits
+            if proxy is not None:
+                if latency_sec is None:
+                    Proxies.backoff_proxy(proxy['proxy_address'])
+                else:
+                    Proxies.put_proxy(proxy['proxy_address'],
+                                      latency_sec=latency_sec,
+                                      bytes_in=len(req_response.content))
+            Proxies.concurrency.release(success=latency_sec is not None)
+    retry_policy.add_dead_letter(url, params, failure_reason, retry_policy.max_retries + 1)
     return req_response
 
 def set_status_values(req_response):
@@ -24,3 +53,5 @@ def set_status_values(req_response):
 def update_status_reason(reason):
     status_reason = reason
     return status_reason
+
+Retries = RetryPolicy(**request_retry_config)
@@ -0,0 +1,81 @@
+from concurrent.futures import (ThreadPoolExecutor, FIRST_COMPLETED, wait)
+from threading import Lock
+import time
+
+class EndpointStats():
+    def __init__(self):
+        self.lock = Lock()
+        self.stats = {}
+
+    def record(self, endpoint, start_time, end_time):
+        with self.lock:
+            if endpoint not in self.stats:
+                self.stats[endpoint] = {'requests': 0,
+                                        'first_start': start_time,
+                                        'last_end': end_time,
+                                        'total_sec': 0}
+            endpoint_stats = self.stats[endpoint]
+            endpoint_stats['requests'] += 1
+            endpoint_stats['first_start'] = min(endpoint_stats['first_start'], start_time)
+            endpoint_stats['last_end'] = max(endpoint_stats['last_end'], end_time)
+            endpoint_stats['total_sec'] += (end_time - start_time)
+
+    def get_report(self):
+        report = {}
+        with self.lock:
+            for endpoint, endpoint_stats in self.stats.items():
+                wall_sec = endpoint_stats['last_end'] - endpoint_stats['first_start']
+                requests = endpoint_stats['requests']
+                report[endpoint] = {'requests': requests,
+                                    'wall_sec': wall_sec,
+                                    'req_per_sec': (requests / wall_sec) if wall_sec > 0 else None,
+                                    'avg_latency_sec': endpoint_stats['total_sec'] / requests}
+        return report
+
+    def print_report(self):
+        for endpoint, endpoint_report in sorted(self.get_report().items()):
+            req_per_sec = endpoint_report['req_per_sec']
+            print('{:<16} {:>7} requests  {:>8} req/sec  {:>7.3f} sec avg latency'
+                  .format(endpoint,
+                          endpoint_report['requests'],
+                          '{:.2f}'.format(req_per_sec) if req_per_sec is not None else '-',
+                          endpoint_report['avg_latency_sec']))
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+class FetchPool():
+    def __init__(self, max_in_flight=None, proxies=None):
+        if max_in_flight is None:
+            max_in_flight = len(proxies.ips) if proxies is not None else 1
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.pending = set()
+
+    def submit(self, endpoint, func, *args, **kwargs):
+        future = self.executor.submit(func, *args, **kwargs)
+        future.endpoint = endpoint
+        self.pending |= {future}
+        return future
+
+    def completed_futures(self):
+        while self.pending:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future
+
+    def completed(self):
+        for future in self.completed_futures():
+            yield future.endpoint, future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+FetchStats = EndpointStats()
+
+def timed_request(endpoint, func, *args, **kwargs):
+    start_time = time.perf_counter()
+    response = func(*args, **kwargs)
+    FetchStats.record(endpoint, start_time, time.perf_counter())
+    return response
@@ -0,0 +1,75 @@
+from heapq import (heappop, heappush)
+
+class FetchTask():
+    def __init__(self, endpoint, func, args, priority, groups):
+        self.endpoint = endpoint
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.groups = set(groups)
+        self.waiting = 0
+        self.dependents = []
+        self.done = False
+
+class FetchScheduler():
+    def __init__(self, fetch_pool):
+        self.fetch_pool = fetch_pool
+        self.ready_tasks = []
+        self.task_count = 0
+        self.group_counts = {}
+        self.group_callbacks = []
+
+    def add_group_callback(self, callback):
+        self.group_callbacks.append(callback)
+
+    def has_group(self, group):
+        return group in self.group_counts
+
+    def add_task(self, endpoint, func, *args, priority=(), groups=(), depends_on=()):
+        task = FetchTask(endpoint, func, args, priority, groups)
+        for group in task.groups:
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        for dependency in depends_on:
+            if dependency is not None and not dependency.done:
+                dependency.dependents.append(task)
+                task.waiting += 1
+        if task.waiting == 0:
+            self.push_task(task)
+        return task
+
+    def push_task(self, task):
+        self.task_count += 1
+        heappush(self.ready_tasks, (task.priority, self.task_count, task))
+
+    def dispatch(self):
+        while (self.ready_tasks
+               and len(self.fetch_pool.pending) < self.fetch_pool.max_in_flight):
+            priority, task_count, task = heappop(self.ready_tasks)
+            future = self.fetch_pool.submit(task.endpoint, task.func, *task.args)
+            future.task = task
+
+    def finish_task(self, task):
+        task.done = True
+        for dependent in task.dependents:
+            dependent.waiting -= 1
+            if dependent.waiting == 0:
+                self.push_task(dependent)
+        ready_groups = []
+        for group in task.groups:
+            self.group_counts[group] -= 1
+            if self.group_counts[group] == 0:
+                del self.group_counts[group]
+                ready_groups.append(group)
+        for callback in self.group_callbacks:
+            for group in ready_groups:
+                callback(group)
+
+    def completed(self):
+        # a task is finished only after its result has been handled, so any
+        # follow-up tasks added for the same group keep that group open
+        self.dispatch()
+        for future in self.fetch_pool.completed_futures():
+            task = future.task
+            yield task.endpoint, future.result()
+            self.finish_task(task)
+            self.dispatch()
@@ -1,23 +1,48 @@
 from datetime import datetime
-from queue import Queue
 from datetime import timedelta
-import time
+from threading import Condition
+from .proxy_scores import ProxyScore
+from .proxy_sessions import ProxySession
+from .rate_limiter import (AIMDConcurrency, TokenBucket)
+import random
 
 class ProxyQueue():
-    def __init__(self):
+    def __init__(self, ips=None, pool_connections=1, pool_maxsize=1):
         self.timeout_pause = timedelta(minutes=5)
+        self.backoff_base_sec = 5
+        self.parked_poll_sec = 0.5
         self.pause_penalty = 5
+        self.proxy_rate = None
+        self.score_alpha = 0.2
         self.user = 'd6e048be13'
         self.pw = 'uVA25yqC'
         self.ips = ['149.20.244.254', '199.250.188.145', '199.250.189.116',
                    '23.244.230.130', '23.89.115.198', None]
-        self.proxies = Queue(maxsize=6)
+        if ips is not None:
+            self.ips = list(ips)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle = set()
+        self.sessions = {}
+        self.buckets = {}
+        self.scores = {}
+        self.failures = {}
+        self.resume_times = {}
+        self.condition = Condition()
+        self.concurrency = AIMDConcurrency(max_limit=len(self.ips))
         self.init_proxies()
 
     def init_proxies(self):
         for ip in self.ips:
             proxy_address = self.get_proxy_address(ip)
-            self.put_proxy(proxy_address)
+            self.buckets[ip] = TokenBucket(rate=self.get_proxy_rate(proxy_address))
+            self.scores[ip] = ProxyScore(alpha=self.score_alpha)
+            self.sessions[ip] = ProxySession(proxy_address,
+                                             pool_connections=self.pool_connections,
+                                             pool_maxsize=self.pool_maxsize)
+            self.failures[ip] = 0
+            self.resume_times[ip] = None
+            self.idle |= {ip}
 
     def get_proxy_address(self, ip):
         if ip is not None:
@@ -26,17 +51,38 @@ class ProxyQueue():
             proxy_address = None
         return proxy_address
 
-    def put_proxy(self, proxy_address):
-        self.proxies.put({'proxy_address':proxy_address,
-                          'last_used_time':datetime.now(),
-                          'timeout':False,
-                          'pause_sec':self.get_proxy_pause_sec(proxy_address)})
+    def get_proxy_ip(self, proxy_address):
+        if proxy_address is not None:
+            ip = proxy_address['http'].rsplit('@', 1)[-1].strip('/')
+        else:
+            ip = None
+        return ip
+
+    def get_proxy_session(self, proxy_address):
+        return self.sessions[self.get_proxy_ip(proxy_address)]
 
-    def timeout_proxy(self, proxy_address, last_used_time):
-        self.proxies.put({'proxy_address':proxy_address,
-                          'last_used_time':last_used_time,
-                          'timeout':True,
-                          'pause_sec':self.get_proxy_pause_sec(proxy_address)})
+    def put_proxy(self, proxy_address, latency_sec=None, bytes_in=0):
+        ip = self.get_proxy_ip(proxy_address)
+        with self.condition:
+            if latency_sec is not None:
+                self.scores[ip].record_success(latency_sec, bytes_in)
+            self.failures[ip] = 0
+            self.resume_times[ip] = None
+            self.idle |= {ip}
+            self.condition.notify_all()
+
+    def backoff_proxy(self, proxy_address):
+        ip = self.get_proxy_ip(proxy_address)
+        current_time = datetime.now()
+        with self.condition:
+            self.scores[ip].record_failure()
+            self.failures[ip] += 1
+            backoff_sec = random.uniform(0.5, 1) * min(self.timeout_pause.total_seconds(),
+                                                       self.backoff_base_sec
+                                                       * 2 ** (self.failures[ip] - 1))
+            self.resume_times[ip] = current_time + timedelta(seconds=backoff_sec)
+            self.idle |= {ip}
+            self.condition.notify_all()
 
     def get_proxy_pause_sec(self, proxy_address):
         pause_sec = 0
@@ -44,32 +90,86 @@ class ProxyQueue():
             pause_sec = self.pause_penalty
         return timedelta(seconds=pause_sec)
 
+    def get_proxy_rate(self, proxy_address):
+        pause_sec = self.get_proxy_pause_sec(proxy_address).total_seconds()
+        if pause_sec > 0:
+            return 1 / pause_sec
+        return self.proxy_rate
+
     def get_proxy(self):
-        proxy = self.proxies.get()
-        current_time = datetime.now()
-        last_used_time = proxy['last_used_time']
-        pause_sec = proxy['pause_sec']
-        if proxy['timeout'] is False:
-            self.pause_proxy_return(last_used_time, current_time, pause_sec)
-        elif proxy['timeout'] is True:
-            if self.timeout_status(last_used_time, current_time):
-                self.timeout_proxy(proxy['proxy_address'], last_used_time)
-                proxy = self.get_proxy()
-        return proxy
-
-    def timeout_status(self, last_used_time, current_time):
-        if (current_time - last_used_time) < self.timeout_pause:
-            return True
-        else:
-            return False
+        with self.condition:
+            while True:
+                selected, ip, wait_sec = self.select_proxy(datetime.now())
+                if selected:
+                    break
+                self.condition.wait(timeout=wait_sec)
+            self.idle -= {ip}
+        self.buckets[ip].acquire()
+        proxy_address = self.get_proxy_address(ip)
+        return {'proxy_address':proxy_address,
+                'session':self.get_proxy_session(proxy_address)}
+
+    def select_proxy(self, current_time):
+        best_ip = None
+        best_expected_sec = None
+        parked_sec = self.parked_poll_sec
+        for ip in self.idle:
+            resume_sec = self.get_resume_sec(ip, current_time)
+            if resume_sec > 0:
+                parked_sec = min(parked_sec, resume_sec)
+                continue
+            expected_sec = self.scores[ip].get_expected_sec(self.buckets[ip].get_wait_sec())
+            if best_expected_sec is None or expected_sec < best_expected_sec:
+                best_ip = ip
+                best_expected_sec = expected_sec
+        if best_expected_sec is None:
+            return False, None, parked_sec
+        return True, best_ip, 0
 
-    def pause_proxy_return(self, last_used_time, current_time, pause_sec):
-        if (current_time - last_used_time) < pause_sec:
-            pause = (pause_sec - (current_time - last_used_time))
-            sec_sleep = (pause.seconds + pause.microseconds / 1000000)
-            time.sleep(sec_sleep)
+    def get_resume_sec(self, ip, current_time):
+        resume_time = self.resume_times[ip]
+        if resume_time is None:
+            return 0
+        return (resume_time - current_time).total_seconds()
 
     def set_pause_penalty(self, pause_penalty):
         self.pause_penalty = pause_penalty
+        for ip in self.ips:
+            proxy_address = self.get_proxy_address(ip)
+            self.buckets[ip].set_rate(self.get_proxy_rate(proxy_address))
+
+    def get_proxy_scores(self):
+        with self.condition:
+            return dict((ip, score.get_score()) for ip, score in self.scores.items())
+
+    def print_proxy_scores(self):
+        for ip, score in sorted(self.get_proxy_scores().items(),
+                                key=lambda item: item[1]['expected_sec']):
+            print('{:<16} {:>8} sec latency  {:>6.1%} errors  {:>10} bytes/sec  '
+                  '{:>7} ok  {:>5} failed'
+                  .format(str(ip),
+                          '{:.3f}'.format(score['latency_sec'])
+                          if score['latency_sec'] is not None else '-',
+                          score['error_rate'],
+                          '{:.0f}'.format(score['bytes_per_sec'])
+                          if score['bytes_per_sec'] is not None else '-',
+                          score['successes'],
+                          score['failures']))
+
+    def get_session_counters(self):
+        return dict((ip, session.get_counters()) for ip, session in self.sessions.items())
+
+    def print_session_counters(self):
+        for ip, counters in self.get_session_counters().items():
+            print('{:<16} {:>7} requests  {:>5} opened  {:>7} reused  {:>12} bytes in'
+                  .format(str(ip),
+                          counters['requests'],
+                          counters['connections_opened'],
+                          counters['connections_reused'],
+                          counters['bytes_in']))
+
+def split_proxy_ips(ips, workers):
+    workers = max(1, min(workers, len(ips)))
+    return [ips[worker::workers] for worker in range(workers)]
 
 Proxies = ProxyQueue()
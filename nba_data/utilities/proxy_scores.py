@@ -0,0 +1,38 @@
+class ProxyScore():
+    def __init__(self, alpha=0.2, min_success_rate=0.05):
+        self.alpha = alpha
+        self.min_success_rate = min_success_rate
+        self.latency_sec = None
+        self.error_rate = 0.0
+        self.bytes_per_sec = None
+        self.successes = 0
+        self.failures = 0
+
+    def update_ewma(self, current_value, observed_value):
+        if current_value is None:
+            return observed_value
+        return self.alpha * observed_value + (1 - self.alpha) * current_value
+
+    def record_success(self, latency_sec, bytes_in):
+        self.successes += 1
+        self.latency_sec = self.update_ewma(self.latency_sec, latency_sec)
+        self.error_rate = self.update_ewma(self.error_rate, 0.0)
+        if latency_sec > 0:
+            self.bytes_per_sec = self.update_ewma(self.bytes_per_sec, bytes_in / latency_sec)
+
+    def record_failure(self):
+        self.failures += 1
+        self.error_rate = self.update_ewma(self.error_rate, 1.0)
+
+    def get_expected_sec(self, wait_sec):
+        latency_sec = self.latency_sec if self.latency_sec is not None else 0
+        success_rate = max(1 - self.error_rate, self.min_success_rate)
+        return wait_sec + latency_sec / success_rate
+
+    def get_score(self):
+        return {'latency_sec': self.latency_sec,
+                'error_rate': self.error_rate,
+                'bytes_per_sec': self.bytes_per_sec,
+                'successes': self.successes,
+                'failures': self.failures,
+                'expected_sec': self.get_expected_sec(0)}
@@ -0,0 +1,54 @@
+from threading import Lock
+from requests.adapters import HTTPAdapter
+import requests
+
+class ProxySession():
+    def __init__(self, proxy_address, pool_connections=1, pool_maxsize=1):
+        self.proxy_address = proxy_address
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.lock = Lock()
+        self.request_count = 0
+        self.bytes_in = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        req_response = self.session.get(url,
+                                        params=params,
+                                        headers=headers,
+                                        proxies=self.proxy_address,
+                                        timeout=timeout)
+        with self.lock:
+            self.request_count += 1
+            self.bytes_in += self.get_response_bytes(req_response)
+        return req_response
+
+    def get_response_bytes(self, req_response):
+        try:
+            return req_response.raw.tell()
+        except AttributeError:
+            return len(req_response.content)
+
+    def get_connection_pools(self):
+        pool_managers = [self.adapter.poolmanager] + list(self.adapter.proxy_manager.values())
+        connection_pools = []
+        for pool_manager in pool_managers:
+            for pool_key in pool_manager.pools.keys():
+                connection_pools.append(pool_manager.pools[pool_key])
+        return connection_pools
+
+    def get_counters(self):
+        connections_opened = sum(pool.num_connections for pool in self.get_connection_pools())
+        with self.lock:
+            request_count = self.request_count
+            bytes_in = self.bytes_in
+        return {'requests': request_count,
+                'connections_opened': connections_opened,
+                'connections_reused': max(request_count - connections_opened, 0),
+                'bytes_in': bytes_in}
+
+    def close(self):
+        self.session.close()
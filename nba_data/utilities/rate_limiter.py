@@ -0,0 +1,109 @@
+from datetime import datetime
+from threading import (Condition, Lock)
+import random
+import time
+
+class TokenBucket():
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = rate
+
+    def refill(self, current_time):
+        if self.rate is not None:
+            self.tokens = min(self.capacity,
+                              self.tokens + (current_time - self.updated) * self.rate)
+        self.updated = current_time
+
+    def get_wait_sec(self):
+        with self.lock:
+            if self.rate is None:
+                return 0
+            self.refill(time.monotonic())
+            if self.tokens >= 1:
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def reserve(self):
+        with self.lock:
+            if self.rate is None:
+                return 0
+            self.refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait_sec = self.reserve()
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+        return wait_sec
+
+class AIMDConcurrency():
+    def __init__(self, max_limit, min_limit=1, increase=1.0, decrease=0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.condition = Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, success):
+        with self.condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            else:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            self.condition.notify_all()
+
+class RetryPolicy():
+    def __init__(self, max_retries, base_delay_sec, max_delay_sec, timeout_sec,
+                 retry_status_codes):
+        self.max_retries = max_retries
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.timeout_sec = timeout_sec
+        self.retry_status_codes = set(retry_status_codes)
+        self.lock = Lock()
+        self.dead_letters = []
+
+    def get_delay(self, attempt):
+        return random.uniform(0, min(self.max_delay_sec,
+                                     self.base_delay_sec * 2 ** attempt))
+
+    def is_retry_status(self, status_code):
+        return (status_code in self.retry_status_codes) or (status_code >= 500)
+
+    def add_dead_letter(self, url, params, reason, attempts):
+        with self.lock:
+            self.dead_letters.append({'url': url,
+                                      'params': params,
+                                      'reason': reason,
+                                      'attempts': attempts,
+                                      'failed_time': datetime.now()})
+
+    def print_dead_letters(self):
+        with self.lock:
+            dead_letters = list(self.dead_letters)
+        print('{} requests exhausted their retries'.format(len(dead_letters)))
+        for dead_letter in dead_letters:
+            print('\t{} {} ({} after {} attempts)'.format(dead_letter['url'],
+                                                        dead_letter['params'],
+                                                        dead_letter['reason'],
+                                                        dead_letter['attempts']))
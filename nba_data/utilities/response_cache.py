@@ -0,0 +1,133 @@
+from threading import Lock
+from .collection_config import response_cache_config
+import hashlib
+import json
+import os
+import time
+
+class CachedResponse():
+    def __init__(self, url, status_code, reason, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+        self.ok = status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+class ResponseCache():
+    def __init__(self, cache_dir, max_bytes, mode='read_write'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.set_mode(mode)
+        self.lock = Lock()
+        self.index = None
+        self.total_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def set_mode(self, mode):
+        if mode not in ['off', 'read_write', 'replay']:
+            raise ValueError('Unknown response cache mode: {}'.format(mode))
+        self.mode = mode
+
+    def get_cache_key(self, base_url, params):
+        normalized_params = sorted((str(key), str(value)) for key, value in params.items()
+                                   if value is not None)
+        normalized_request = json.dumps([base_url, normalized_params])
+        return hashlib.sha256(normalized_request.encode('utf-8')).hexdigest()
+
+    def get_cache_path(self, cache_key):
+        return os.path.join(self.cache_dir, cache_key[:2], cache_key)
+
+    def load_index(self):
+        self.index = {}
+        self.total_bytes = 0
+        if os.path.isdir(self.cache_dir):
+            for sub_dir in os.scandir(self.cache_dir):
+                if sub_dir.is_dir():
+                    for entry in os.scandir(sub_dir.path):
+                        if entry.is_file() and not entry.name.endswith('.tmp'):
+                            entry_stat = entry.stat()
+                            self.index[entry.name] = [entry_stat.st_size, entry_stat.st_mtime]
+                            self.total_bytes += entry_stat.st_size
+
+    def get(self, base_url, params):
+        if self.mode == 'off':
+            return None
+        cache_key = self.get_cache_key(base_url, params)
+        cache_path = self.get_cache_path(cache_key)
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                meta = json.loads(cache_file.readline())
+                content = cache_file.read()
+        except (FileNotFoundError, ValueError):
+            with self.lock:
+                self.counters['misses'] += 1
+            return None
+        access_time = time.time()
+        os.utime(cache_path, (access_time, access_time))
+        with self.lock:
+            self.counters['hits'] += 1
+            if self.index is not None and cache_key in self.index:
+                self.index[cache_key][1] = access_time
+        return CachedResponse(meta['url'], meta['status_code'], meta['reason'], content)
+
+    def put(self, base_url, params, req_response):
+        if self.mode != 'read_write' or req_response is None:
+            return False
+        if req_response.status_code != 200:
+            return False
+        cache_key = self.get_cache_key(base_url, params)
+        cache_path = self.get_cache_path(cache_key)
+        meta = json.dumps({'url': req_response.url,
+                           'status_code': req_response.status_code,
+                           'reason': req_response.reason})
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(tmp_path, 'wb') as cache_file:
+            cache_file.write(meta.encode('utf-8') + b'\n')
+            cache_file.write(req_response.content)
+        os.replace(tmp_path, cache_path)
+        entry_size = os.path.getsize(cache_path)
+        with self.lock:
+            if self.index is None:
+                self.load_index()
+            else:
+                if cache_key in self.index:
+                    self.total_bytes -= self.index[cache_key][0]
+                self.index[cache_key] = [entry_size, time.time()]
+                self.total_bytes += entry_size
+            self.counters['writes'] += 1
+            self.evict()
+        return True
+
+    def evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return 0
+        eviction_count = 0
+        for cache_key, (entry_size, access_time) in sorted(self.index.items(),
+                                                           key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self.get_cache_path(cache_key))
+            except FileNotFoundError:
+                pass
+            del self.index[cache_key]
+            self.total_bytes -= entry_size
+            eviction_count += 1
+        self.counters['evictions'] += eviction_count
+        return eviction_count
+
+    def print_counters(self):
+        with self.lock:
+            counters = dict(self.counters)
+        print('response cache ({}): {} hits  {} misses  {} writes  {} evictions'
+              .format(self.mode,
+                      counters['hits'],
+                      counters['misses'],
+                      counters['writes'],
+                      counters['evictions']))
+
+Cache = ResponseCache(**response_cache_config)
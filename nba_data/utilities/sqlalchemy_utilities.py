@@ -1,13 +1,137 @@
+from sqlalchemy import (Column, MetaData, Table, bindparam)
+
+class RecordTransformer():
+    # column order, defaults and insert statement are worked out once per table
+    def __init__(self, sql_tbl_class):
+        self.table = sql_tbl_class.__table__
+        self.columns = [col for col in self.table.c if not col.primary_key]
+        self.column_names = [col.name for col in self.columns]
+        self.column_index = dict((name, i) for i, name in enumerate(self.column_names))
+        self.defaults = tuple(col.default.arg if col.default is not None else None
+                              for col in self.columns)
+        self.statements = {}
+        self.temp_table = None
+
+    def get_record(self, instance_data):
+        # records from the processing transformers are already in column order
+        if isinstance(instance_data, tuple):
+            return instance_data
+        record = list(self.defaults)
+        column_index = self.column_index
+        for key, value in instance_data.items():
+            i = column_index.get(key)
+            if i is not None:
+                record[i] = value
+        return tuple(record)
+
+    def get_record_dict(self, record):
+        return dict(zip(self.column_names, record))
+
+    def get_temp_table(self):
+        # candidate rows for bulk_merge_records, one per connection and never persisted
+        if self.temp_table is None:
+            self.temp_table = Table('merge_{}'.format(self.table.name), MetaData(),
+                                    *[Column(col.name, col.type) for col in self.columns],
+                                    prefixes=['TEMP'])
+        return self.temp_table
+
+    def get_statement(self, dialect, table):
+        if (dialect.name, table.name) not in self.statements:
+            compiled = (table.insert()
+                             .values(dict((name, bindparam(name))
+                                          for name in self.column_names))
+                             .compile(dialect=dialect))
+            order = None
+            if compiled.positional:
+                order = [self.column_index[name] for name in compiled.positiontup]
+                if order == sorted(order):
+                    order = None
+            processors = []
+            for i, col in enumerate(self.columns):
+                processor = col.type.dialect_impl(dialect).bind_processor(dialect)
+                if processor is not None:
+                    processors.append((i, processor))
+            self.statements[(dialect.name, table.name)] = (compiled, order, processors)
+        return self.statements[(dialect.name, table.name)]
+
+    def get_parameters(self, records, order, processors):
+        # bind processors run here since the positional insert skips the type system
+        parameters = []
+        for record in records:
+            if processors:
+                record = list(record)
+                for i, processor in processors:
+                    record[i] = processor(record[i])
+            if order:
+                record = [record[i] for i in order]
+            parameters.append(tuple(record))
+        return parameters
+
+    def insert(self, engine, data_instances, table=None):
+        table = table if table is not None else self.table
+        records = [self.get_record(instance) for instance in data_instances]
+        compiled, order, processors = self.get_statement(engine.dialect, table)
+        if compiled.positional:
+            engine.execute(str(compiled), self.get_parameters(records, order, processors))
+        else:
+            engine.execute(table.insert(),
+                           [self.get_record_dict(record) for record in records])
+
+    def get_merge_sql(self, key_names):
+        # IS keeps rows with null keys from being inserted twice, the way a python set would
+        column_names = ', '.join(self.column_names)
+        key_filter = ' AND '.join('existing.{0} IS candidate.{0}'.format(key_name)
+                                  for key_name in key_names)
+        return ('INSERT INTO {table} ({columns}) '
+                'SELECT {columns} FROM temp.{temp_table} AS candidate '
+                'WHERE NOT EXISTS (SELECT 1 FROM {table} AS existing WHERE {key_filter}) '
+                'ORDER BY candidate.rowid '
+                'ON CONFLICT DO NOTHING'.format(table=self.table.name,
+                                                columns=column_names,
+                                                temp_table=self.get_temp_table().name,
+                                                key_filter=key_filter))
+
+    def merge(self, engine, data_instances, key_names, batchsize=250000):
+        temp_table = self.get_temp_table()
+        merge_sql = self.get_merge_sql(key_names)
+        inserted_count = 0
+        with engine.begin() as connection:
+            temp_table.drop(connection, checkfirst=True)
+            temp_table.create(connection)
+            for i in range(0, len(data_instances), batchsize):
+                self.insert(connection, data_instances[i:i + batchsize], temp_table)
+                inserted_count += connection.execute(merge_sql).rowcount
+                connection.execute(temp_table.delete())
+            temp_table.drop(connection)
+        return inserted_count
+
+record_transformers = {}
+
+def get_record_transformer(sql_tbl_class):
+    if sql_tbl_class not in record_transformers:
+        record_transformers[sql_tbl_class] = RecordTransformer(sql_tbl_class)
+    return record_transformers[sql_tbl_class]
+
 def bulk_insert_records(engine, data_instances, sql_tbl_class, batchsize=250000):
     if data_instances is not None:
+        record_transformer = get_record_transformer(sql_tbl_class)
         for i in range(0, len(data_instances), batchsize):
-            engine.execute(sql_tbl_class.__table__.insert(),
-                           [get_bulk_instance(instance, sql_tbl_class) for instance in
-                            data_instances[i:i + batchsize]])
+            record_transformer.insert(engine, data_instances[i:i + batchsize])
     table_name = sql_tbl_class.__table__.name
     log_note = 'Inserted {} records in {}'.format(len(data_instances), table_name)
     return log_note
 
+def bulk_merge_records(engine, data_instances, sql_tbl_class, key_names, batchsize=250000):
+    # rows whose keys are already stored are skipped by the database, not a preloaded key set
+    inserted_count = 0
+    if data_instances is not None:
+        inserted_count = get_record_transformer(sql_tbl_class).merge(engine, data_instances,
+                                                                     key_names, batchsize)
+    table_name = sql_tbl_class.__table__.name
+    log_note = 'Inserted {} of {} records in {}'.format(inserted_count, len(data_instances),
+                                                       table_name)
+    return log_note
+
 def get_bulk_instance(instance_data, sql_tbl_class):
     instance_record = create_instance_record(sql_tbl_class)
     for key, value in instance_data.items():
@@ -27,3 +151,8 @@ def create_instance_record(sql_tbl_class):
 
 def get_row_dict(row):
     return row._asdict()
+
+def get_chunks(values, size):
+    # keeps multi-row statements under the sqlite bound parameter limit
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from sqlalchemy import (create_engine, event)
+from .collection_config import (database_config, sqlite_profiles)
+import os
+import time
+
+def get_db_path(db_name):
+    db_config = database_config[db_name]
+    return os.environ.get(db_config['env_var']) or db_config['path']
+
+def get_profile_pragmas(profile):
+    if profile not in sqlite_profiles:
+        raise ValueError('Unknown sqlite profile: {}'.format(profile))
+    return sqlite_profiles[profile]
+
+def apply_profile_pragmas(dbapi_connection, profile):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in get_profile_pragmas(profile):
+        cursor.execute('PRAGMA {}={}'.format(pragma, value))
+        cursor.fetchall()
+    cursor.close()
+
+def create_sqlite_engine(db_path, profile='default', **kwargs):
+    get_profile_pragmas(profile)
+    engine = create_engine('sqlite:///{}'.format(db_path), **kwargs)
+    engine.sqlite_profile = profile
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_profile_pragmas(dbapi_connection, engine.sqlite_profile)
+
+    return engine
+
+def set_engine_profile(engine, profile):
+    # pooled connections keep the pragmas they were opened with, so they are dropped
+    get_profile_pragmas(profile)
+    previous_profile = engine.sqlite_profile
+    engine.sqlite_profile = profile
+    engine.dispose()
+    return previous_profile
+
+@contextmanager
+def engine_profile(engine, profile):
+    previous_profile = set_engine_profile(engine, profile)
+    try:
+        yield engine
+    finally:
+        set_engine_profile(engine, previous_profile)
+
+def get_profile_benchmark(db_dir, profiles=None, row_count=20000, payload_bytes=4096,
+                          batch_rows=500):
+    # inserts compressed-payload sized rows in small transactions, then scans them
+    profiles = profiles if profiles is not None else list(sqlite_profiles)
+    benchmark = {}
+    payloads = [os.urandom(payload_bytes) for i in range(16)]
+    for profile in profiles:
+        db_path = os.path.join(db_dir, 'sqlite_profile_{}.db'.format(profile))
+        for suffix in ['', '-wal', '-shm', '-journal']:
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        engine = create_sqlite_engine(db_path, profile)
+        engine.execute('CREATE TABLE payloads (id INTEGER PRIMARY KEY, '
+                       'game_id VARCHAR(10) NOT NULL, json BLOB)')
+        start = time.perf_counter()
+        for i in range(0, row_count, batch_rows):
+            with engine.begin() as connection:
+                connection.execute('INSERT INTO payloads (game_id, json) VALUES (?, ?)',
+                                   [('{:010d}'.format(j), payloads[j % len(payloads)])
+                                    for j in range(i, min(i + batch_rows, row_count))])
+        insert_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        scanned_bytes = 0
+        for game_id, payload in engine.execute('SELECT game_id, json FROM payloads'):
+            scanned_bytes += len(payload)
+        scan_sec = time.perf_counter() - start
+        engine.dispose()
+        benchmark[profile] = {'rows': row_count,
+                              'insert_rows_sec': row_count / insert_sec,
+                              'scan_rows_sec': row_count / scan_sec,
+                              'scan_mb_sec': scanned_bytes / 1024 ** 2 / scan_sec}
+    return benchmark
+
+def print_profile_benchmark(benchmark):
+    print('{:<12}{:>10}{:>18}{:>16}{:>14}'.format('profile', 'rows', 'insert rows/sec',
+                                                  'scan rows/sec', 'scan MB/sec'))
+    for profile, profile_benchmark in benchmark.items():
+        print('{:<12}{:>10}{:>18.0f}{:>16.0f}{:>14.1f}'
+              .format(profile,
+                      profile_benchmark['rows'],
+                      profile_benchmark['insert_rows_sec'],
+                      profile_benchmark['scan_rows_sec'],
+                      profile_benchmark['scan_mb_sec']))
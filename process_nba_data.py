@@ -1,4 +1,6 @@
 from nba_data.processing.db_config import Base, Engine
+from nba_data.staging.db_config import Engine as StagingEngine
+from nba_data.staging.processing_ledger import init_processing_ledger
 from nba_data.processing.nba_game_event_players import GameEventPlayer
 from nba_data.processing.nba_game_events import GameEvent
 from nba_data.processing.nba_game_seq import GameSequence
@@ -22,6 +24,8 @@ from nba_data.processing.process_date_windows import add_date_windows
 from nba_data.processing.process_nba_seq_records import process_game_sequences
 from nba_data.processing.process_on_court_records import process_on_court_records
 from nba_data.processing.process_error_period_starters import remove_error_period_starters
+from nba_data.processing.season_partitions import Partitions
+from nba_data.utilities.sqlite_engine import engine_profile
 import sys
 
 SEASON=2019
@@ -129,16 +133,16 @@ def process_nba_staging_instances():
                 #                  game_starters, win_prob_events, game_shots,
                 #                  game_players, team_rosters, players)
 
-                insert_instances(game_starters)
+                inserted_tables=insert_instances(games, game_starters)
 
-                unprocessed_data.commit()
+                unprocessed_data.commit(inserted_tables)
 
                 # add_date_windows(unprocessed_data.game_ids)
 
-                remove_error_period_starters(unprocessed_data.game_ids)
+                remove_error_period_starters(unprocessed_data.game_ids, sport, season)
 
                 if len(unprocessed_data.game_ids):
-                    process_game_sequences(unprocessed_data.game_ids)
+                    process_game_sequences(unprocessed_data.game_ids, sport, season)
 
                     process_on_court_records(unprocessed_data.game_ids, sport, season)
 
@@ -148,15 +152,21 @@ def process_nba_staging_instances():
     return True
 
 def insert_instances(*args):
+    inserted_tables=[]
     for container in args:
         container.insert()
-    return True
+        inserted_tables.append(container.table_name)
+    return inserted_tables
 
 def main():
 
     Base.metadata.create_all(bind=Engine, checkfirst=True)
+    init_processing_ledger(StagingEngine)
 
-    process_nba_staging_instances()
+    # processed tables can be rebuilt from staging, so they are bulk loaded
+    with engine_profile(Engine, 'bulk-load'), engine_profile(StagingEngine, 'fast'):
+        with Partitions.use_profile('bulk-load'):
+            process_nba_staging_instances()
 
     return True
 
@@ -0,0 +1,28 @@
+from nba_data.processing.db_config import (Base, Engine)
+from nba_data.processing.season_partitions import (Partitions, get_main_partitions)
+import argparse
+
+def main(partitions=None, remove=False):
+    # copies an existing single file processing database into season partitions
+    if not Partitions.is_enabled():
+        raise RuntimeError('Set NBA_PROCESSING_PARTITION_DIR to split the processing database')
+    Base.metadata.create_all(bind=Engine, checkfirst=True)
+    if remove:
+        for sport, season in (partitions or get_main_partitions()):
+            Partitions.remove_partition(sport, season)
+    with Partitions.use_profile('bulk-load'):
+        partitions = Partitions.split_database(partitions)
+    return partitions
+
+def parse_partition(value):
+    sport, season = value.rsplit(':', 1)
+    return sport, int(season)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--partition', action='append', type=parse_partition, default=None,
+                        help='sport:season to split, repeatable (defaults to every season)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='remove the partition files before copying')
+    args = parser.parse_args()
+    main(partitions=args.partition, remove=args.rebuild)